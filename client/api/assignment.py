@@ -6,11 +6,12 @@ import requests
 
 from client import exceptions as ex
 from client.sources.common import core
-from client.utils import auth, format, encryption
+from client.utils import auth, cache, format, encryption, network, profiling
 from client.protocols.grading import grade
 from client.cli.common import messages
 import client
 import collections
+import collections.abc
 import glob
 import importlib
 import json
@@ -24,6 +25,7 @@ log = logging.getLogger(__name__)
 
 CONFIG_EXTENSION = '*.ok'
 
+@profiling.timed('load_assignment')
 def load_assignment(filepath=None, cmd_args=None):
     config = _get_config(filepath)
     if not isinstance(config, dict):
@@ -144,32 +146,63 @@ class Assignment(core.Serializable):
             print_error("    Non-decrypted files:", *undecrypted_files)
 
     def attempt_decryption(self, keys):
-        if self.decryption_keypage:
-            try:
-                response = requests.get(self.decryption_keypage)
-                response.raise_for_status()
-                keys_data = response.content.decode('utf-8')
-                keys = keys + encryption.get_keys(keys_data)
-            except Exception as e:
-                print_error(
-                    "Could not load decryption page {}: {}.".format(self.decryption_keypage, e))
-                print_error("You can pass in a key directly by running python3 ok --decrypt [KEY]")
+        """Decrypts every encrypted file that one of KEYS, or of the keys on
+        the decryption keypage, was used for. Each file records the hash of
+        its key, so it is matched to its key directly.
+
+        RETURNS:
+        (list of decrypted files, list of files that are still encrypted)
+        """
+        key_index = {encryption.hash_key(key): key
+                     for key in keys + self._get_keypage_keys()}
 
         decrypted_files = []
         undecrypted_files = []
         for file in self._get_files():
             with open(file) as f:
-                if not encryption.is_encrypted(f.read()):
-                    continue
-            for key in keys:
-                success = self._decrypt_file(file, key)
-                if success:
-                    decrypted_files.append(file)
-                    break
+                data = f.read()
+            if not encryption.is_encrypted(data):
+                continue
+            try:
+                _, _, hashed_key = encryption.load_ct(data)
+            except (ValueError, KeyError):
+                log.warning('Malformed encrypted file %s', file)
+                hashed_key = None
+            key = key_index.get(hashed_key)
+            if key is not None and self._decrypt_file(file, key):
+                decrypted_files.append(file)
             else:
                 undecrypted_files.append(file)
         return decrypted_files, undecrypted_files
 
+    def auto_decrypt(self):
+        """Decrypts what it can with the keys from the decryption keypage,
+        at most once per run. Returns the list of files that were decrypted.
+        """
+        if self._auto_decrypted is None:
+            self._auto_decrypted, _ = self.attempt_decryption([])
+        return self._auto_decrypted
+
+    def _get_keypage_keys(self):
+        """Returns the keys listed on the decryption keypage, which is only
+        fetched once per run.
+        """
+        if not self.decryption_keypage:
+            return []
+        if self._keypage_keys is None:
+            self._keypage_keys = []
+            try:
+                network.patch_requests()
+                response = requests.get(self.decryption_keypage)
+                response.raise_for_status()
+                keys_data = response.content.decode('utf-8')
+                self._keypage_keys = encryption.get_keys(keys_data)
+            except Exception as e:
+                print_error(
+                    "Could not load decryption page {}: {}.".format(self.decryption_keypage, e))
+                print_error("You can pass in a key directly by running python3 ok --decrypt [KEY]")
+        return self._keypage_keys
+
     def _decrypt_file(self, path, key):
         """
         Decrypt the given file in place with the given key.
@@ -241,7 +274,10 @@ class Assignment(core.Serializable):
     _TESTS_PACKAGE = 'client.sources'
     _PROTOCOL_PACKAGE = 'client.protocols'
 
-    # A list of all protocols that should be loaded. Order is important.
+    # A list of all protocols, in the order in which they run. Each protocol
+    # is listed with the command-line flags and the .ok config "protocols"
+    # entries that activate it; a protocol with neither is always active.
+    # Only active protocols are imported and constructed up front.
     # Dependencies:
     # analytics     -> grading
     # autostyle     -> analytics, grading
@@ -257,31 +293,34 @@ class Assignment(core.Serializable):
     # unlock        -> none
     # testing       -> none
     _PROTOCOLS = [
-        "testing",
-        # "rate_limit", uncomment to turn rate limiting back on!
-        "file_contents",
-        "grading",
-        "analytics",
-        "help",
-        "followup",
-        "autostyle",
-        "collaborate",
-        "hinting",
-        "lock",
-        "scoring",
-        "unlock",
-        "trace",
-        "backup",
+        ("testing", ["testing"], []),
+        # ("rate_limit", [], []), uncomment to turn rate limiting back on!
+        ("file_contents", [], []),
+        ("grading", [], []),
+        ("analytics", [], []),
+        ("help", [], ["help"]),
+        ("followup", [], ["followup"]),
+        ("autostyle", ["style"], []),
+        ("collaborate", ["collab"], []),
+        ("hinting", [], []),
+        ("lock", ["lock"], []),
+        ("scoring", ["score"], []),
+        ("unlock", ["unlock"], []),
+        ("trace", ["trace"], []),
+        ("backup", [], []),
     ]
 
     def __init__(self, args, **fields):
         self.cmd_args = args
-        self.test_map = collections.OrderedDict()
-        self.protocol_map = collections.OrderedDict()
+        self._test_map = collections.OrderedDict()
+        self._test_index = None
+        self._keypage_keys = None
+        self._auto_decrypted = None
+        self.protocol_map = ProtocolMap(self, self._PROTOCOLS)
 
     def post_instantiation(self):
         self._print_header()
-        self._load_tests()
+        self._load_tests(self._requested_tests())
         self._load_protocols()
         self.specified_tests = self._resolve_specified_tests(
             self.cmd_args.question, self.cmd_args.all)
@@ -321,9 +360,42 @@ class Assignment(core.Serializable):
 
         return contents.strip() == ""
 
-    def _load_tests(self):
-        """Loads all tests specified by test_map."""
-        log.info('Loading tests')
+    @property
+    def test_map(self):
+        """An OrderedDict of all tests in this assignment, in config order.
+        Tests that have not been loaded yet are loaded first.
+        """
+        self._load_tests()
+        return self._test_map
+
+    @property
+    def loaded_tests(self):
+        """The tests that have been loaded so far, without loading others."""
+        return self._test_map
+
+    def _requested_tests(self):
+        """Returns the names of the tests this run needs up front, or None if
+        every test is needed.
+        """
+        if self.cmd_args.question:
+            return self.cmd_args.question
+        elif not self.cmd_args.all and self.default_tests != core.NoValue \
+                and len(self.default_tests) > 0:
+            return self.default_tests
+        return None
+
+    def _index_tests(self):
+        """Builds an index of the test files matched by the tests patterns,
+        without importing any of them.
+
+        Each entry is a dict with the file, source and parameter to load it
+        with, and the names of the tests it provides (None if the source
+        cannot tell without loading the file).
+        """
+        if self._test_index is not None:
+            return self._test_index
+        log.info('Indexing tests')
+        self._test_index = []
         for file_pattern, sources in self.tests.items():
             for source in sources.split(","):
                 # Separate filepath and parameter
@@ -340,13 +412,58 @@ class Assignment(core.Serializable):
                     except ImportError:
                         raise ex.LoadingException('Invalid test source: {}'.format(source))
 
-                    test_name = file
-                    if parameter:
-                        test_name += ':' + parameter
-
-                    self.test_map.update(module.load(file, parameter, self))
-
-                    log.info('Loaded {}'.format(test_name))
+                    index = getattr(module, 'index', None)
+                    self._test_index.append({
+                        'module': module,
+                        'file': file,
+                        'parameter': parameter,
+                        'names': index(file, parameter) if index else None,
+                        'tests': None,
+                    })
+        return self._test_index
+
+    @profiling.timed('_load_tests')
+    def _load_tests(self, names=None):
+        """Loads the tests that may provide any of NAMES, or all remaining
+        tests if NAMES is None. Test files whose tests are not needed are
+        never imported.
+        """
+        loaded = False
+        for entry in self._index_tests():
+            if entry['tests'] is not None:
+                continue
+            if names is not None and entry['names'] is not None \
+                    and not any(name in entry['names'] for name in names):
+                continue
+            test_name = entry['file']
+            if entry['parameter']:
+                test_name += ':' + entry['parameter']
+            entry['tests'] = entry['module'].load(entry['file'],
+                                                  entry['parameter'], self)
+            loaded = True
+            log.info('Loaded {}'.format(test_name))
+
+        if loaded:
+            # Rebuild the map so that tests stay in config order regardless of
+            # the order in which they were loaded.
+            self._test_map.clear()
+            for entry in self._test_index:
+                if entry['tests'] is not None:
+                    self._test_map.update(entry['tests'])
+            cache.save_all()
+
+    def _has_test(self, name):
+        """Returns whether a test called NAME exists, loading as few tests as
+        possible to find out.
+        """
+        if name in self._test_map:
+            return True
+        for entry in self._index_tests():
+            if entry['tests'] is None and entry['names'] is not None \
+                    and name in entry['names']:
+                return True
+        self._load_tests([name])
+        return name in self._test_map
 
     def dump_tests(self):
         """Dumps all tests, as determined by their .dump() method.
@@ -356,7 +473,7 @@ class Assignment(core.Serializable):
                  that takes a filename and serializes the test object.
         """
         log.info('Dumping tests')
-        for test in self.test_map.values():
+        for test in self._test_map.values():
             try:
                 test.dump()
             except ex.SerializeException as e:
@@ -365,8 +482,8 @@ class Assignment(core.Serializable):
                 log.info('Dumped {}'.format(test.name))
 
     def autobackup(self, run_sync):
-        backup = self._get_protocol("BackupProtocol")
-        get_contents = self._get_protocol("FileContentsProtocol")
+        backup = self.protocol_map.get("backup")
+        get_contents = self.protocol_map.get("file_contents")
         if backup is None:
             print_error("Error: autobackup specified by backup protocol not found")
             return
@@ -376,12 +493,6 @@ class Assignment(core.Serializable):
             return msgs
         backup.run_in_loop(messages_fn, timedelta(minutes=1), synchronous=run_sync)
 
-    def _get_protocol(self, type_name):
-        for protocol in self.protocol_map.values():
-            if type(protocol).__name__ == type_name:
-                return protocol
-        return None
-
     def _resolve_specified_tests(self, questions, all_tests=False):
         """For each of the questions specified on the command line,
         find the test corresponding that question.
@@ -395,35 +506,45 @@ class Assignment(core.Serializable):
                 and len(self.default_tests) > 0:
             log.info('Using default tests (no questions specified): '
                      '{}'.format(self.default_tests))
-            bad_tests = sorted(test for test in self.default_tests if test not in self.test_map)
+            self._load_tests(self.default_tests)
+            bad_tests = sorted(test for test in self.default_tests if test not in self._test_map)
             if bad_tests:
                 error_message = ("Required question(s) missing: {}. "
                     "This often is the result of accidentally deleting the question's doctests or the entire function.")
                 raise ex.LoadingException(error_message.format(", ".join(bad_tests)))
-            return [self.test_map[test] for test in self.default_tests]
+            return [self._test_map[test] for test in self.default_tests]
         elif not questions:
             log.info('Using all tests (no questions specified and no default tests)')
             return list(self.test_map.values())
-        elif not self.test_map:
+
+        self._load_tests(questions)
+        if any(question not in self._test_map for question in questions) \
+                and not self.test_map:
             log.info('No tests loaded')
             return []
 
         specified_tests = []
         for question in questions:
-            if question not in self.test_map:
+            if question not in self._test_map:
                 raise ex.InvalidTestInQuestionListException(list(self.test_map), question)
 
             log.info('Adding {} to specified tests'.format(question))
             if question not in specified_tests:
-                specified_tests.append(self.test_map[question])
+                specified_tests.append(self._test_map[question])
         return specified_tests
 
+    @profiling.timed('_load_protocols')
     def _load_protocols(self):
         log.info('Loading protocols')
-        for proto in self._PROTOCOLS:
-            module = importlib.import_module(self._PROTOCOL_PACKAGE + '.' + proto)
-            self.protocol_map[proto] = module.protocol(self.cmd_args, self)
-            log.info('Loaded protocol "{}"'.format(proto))
+        # Protocols named in the config are imported even if this run does
+        # not use them, so that a broken one fails here and not partway
+        # through a run. Only constructing them is deferred.
+        configured = self.protocols if self.protocols is not core.NoValue else []
+        for name in configured:
+            if name in self.protocol_map:
+                self.protocol_map.import_module(name)
+        for name, _ in self.protocol_map.active_items():
+            log.info('Loaded protocol "{}"'.format(name))
 
     def _load_parsons(self):
         """Verifies that all desired parsons problems exist and that the 
@@ -442,7 +563,7 @@ class Assignment(core.Serializable):
                 error_message = 'The "required" and "optional" keys, if included in a parsons config object, must be lists'
                 raise ex.LoadingException(error_message)
             for prob in (req_probs + opt_probs):
-                if prob not in self.test_map:
+                if not self._has_test(prob):
                     error_message = f'Problem name "{prob}" in the parsons problem group "{prob_group_name}" is invalid' 
                     raise ex.LoadingException(error_message)
 
@@ -455,6 +576,69 @@ class Assignment(core.Serializable):
         format.print_line('=')
         print()
 
+class ProtocolMap(collections.abc.Mapping):
+    """An ordered mapping of protocol name -> protocol. Each protocol is
+    imported and constructed the first time it is looked up, so protocols that
+    a run never uses cost nothing.
+    """
+
+    def __init__(self, assignment, registry):
+        """Constructor.
+
+        PARAMETERS:
+        assignment -- Assignment; passed to each protocol's constructor.
+        registry   -- list of (name, flags, config_entries); see
+                      Assignment._PROTOCOLS.
+        """
+        self._assignment = assignment
+        self._registry = collections.OrderedDict(
+            (name, (flags, entries)) for name, flags, entries in registry)
+        self._protocols = {}
+
+    def __getitem__(self, name):
+        if name not in self._protocols:
+            if name not in self._registry:
+                raise KeyError(name)
+            module = self.import_module(name)
+            self._protocols[name] = module.protocol(self._assignment.cmd_args,
+                                                    self._assignment)
+        return self._protocols[name]
+
+    def import_module(self, name):
+        """Imports the module of the named protocol without constructing the
+        protocol.
+        """
+        return importlib.import_module(Assignment._PROTOCOL_PACKAGE + '.' + name)
+
+    def __contains__(self, name):
+        return name in self._registry
+
+    def __iter__(self):
+        return iter(self._registry)
+
+    def __len__(self):
+        return len(self._registry)
+
+    def is_active(self, name):
+        """Returns whether the named protocol has anything to do in this run,
+        based on the current command-line arguments and config.
+        """
+        flags, entries = self._registry[name]
+        if not flags and not entries:
+            return True
+        args = self._assignment.cmd_args
+        configured = self._assignment.protocols
+        if configured is core.NoValue:
+            configured = []
+        return any(getattr(args, flag, False) for flag in flags) \
+            or any(entry in configured for entry in entries)
+
+    def active_items(self):
+        """Yields (name, protocol) for every active protocol, in order."""
+        for name in self._registry:
+            if self.is_active(name):
+                yield name, self[name]
+
 class Settings:
     """Command-line arguments that are set programmatically instead of by
     parsing the command line. For example:
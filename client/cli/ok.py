@@ -48,7 +48,10 @@ from client import exceptions as ex
 from client.api import assignment
 from client.cli.common import messages
 from client.utils import auth
+from client.utils import events
+from client.utils import network
 from client.utils import output
+from client.utils import profiling
 from client.utils import software_update
 from datetime import datetime
 import argparse
@@ -97,6 +100,20 @@ def parse_input(command_input=None):
                         help='run tests from rst file (default: mytests.rst)')
     testing.add_argument('--all', action='store_true',
                         help="run tests for all questions in config file")
+    testing.add_argument('--failed-first', action='store_true',
+                        help="run unsolved questions from earlier runs "
+                             "first; output is printed, and without -v "
+                             "grading stops at the first failure, in that "
+                             "order")
+    testing.add_argument('--changed', action='store_true',
+                        help="only run tests affected by code changes since "
+                             "the last run with --changed")
+    testing.add_argument('--no-cache', action='store_true',
+                        help="run every test instead of reusing passing "
+                             "results cached when no assignment file "
+                             "changed")
+    testing.add_argument('--clear-cache', action='store_true',
+                        help="discard cached test results before running")
     testing.add_argument('--submit', action='store_true',
                         help="submit the assignment")
     testing.add_argument('--backup', action='store_true',
@@ -105,6 +122,25 @@ def parse_input(command_input=None):
                         help="submit composition revision")
     testing.add_argument('--timeout', type=int, default=10,
                         help="set the timeout duration (in seconds) for running tests")
+    testing.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                        help="run tests in N worker processes")
+    testing.add_argument('--fork-cases', action='store_true',
+                        help="run doctest setup once per suite and each case "
+                             "in a forked process (Linux only)")
+    testing.add_argument('--reuse-setup', action='store_true',
+                        help="run Scheme and Logic setup once per suite and "
+                             "each case in a copy of the global frame it "
+                             "produced")
+    testing.add_argument('--max-output', type=int, metavar='CHARS',
+                        default=output.DEFAULT_MAX_LOG_SIZE,
+                        help="keep at most CHARS characters (not bytes) of "
+                             "each piece of captured test output, dropping "
+                             "the middle (0 for no limit)")
+    testing.add_argument('--events', metavar='FILE|FD',
+                        help="write grading progress as JSON lines to a file "
+                             "or file descriptor")
+    testing.add_argument('--quiet', action='store_true',
+                        help="do not print test output (use with --events)")
     testing.add_argument('-cov', '--coverage', action='store_true',
                         help="get suggestions on what lines to add tests for")
     testing.add_argument('--autobackup', action='store_true',
@@ -144,6 +180,11 @@ def parse_input(command_input=None):
                         help="display a list of all available tests")
     debug.add_argument('--debug', action='store_true',
                         help="show debugging output")
+    debug.add_argument('--profile-startup', type=str, nargs='?',
+                        const=profiling.DEFAULT_REPORT_FILE, default=None,
+                        help="report import and loading times, and write "
+                             "them as JSON (default: {})".format(
+                                 profiling.DEFAULT_REPORT_FILE))
 
     # Grading
     grading = parser.add_argument_group('grading options')
@@ -192,18 +233,38 @@ def parse_input(command_input=None):
                         help="do not check for ok updates")
     server.add_argument('--update', action='store_true',
                         help="update ok and exit")
+    server.add_argument('--update-interval', type=int, metavar='SECONDS',
+                        default=software_update.DEFAULT_TTL,
+                        help="minimum time between checks for ok updates "
+                             "(default: %(default)s)")
     # used in faded-parsons-frontend repo
     server.add_argument('--parsons', action='store_true', 
                         help="run parsons problems in browser")  
 
     return parser.parse_args(command_input)
 
-def main():
-    """Run all relevant aspects of ok.py."""
-    args = parse_input()
+def main(args=None):
+    """Run all relevant aspects of ok.py. ARGS are the parsed command-line
+    arguments, if they have already been parsed.
+    """
+    if args is None:
+        args = parse_input()
     log.setLevel(logging.DEBUG if args.debug else logging.ERROR)
     log.debug(args)
 
+    if args.profile_startup:
+        profiling.enable(args.profile_startup)
+
+    output.set_max_log_size(args.max_output)
+    if args.events:
+        try:
+            events.open_stream(args.events)
+        except (OSError, ValueError) as e:
+            print_error('Cannot write events to {}: {}'.format(args.events, e))
+            exit(1)
+    if args.quiet:
+        output.silence()
+
     # Checking user's Python bit version
     bit_v = (8 * struct.calcsize("P"))
     log.debug("Python {} ({}bit)".format(sys.version, bit_v))
@@ -217,6 +278,13 @@ def main():
                 args.server, client.__version__, client.FILE_NAME, timeout=10)
         exit(not did_update)  # exit with error if ok failed to update
 
+    update_check = None
+    if not args.no_update and not args.local and not args.tests:
+        # Check for updates while the tests run.
+        update_check = software_update.check_version_async(
+                args.server, client.__version__, client.FILE_NAME,
+                ttl=args.update_interval)
+
     assign = None
     try:
         if args.get_token:
@@ -233,6 +301,7 @@ def main():
         if assign.decryption_keypage:
             # do not allow running locally if decryption keypage is provided
             args.local = False
+            network.patch_requests()
 
         if args.autobackup_actual_run_sync:
             assign.autobackup(run_sync=True)
@@ -278,7 +347,7 @@ def main():
             try:
                 msgs = messages.Messages()
                 msgs['email'] = assign.get_student_email()
-                for name, proto in assign.protocol_map.items():
+                for name, proto in assign.protocol_map.active_items():
                     log.info('Execute {}.run()'.format(name))
                     proto.run(msgs)
                 msgs['timestamp'] = str(datetime.now())
@@ -318,15 +387,19 @@ def main():
     except KeyboardInterrupt:
         log.info('KeyboardInterrupt received.')
     finally:
-        if not args.no_update and not args.local:
+        if not args.no_update and not args.local and not args.tests:
             try:
-                software_update.check_version(args.server, client.__version__,
-                                              client.FILE_NAME)
+                if update_check is None:
+                    update_check = software_update.check_version_async(
+                            args.server, client.__version__, client.FILE_NAME,
+                            ttl=args.update_interval)
+                update_check.finish()
             except KeyboardInterrupt:
                 pass
 
         if assign:
             assign.dump_tests()
+        events.close()
 
 
 if __name__ == '__main__':
@@ -5,15 +5,27 @@ The GradedTestCase interface should be implemented by TestCases that
 are compatible with the GradingProtocol.
 """
 
+from client.protocols import analytics
 from client.protocols.common import models
+from client.utils import events
 from client.utils import format
+from client.utils import impact
+from client.utils import parallel
+from client.utils import result_cache
 from client.utils import storage
 from client.utils import output
 import logging
 import sys
+import time
 
 log = logging.getLogger(__name__)
 
+# Command-line options that can change a test's results or output; cached
+# results are only reused when all of them match.
+RESULT_OPTIONS = ('verbose', 'timeout', 'ignore_empty', 'parsons',
+                  'fork_cases', 'reuse_setup', 'max_output', 'config',
+                  'trace', 'trace_print')
+
 #####################
 # Testing Mechanism #
 #####################
@@ -44,10 +56,97 @@ class GradingProtocol(models.Protocol):
                         'Suite number must be valid.({})'.format(len(test.suites))))
                 if self.args.case:
                     suite.run_only = [int(c) for c in self.args.case]
-        grade(tests, messages, env, verbose=self.args.verbose)
-
-
-def grade(questions, messages, env=None, verbose=True):
+        jobs = 1 if self.args.interactive else self.args.jobs
+        if self.args.changed and not self.args.suite:
+            self._run_changed(tests, messages, env)
+            return
+        cached_results = self._result_cache(env)
+        if self.args.failed_first:
+            history = analytics.AnalyticsProtocol.read_history()
+            grade(failed_first(tests, history), messages, env,
+                  verbose=self.args.verbose, jobs=jobs,
+                  result_cache=cached_results)
+            # Report results in the usual order.
+            results = messages['grading']
+            messages['grading'] = {test.name: results[test.name]
+                                   for test in tests if test.name in results}
+        else:
+            grade(tests, messages, env, verbose=self.args.verbose, jobs=jobs,
+                  result_cache=cached_results)
+        if cached_results is not None:
+            cached_results.save()
+
+    def _result_cache(self, env):
+        """Returns the ResultCache to grade with, or None if results should
+        not be cached: with --no-cache, or when running interactively or
+        only part of a test.
+        """
+        if self.args.clear_cache:
+            result_cache.clear()
+        if (self.args.no_cache or self.args.interactive or self.args.suite
+                or self.args.case or env is not None):
+            return None
+        options = tuple((name, getattr(self.args, name, None))
+                        for name in RESULT_OPTIONS)
+        return result_cache.ResultCache(self.assignment.src, options)
+
+    def _run_changed(self, tests, messages, env):
+        """Runs only the tests affected by changes to the source files since
+        the last run with --changed, reusing the last results of the others.
+        Tests run in this process so that their coverage can be recorded.
+        """
+        impact_map = impact.ImpactMap()
+        src = self.assignment.src
+        reuse = impact_map.unchanged_results(tests, src)
+        impact_map.set_sources(src)
+        grade(tests, messages, env, verbose=self.args.verbose, reuse=reuse,
+              trace=impact_map.trace)
+        impact_map.update(messages['grading'], reuse)
+        impact_map.save()
+
+
+def failed_first(questions, history):
+    """Returns QUESTIONS reordered by HISTORY, as kept by the
+    AnalyticsProtocol: the questions the student last worked on come first,
+    then other unsolved questions, then questions without history, and
+    finally solved questions. Order is otherwise kept.
+
+    grade() prints output and stops at the first failure in this order; only
+    the results in its messages are put back in the config order.
+    """
+    details = history.get('questions', {})
+    current = set(history.get('question', []))
+    def priority(question):
+        if question.name in current:
+            return 0
+        elif question.name not in details:
+            return 2
+        elif not details[question.name].get('solved'):
+            return 1
+        return 3
+    return sorted(questions, key=priority)
+
+
+def grade(questions, messages, env=None, verbose=True, jobs=1, reuse=None,
+          trace=None, result_cache=None):
+    """Runs QUESTIONS in order and records the results in MESSAGES. If JOBS
+    is greater than 1, tests run in that many worker processes, but results
+    and output are reported in the same order.
+
+    REUSE is a dict of test name -> (results, chunks) for tests that are not
+    run again, where CHUNKS is their output from an earlier run to replay.
+    If TRACE is given, each test is run by calling TRACE(test, run), where
+    run() runs the test. If RESULT_CACHE (a result_cache.ResultCache) is
+    given, tests found in it are not run; their output is replayed instead.
+    """
+    reuse = reuse or {}
+    # test name -> (key, (results, chunks) or None)
+    cached = {}
+    if result_cache is not None:
+        for test in questions:
+            if test.name not in reuse:
+                key = result_cache.key(test)
+                cached[test.name] = (key, result_cache.get(key))
     format.print_line('~')
     print('Running tests')
     print()
@@ -60,26 +159,67 @@ def grade(questions, messages, env=None, verbose=True):
     # The environment in which to run the tests.
 
     log_id = output.new_log()
-    for test in questions:
+    events.emit('run_started', tests=[test.name for test in questions])
+    def run(test):
         log.info('Running tests for {}'.format(test.name))
-        results = test.run(env)
-
-        # if correct once, set persistent flag
-        if results['failed'] == 0 and results['locked'] == 0:
-            storage.store(test.name, 'correct', True)
-
-        passed += results['passed']
-        failed += results['failed']
-        locked += results['locked']
-        analytics[test.name] = results
+        events.emit('test_started', test=test.name)
+        start = time.perf_counter()
+        chunks = output.capture() if result_cache is not None else None
+        try:
+            if trace is None:
+                results = test.run(env)
+            else:
+                results = trace(test, lambda: test.run(env))
+        finally:
+            if chunks is not None:
+                output.end_capture(chunks)
+        events.emit('test_finished', test=test.name,
+                    passed=results['passed'], failed=results['failed'],
+                    locked=results['locked'],
+                    seconds=time.perf_counter() - start)
+        return results, chunks
+
+    def is_run(test):
+        return test.name not in reuse and (test.name not in cached
+                                           or cached[test.name][1] is None)
+
+    all_results = parallel.imap(
+        run, [test for test in questions if is_run(test)], jobs)
+    try:
+        for test in questions:
+            if is_run(test):
+                results, chunks = next(all_results)
+                if test.name in cached:
+                    result_cache.put(cached[test.name][0], results, chunks)
+            else:
+                if test.name in reuse:
+                    results, chunks = reuse[test.name]
+                else:
+                    results, chunks = cached[test.name][1]
+                output.replay(chunks)
+                events.emit('test_finished', test=test.name,
+                            passed=results['passed'], failed=results['failed'],
+                            locked=results['locked'], seconds=0, cached=True)
+            # if correct once, set persistent flag
+            if results['failed'] == 0 and results['locked'] == 0:
+                storage.store(test.name, 'correct', True)
+
+            passed += results['passed']
+            failed += results['failed']
+            locked += results['locked']
+            analytics[test.name] = results
+
+            if not verbose and (failed > 0 or locked > 0):
+                # Stop at the first failed test
+                break
+    finally:
+        # Terminates any workers still running tests.
+        all_results.close()
 
-        if not verbose and (failed > 0 or locked > 0):
-            # Stop at the first failed test
-            break
-    
     format.print_progress_bar('Test summary', passed, failed, locked,
                               verbose=verbose)
     print()
+    events.emit('run_finished', passed=passed, failed=failed, locked=locked)
 
 
     messages['grading'] = analytics
@@ -7,6 +7,7 @@ from client.sources.common import models as sources_models
 from client.sources.ok_test import models as ok_test_models
 from client.protocols.common import models as protocol_models
 from client.utils import format
+from client.utils import parallel
 from collections import OrderedDict
 import logging
 import sys
@@ -35,21 +36,25 @@ class ScoringProtocol(protocol_models.Protocol):
         print('Scoring tests')
         print()
 
-        raw_scores = OrderedDict()
-        for test in self.assignment.specified_tests:
-            assert isinstance(test, sources_models.Test), 'ScoringProtocol received invalid test'
-
+        def score(test):
             log.info('Scoring test {}'.format(test.name))
 
             # A hack that allows programmatic API users to plumb a custom
             # environment through to Python tests.
             # Use type to ensure is an actual OkTest and not a subclass
             if type(test) == ok_test_models.OkTest:
-                score = test.score(env=env)
+                return test.score(env=env)
             else:
-                score = test.score()
+                return test.score()
 
-            raw_scores[test.name] = (score, test.points)
+        tests = self.assignment.specified_tests
+        for test in tests:
+            assert isinstance(test, sources_models.Test), 'ScoringProtocol received invalid test'
+
+        raw_scores = OrderedDict()
+        jobs = 1 if self.args.interactive else self.args.jobs
+        for test, test_score in zip(tests, parallel.imap(score, tests, jobs)):
+            raw_scores[test.name] = (test_score, test.points)
 
         messages['scoring'] = display_breakdown(raw_scores, self.args.score_out)
         print()
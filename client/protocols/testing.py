@@ -1,5 +1,6 @@
 from client.protocols.common import models
 from client.utils import format
+from client.utils import line_coverage
 from doctest import DocTest, DocTestParser, DocTestRunner, FAIL_FAST, Example
 from client.exceptions import EarlyExit
 import os
@@ -7,7 +8,6 @@ import re
 import sys
 import importlib
 import collections
-from coverage import coverage
 import signal
 
 from client.utils.debug import DebugOutputChecker
@@ -257,7 +257,8 @@ class TestingProtocol(models.Protocol):
         # Note: All (and only) .py files given in the src will be tracked and
         # contribute to coverage statistics
         self.clean_src = [i[:-3] for i in self.assignment.src if i.endswith('.py')]
-        self.cov = coverage(source=[testloc], include=[file + '.py' for file in self.clean_src])
+        self.cov = line_coverage.LineCoverage(
+            [file + '.py' for file in self.clean_src], source=[testloc])
         self.testloc = testloc
         self.cov.start()
         analytics = self.test(self.good_env, self.args.suite, self.args.case)
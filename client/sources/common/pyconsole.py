@@ -2,12 +2,19 @@
 
 from client import exceptions
 from client.sources.common import interpreter
+from client.utils import cache
 from client.utils import output
+from client.utils import parallel
 from client.utils import timer
 from client.utils import debug
 
 import ast
 import code
+import collections.abc
+import functools
+import os
+import re
+import sys
 import textwrap
 import traceback
 
@@ -15,8 +22,15 @@ class PythonConsole(interpreter.Console):
     PS1 = '>>> '
     PS2 = '... '
 
+    # If True, setup code is run once and each case runs in a forked child
+    # of the resulting state. See interpret().
+    fork_cases = False
+
     def __init__(self, verbose, interactive, timeout=None, parsons=False):
         self._original_frame = {}
+        # (setup, stamps of local modules, frame after setup, setup success,
+        #  setup output)
+        self._prepared = None
         super().__init__(verbose, interactive, timeout, parsons)
 
     def load(self, code, setup='', teardown=''):
@@ -30,11 +44,69 @@ class PythonConsole(interpreter.Console):
         teardown -- str; raw teardown code
         """
         super().load(code, setup, teardown)
-        self._frame = self._original_frame.copy()
+        if not self._original_frame:
+            self._frame = {}
+        elif _declares_globals(self._setup + self._code + self._teardown):
+            # Functions store and delete their global names without going
+            # through OverlayFrame's methods, so they need a real copy.
+            self._frame = self._original_frame.copy()
+        else:
+            self._frame = OverlayFrame(self._original_frame)
 
     def load_env(self, env):
         self._original_frame = env
 
+    def interpret(self):
+        """Interprets the console on the loaded code. With fork_cases, the
+        setup code is only run again when it or a module it may have imported
+        from the current directory changes; each case runs in a copy-on-write
+        child of the frame it produced, so cases are isolated from each other
+        just as when the setup is run for each of them.
+
+        Setup that runs on top of an environment loaded by load_env() is
+        always run again, since the environment can change in place.
+        """
+        if not self.fork_cases or not parallel.can_fork() \
+                or self._original_frame:
+            return super().interpret()
+
+        setup = tuple(self._setup)
+        if self._prepared is None or self._prepared[0] != setup \
+                or not cache.stamps_unchanged(self._prepared[1]):
+            visible = output.is_on()
+            log_id = output.new_log()
+            try:
+                success = self._interpret_lines(self._setup,
+                                                should_print=not self.parsons)
+                chunks = [(msg, visible) for msg in output.get_log(log_id)]
+            finally:
+                output.remove_log(log_id)
+            stamps = cache.file_stamps(_local_module_files())
+            self._prepared = (setup, stamps, self._frame, success, chunks)
+        else:
+            output.replay(self._prepared[4])
+        _, _, self._frame, success, _ = self._prepared
+        if not success:
+            return False
+
+        if not parallel.prepare_fork():
+            # Run the case on the setup's frame in this process instead, so
+            # the frame cannot be reused.
+            self._prepared = None
+            return self._interpret_case()[0]
+        try:
+            success, self.cases_passed, self.cases_total = \
+                parallel.call_in_child(self._interpret_case)
+        except ChildProcessError as e:
+            print('# Error: {}'.format(e))
+            return False
+        return success
+
+    def _interpret_case(self):
+        success = self._interpret_lines(self._code, compare_all=True)
+        success &= self._interpret_lines(self._teardown)
+        return success, self.cases_passed, self.cases_total
+
     def interact(self):
         """Opens up an interactive session with the current state of
         the console.
@@ -45,10 +117,11 @@ class PythonConsole(interpreter.Console):
     def evaluate(self, code):
         log_id = output.new_log()
         try:
-            try:
-                result = timer.timed(self.timeout, eval, (code, self._frame))
-            except SyntaxError:
-                timer.timed(self.timeout, exec, (code, self._frame))
+            compiled, is_expression = _compile(code)
+            if is_expression:
+                result = timer.timed(self.timeout, eval, (compiled, self._frame))
+            else:
+                timer.timed(self.timeout, exec, (compiled, self._frame))
                 result = None
         except RuntimeError as e:
             stacktrace_length = 15
@@ -78,3 +151,141 @@ class PythonConsole(interpreter.Console):
     @staticmethod
     def normalize(response):
         return repr(ast.literal_eval(response))
+
+def _declares_globals(lines):
+    """Returns whether any of the source LINES may contain a global
+    statement.
+    """
+    return any(isinstance(line, str) and _GLOBAL_RE.search(line)
+               for line in lines)
+
+_GLOBAL_RE = re.compile(r'\bglobal\b')
+
+def _local_module_files():
+    """Returns the files of the imported modules that are under the current
+    directory, such as student code and its helpers, other than OK itself.
+    """
+    prefix = os.path.join(os.getcwd(), '')
+    files = []
+    for name, module in list(sys.modules.items()):
+        if name == 'client' or name.startswith('client.'):
+            continue
+        path = getattr(module, '__file__', None)
+        if isinstance(path, str) and os.path.abspath(path).startswith(prefix):
+            files.append(path)
+    return sorted(files)
+
+class OverlayFrame(dict):
+    """A namespace for running a case on top of a shared BASE environment,
+    such as __main__.__dict__ in a notebook.
+
+    Names the case has not assigned are read from BASE. Assignments and
+    deletions only affect the overlay, so BASE itself is never changed, just
+    as with a shallow copy of BASE, but creating an overlay takes constant
+    time. The overlay's own names are stored in the dict itself, which is
+    what exec and eval use directly.
+    """
+
+    def __init__(self, base):
+        super().__init__()
+        self._base = base
+        self._deleted = set()
+
+    def __missing__(self, key):
+        if key in self._deleted:
+            raise KeyError(key)
+        return self._base[key]
+
+    def _in_base(self, key):
+        return key not in self._deleted and key in self._base
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or self._in_base(key)
+
+    def __setitem__(self, key, value):
+        self._deleted.discard(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if dict.__contains__(self, key):
+            super().__delitem__(key)
+        if key in self._base:
+            self._deleted.add(key)
+
+    def __iter__(self):
+        yield from dict.__iter__(self)
+        for key in self._base:
+            if not dict.__contains__(self, key) and key not in self._deleted:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def keys(self):
+        return collections.abc.KeysView(self)
+
+    def items(self):
+        return collections.abc.ItemsView(self)
+
+    def values(self):
+        return collections.abc.ValuesView(self)
+
+    def copy(self):
+        return dict(self.items())
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        elif default:
+            return default[0]
+        raise KeyError(key)
+
+    def popitem(self):
+        for key in self:
+            return key, self.pop(key)
+        raise KeyError('popitem(): dictionary is empty')
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        self._deleted.update(self._base)
+        super().clear()
+
+    __hash__ = None
+
+@functools.lru_cache(maxsize=4096)
+def _compile(source):
+    """Compiles SOURCE as an expression if possible, and as statements
+    otherwise. Prompts repeat across cases, setups and reruns, so each one is
+    only compiled once per run.
+
+    RETURNS:
+    (code object, bool; whether SOURCE is an expression)
+    """
+    try:
+        return compile(source, '<string>', 'eval'), True
+    except SyntaxError:
+        return compile(source, '<string>', 'exec'), False
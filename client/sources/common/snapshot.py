@@ -0,0 +1,41 @@
+"""Reusing the global frame left by the setup code of the Scheme and Logic
+consoles, so that the setup only runs once for a suite. Each case gets a
+deep copy of the frame the setup produced.
+"""
+
+import copy
+import re
+
+_LOAD_RE = re.compile(r"""\(\s*load\s+['"]?([^\s()'"]+)""")
+
+def loaded_files(lines):
+    """Returns the paths of the files that (load ...) expressions in LINES
+    may read, with and without the .scm extension.
+    """
+    files = []
+    for line in lines:
+        for name in _LOAD_RE.findall(line):
+            files.append(name)
+            if not name.endswith('.scm'):
+                files.append(name + '.scm')
+    return files
+
+def shared_values(frame):
+    """Returns the values bound in FRAME, a new global frame, that copies of
+    the frame can share. Procedures that refer to a frame must be copied
+    along with it, so that they see the bindings of the copy.
+    """
+    bindings = getattr(frame, 'bindings', None)
+    if not isinstance(bindings, dict):
+        return []
+    frame_type = type(frame)
+    return [value for value in bindings.values()
+            if not any(isinstance(attr, frame_type)
+                       for attr in getattr(value, '__dict__', {}).values())]
+
+def copy_frame(frame, shared):
+    """Returns a deep copy of FRAME, the student's Frame object (or anything
+    that refers to it), except that the SHARED values are not copied.
+    """
+    memo = {id(value): value for value in shared}
+    return copy.deepcopy(frame, memo)
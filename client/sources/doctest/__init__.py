@@ -1,12 +1,28 @@
 from client import exceptions as ex
 from client.sources.common import importing
 from client.sources.doctest import models
+from client.utils import cache
+import ast
 import logging
 import os
 import traceback
 
 log = logging.getLogger(__name__)
 
+# Docstrings found by parsing source files, keyed by file.
+_docstring_cache = cache.get_cache('doctest')
+
+def index(file, name):
+    """Returns the names of the tests that load() provides for FILE, or None
+    if FILE must be imported to find them.
+    """
+    if name:
+        return [name]
+    docstrings = _find_docstrings(file)
+    if docstrings is None:
+        return None
+    return list(docstrings)
+
 def load(file, name, assign):
     """Loads doctests from a specified filepath.
 
@@ -22,6 +38,17 @@ def load(file, name, assign):
     if not os.path.isfile(file) or not file.endswith('.py'):
         raise ex.LoadingException('Cannot import doctests from {}'.format(file))
 
+    # Student code is only imported when a test runs, unless the doctests
+    # cannot be found without importing it. Errors in it are then reported
+    # by the test that imports it.
+    docstrings = _find_docstrings(file)
+    if docstrings is not None:
+        if not name:
+            return {test_name: _make_test(file, test_name, docstring, assign)
+                    for test_name, docstring in docstrings.items()}
+        elif name in docstrings:
+            return {name: _make_test(file, name, docstrings[name], assign)}
+
     try:
         module = importing.load_module(file)
     except Exception:
@@ -76,6 +103,9 @@ def _load_test(file, module, name, assign):
         raise ex.LoadingException('Attribute {} is not a function'.format(name))
 
     docstring = func.__doc__ if func.__doc__ else ''
+    return _make_test(file, name, docstring, assign)
+
+def _make_test(file, name, docstring, assign):
     try:
         return models.Doctest(file, assign.cmd_args.verbose, assign.cmd_args.interactive,
                               assign.cmd_args.timeout, assign.cmd_args.ignore_empty, assign.cmd_args.parsons,
@@ -84,3 +114,150 @@ def _load_test(file, module, name, assign):
         raise ex.LoadingException('Unable to load doctest for {} '
                                   'from {}'.format(name, file))
 
+
+def _find_docstrings(file):
+    """Finds the docstrings in FILE without importing it.
+
+    RETURNS:
+    dict; qualified name -> docstring, in the order that _load_tests finds
+    them, or None if FILE cannot be parsed or may define callables that only
+    importing it reveals.
+    """
+    docstrings = _docstring_cache.get(file)
+    if docstrings is None:
+        try:
+            with open(file, 'rb') as f:
+                data = f.read()
+            tree = ast.parse(data, filename=file)
+        except (OSError, SyntaxError, ValueError) as e:
+            log.info('Cannot parse {}: {}'.format(file, e))
+            return None
+        if _may_assign_callables(tree.body):
+            log.info('{} may assign callables; it must be imported'.format(file))
+            # Cached as False, since None means that nothing is cached.
+            docstrings = False
+        else:
+            docstrings = _docstrings_from_ast(tree)
+        _docstring_cache.put(file, docstrings, contents=data)
+    return docstrings if docstrings is not False else None
+
+def _docstrings_from_ast(tree):
+    """Collects the docstrings of the functions and classes defined in TREE,
+    including methods that classes inherit from classes in the same module,
+    to match what _load_tests finds by walking dir() of the imported module.
+    """
+    module_defs = _definitions(tree.body)
+    docstrings = {}
+    def _collect(defs, attribute_path, seen):
+        for attr in sorted(defs):
+            node = defs[attr]
+            path = attribute_path + [attr]
+            docstrings['.'.join(path)] = ast.get_docstring(node, clean=False) or ''
+            if isinstance(node, ast.ClassDef) and node not in seen:
+                _collect(_class_members(node, module_defs, set()), path,
+                         seen | {node})
+    _collect(module_defs, [], set())
+    return docstrings
+
+def _definitions(body):
+    """Returns name -> node for the functions and classes that executing the
+    statements in BODY defines, skipping `if __name__ == '__main__'` blocks.
+    """
+    defs = {}
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            defs[node.name] = node
+        elif isinstance(node, ast.If):
+            if not _is_main_check(node.test):
+                defs.update(_definitions(node.body))
+            defs.update(_definitions(node.orelse))
+        elif isinstance(node, ast.Try):
+            for block in [node.body] + [h.body for h in node.handlers] + \
+                    [node.orelse, node.finalbody]:
+                defs.update(_definitions(block))
+        elif isinstance(node, (ast.With, ast.AsyncWith)):
+            defs.update(_definitions(node.body))
+    return defs
+
+# Expressions whose values are never callable.
+_NOT_CALLABLE = (ast.Constant, ast.JoinedStr, ast.List, ast.Tuple, ast.Set,
+                 ast.Dict, ast.ListComp, ast.SetComp, ast.DictComp,
+                 ast.GeneratorExp, ast.Compare)
+
+def _may_assign_callables(body):
+    """Returns whether executing the statements in BODY, or in the classes
+    they define, may bind a name to a callable other than through def or
+    class, such as f = lambda x: x or g = make_adder(1). _load_tests finds
+    those by walking dir(), but parsing cannot.
+    """
+    for node in body:
+        if isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            if node.value is not None and not _never_callable(node.value):
+                return True
+        elif isinstance(node, (ast.For, ast.AsyncFor)):
+            return True
+        elif isinstance(node, ast.While):
+            if _may_assign_callables(node.body) or \
+                    _may_assign_callables(node.orelse):
+                return True
+        elif isinstance(node, ast.ClassDef):
+            if _may_assign_callables(node.body):
+                return True
+        elif isinstance(node, ast.If):
+            if not _is_main_check(node.test) and \
+                    _may_assign_callables(node.body):
+                return True
+            if _may_assign_callables(node.orelse):
+                return True
+        elif isinstance(node, ast.Try):
+            for block in [node.body] + [h.body for h in node.handlers] + \
+                    [node.orelse, node.finalbody]:
+                if _may_assign_callables(block):
+                    return True
+        elif isinstance(node, (ast.With, ast.AsyncWith)):
+            if _may_assign_callables(node.body):
+                return True
+    return False
+
+def _never_callable(node):
+    if isinstance(node, ast.BinOp):
+        return _never_callable(node.left) and _never_callable(node.right)
+    elif isinstance(node, ast.UnaryOp):
+        return _never_callable(node.operand)
+    return isinstance(node, _NOT_CALLABLE)
+
+def _class_members(node, module_defs, seen):
+    """Returns name -> node for the callable members of the class NODE,
+    including those inherited from classes defined in the same module.
+    """
+    seen.add(node)
+    members = {}
+    for base in reversed(node.bases):
+        if isinstance(base, ast.Name):
+            base_node = module_defs.get(base.id)
+            if isinstance(base_node, ast.ClassDef) and base_node not in seen:
+                members.update(_class_members(base_node, module_defs, seen))
+    for name, member in _definitions(node.body).items():
+        if _is_property(member):
+            # Properties are not callable, so _load_tests skips them.
+            members.pop(name, None)
+        else:
+            members[name] = member
+    return members
+
+def _is_property(node):
+    for decorator in getattr(node, 'decorator_list', []):
+        if isinstance(decorator, ast.Name) and \
+                decorator.id in ('property', 'cached_property'):
+            return True
+        if isinstance(decorator, ast.Attribute) and \
+                decorator.attr in ('setter', 'getter', 'deleter', 'cached_property'):
+            return True
+    return False
+
+def _is_main_check(test):
+    return isinstance(test, ast.Compare) and \
+        isinstance(test.left, ast.Name) and test.left.id == '__name__' and \
+        len(test.comparators) == 1 and \
+        isinstance(test.comparators[0], ast.Constant) and \
+        test.comparators[0].value == '__main__'
@@ -12,10 +12,14 @@ import copy
 import logging
 import os
 
+from client.utils import cache
 from client.utils import encryption
 
 log = logging.getLogger(__name__)
 
+# Raw test dictionaries, so that unchanged test files need not be re-imported.
+_test_cache = cache.get_cache('ok_test')
+
 SUITES = {
     'doctest': doctest.DoctestSuite,
     'concept': concept.ConceptSuite,
@@ -26,6 +30,12 @@ SUITES = {
     'wwpp': wwpp.WwppSuite,
 }
 
+def index(file, parameter):
+    """Returns the names of the tests that load() provides for FILE, without
+    importing it.
+    """
+    return [os.path.basename(os.path.splitext(file)[0])]
+
 def load(file, parameter, assign):
     """Loads an OK-style test from a specified filepath.
 
@@ -41,26 +51,33 @@ def load(file, parameter, assign):
         log.info('Cannot import {} as an OK test'.format(file))
         raise ex.LoadingException('Cannot import {} as an OK test'.format(file))
 
-    if os.path.exists(file):
-        with open(file) as f:
-            data = f.read()
-        if encryption.is_encrypted(data):
-            decrypted, _ = assign.attempt_decryption([])
-            if file not in decrypted:
-                name = os.path.basename(filename)
-                return {name: models.EncryptedOKTest(name=name, points=1)}
+    test = _test_cache.get(file)
+    if test is None:
+        data = None
+        if os.path.exists(file):
+            with open(file, 'rb') as f:
+                data = f.read()
+            if encryption.is_encrypted(data.decode('utf-8', 'replace')):
+                if file not in assign.auto_decrypt():
+                    name = os.path.basename(filename)
+                    return {name: models.EncryptedOKTest(name=name, points=1)}
+                # The file was decrypted in place, so its contents changed.
+                data = None
 
-    try:
-        test = importing.load_module(file).test
-        test = copy.deepcopy(test)
-    except Exception as e:
-        raise ex.LoadingException('Error importing file {}: {}'.format(file, str(e)))
+        try:
+            test = importing.load_module(file).test
+        except Exception as e:
+            raise ex.LoadingException('Error importing file {}: {}'.format(file, str(e)))
+        _test_cache.put(file, copy.deepcopy(test), contents=data)
+    test = copy.deepcopy(test)
 
     name = os.path.basename(filename)
     try:
         return {name: models.OkTest(file, SUITES, assign.endpoint, assign,
                                     assign.cmd_args.verbose,
                                     assign.cmd_args.interactive,
-                                    assign.cmd_args.timeout, **test)}
+                                    assign.cmd_args.timeout,
+                                    assign.cmd_args.fork_cases,
+                                    assign.cmd_args.reuse_setup, **test)}
     except ex.SerializeException as e:
         raise ex.LoadingException('Cannot load OK test {}: {}'.format(file, e))
@@ -18,6 +18,9 @@ class DoctestSuite(models.Suite):
         super().__init__(test, verbose, interactive, timeout, **fields)
         self.skip_locked_cases = True
         self.console = self.console_type(verbose, interactive, timeout)
+        # Cases cannot be forked if failures open an interactive console.
+        self.console.fork_cases = bool(getattr(test, 'fork_cases', False)) \
+            and not interactive
 
     def post_instantiation(self):
         for i, case in enumerate(self.cases):
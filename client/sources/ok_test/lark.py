@@ -9,8 +9,20 @@ from client.utils import output
 from client.utils import timer
 from client.utils import debug
 
+import os
 import traceback
 
+# (grammar, working directory) -> Lark parser. Building a parser analyzes the
+# whole grammar, and every case of a suite uses the same one.
+_parsers = {}
+
+def _get_parser(grammar):
+    # Grammars can %import files relative to the working directory.
+    key = (grammar, os.getcwd())
+    if key not in _parsers:
+        _parsers[key] = Lark(grammar, start="start", import_paths=["."])
+    return _parsers[key]
+
 class LarkConsole(interpreter.Console):
     PS1 = 'lark> '
     PS2 = '....> '
@@ -29,7 +41,7 @@ class LarkConsole(interpreter.Console):
         """
         try:
             with self._lark_execution_guard():
-                self._parser = Lark("\n".join(self._setup), start="start", import_paths=["."])
+                self._parser = _get_parser("\n".join(self._setup))
                 assert not self._teardown, "Lark tests do not support teardown"
                 pass
         except interpreter.ConsoleException:
@@ -41,10 +53,13 @@ class LarkConsole(interpreter.Console):
         if not code:
             return None, ''
         log_id = output.new_log()
-        with self._lark_execution_guard():
-            result = timer.timed(self.timeout, self._parser.parse, [], dict(text=code))
-            printed_output = ''.join(output.get_log(log_id))
-            return self.normalize(result.pretty()), debug.remove_debug(printed_output)
+        try:
+            with self._lark_execution_guard():
+                result = timer.timed(self.timeout, self._parser.parse, [], dict(text=code))
+                printed_output = ''.join(output.get_log(log_id))
+                return self.normalize(result.pretty()), debug.remove_debug(printed_output)
+        finally:
+            output.remove_log(log_id)
 
     @contextmanager
     def _lark_execution_guard(self):
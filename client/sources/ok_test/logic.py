@@ -13,15 +13,21 @@ the following interface:
 
 from client import exceptions
 from client.sources.common import interpreter
+from client.sources.common import snapshot
 from client.sources.ok_test.scheme import SchemeConsole
 from client.sources.ok_test import doctest
+from client.utils import cache
 from client.utils import output
 from client.utils import timer
 import importlib
+import logging
+import os
 import sys
 import textwrap
 import traceback
 
+log = logging.getLogger(__name__)
+
 class LogicConsole(interpreter.Console):
     PS1 = 'logic> '
     PS2 = '...... '
@@ -29,6 +35,18 @@ class LogicConsole(interpreter.Console):
     MODULE = 'logic'
     _output_fn = str
 
+    # If True, the setup's effect is recorded once and replayed for later
+    # cases, as SchemeConsole.snapshot_setup does; enabled with --reuse-setup.
+    snapshot_setup = False
+
+    def __init__(self, verbose, interactive, timeout=None, parsons=False):
+        # (setup key, stamps of loaded files, recorded), where recorded is
+        # None if the setup cannot be reused, or (frame after setup, values
+        # shared between copies of the frame, facts added by setup, setup
+        # output).
+        self._prepared = None
+        super().__init__(verbose, interactive, timeout, parsons)
+
     def load(self, code, setup='', teardown=''):
         """Prepares a set of setup, test, and teardown code to be
         run in the console.
@@ -37,12 +55,89 @@ class LogicConsole(interpreter.Console):
         """
         self._import_logic()
         super().load(code, setup, teardown)
+        self._frame = None
+
+    def interpret(self):
+        """Interprets the console on the loaded code.
+
+        Facts are kept from case to case, and the setup adds its facts again
+        for every case. When the setup only adds facts and prints nothing but
+        its own code, its effect is recorded the first time; later cases get
+        a copy of the frame it produced and the same facts appended, without
+        evaluating the setup again. Each case gets its own copy of the frame
+        and of the facts, and the setup is evaluated again whenever a file
+        it loads changes.
+        """
+        if not self.snapshot_setup:
+            self._frame = self.logic.create_global_frame()
+            return super().interpret()
+
+        key = (tuple(self._setup), os.getcwd())
+        if self._prepared is not None and (self._prepared[0] != key
+                or not cache.stamps_unchanged(self._prepared[1])):
+            self._prepared = None
+        if self._prepared is not None and self._prepared[2] is not None:
+            template, shared, facts, chunks = self._prepared[2]
+            try:
+                frame, facts = snapshot.copy_frame((template, facts), shared)
+            except Exception as e:
+                log.info('Unable to copy Logic frame: %s', e)
+                self._prepared = self._prepared[:2] + (None,)
+            else:
+                output.replay(chunks)
+                self._frame = frame
+                self.logic.facts.extend(facts)
+                return self._interpret_case()
+
         self._frame = self.logic.create_global_frame()
+        if self._prepared is not None:
+            return super().interpret()
+        stamps = cache.file_stamps(snapshot.loaded_files(self._setup))
+        shared = snapshot.shared_values(self._frame)
+        old_facts = list(self.logic.facts)
+        visible = output.is_on()
+        log_id = output.new_log()
+        try:
+            success = self._interpret_lines(self._setup,
+                                            should_print=not self.parsons)
+            printed = output.get_log(log_id)
+        finally:
+            output.remove_log(log_id)
+        if not success:
+            self._prepared = (key, stamps, None)
+            return False
+
+        facts = self.logic.facts
+        echo = ''
+        if not self.parsons:
+            echo = ''.join(line + '\n' for line in self._setup if line)
+        if ''.join(printed) == echo and len(facts) >= len(old_facts) \
+                and all(a is b for a, b in zip(facts, old_facts)):
+            added = facts[len(old_facts):]
+            recorded = (self._frame, shared, added,
+                        [(msg, visible) for msg in printed])
+            self._prepared = (key, stamps, recorded)
+            try:
+                self._frame, facts[len(old_facts):] = snapshot.copy_frame(
+                    (self._frame, added), shared)
+            except Exception as e:
+                log.info('Unable to copy Logic frame: %s', e)
+                self._prepared = (key, stamps, None)
+        else:
+            self._prepared = (key, stamps, None)
+        return self._interpret_case()
+
+    def _interpret_case(self):
+        success = self._interpret_lines(self._code, compare_all=True)
+        success &= self._interpret_lines(self._teardown)
+        return success
 
     def interact(self):
         """Opens up an interactive session with the current state of
         the console.
         """
+        if self._frame is None:
+            self._frame = self.logic.create_global_frame()
         self.logic.read_eval_print_loop(self.logic.buffer_input, self._frame,
                                          True)
 
@@ -81,7 +176,8 @@ class LogicConsole(interpreter.Console):
 
     def _import_logic(self):
         try:
-            sys.path.insert(0, 'logic')
+            if 'logic' not in sys.path:
+                sys.path.insert(0, 'logic')
             self.logic = importlib.import_module(self.MODULE)
         except ImportError as e:
             raise exceptions.ProtocolException('Could not import logic')
@@ -98,6 +194,12 @@ class LogicConsole(interpreter.Console):
 class LogicSuite(doctest.DoctestSuite):
     console_type = LogicConsole
 
+    def __init__(self, test, verbose, interactive, timeout=None, **fields):
+        super().__init__(test, verbose, interactive, timeout, **fields)
+        # Cases cannot share a setup if failures open an interactive console.
+        self.console.snapshot_setup = \
+            bool(getattr(test, 'reuse_setup', False)) and not interactive
+
     def run(self, test_name, suite_number, env=None):
         self.console._reset_logic()
         return super().run(test_name, suite_number, env)
@@ -1,10 +1,12 @@
 from client import exceptions as ex
 from client.sources.common import core
 from client.sources.common import models
+from client.utils import events
 from client.utils import format
 from client.utils import output
 from client.utils import storage
 import os
+import time
 
 ##########
 # Models #
@@ -17,7 +19,8 @@ class OkTest(models.Test):
     description = core.String(optional=True)
 
     def __init__(self, file, suite_map, assign_name, assignment, verbose, interactive,
-                 timeout=None, **fields):
+                 timeout=None, fork_cases=False, reuse_setup=False,
+                 **fields):
         super().__init__(**fields)
         self.file = file
         self.suite_map = suite_map
@@ -25,12 +28,14 @@ class OkTest(models.Test):
         self.verbose = verbose
         self.interactive = interactive
         self.timeout = timeout
+        self.fork_cases = fork_cases
+        self.reuse_setup = reuse_setup
         self.assignment = assignment
         self.assignment_name = assign_name
         self.run_only = None
 
     def get_short_name(self):
-        for name, value in self.assignment.test_map.items():
+        for name, value in self.assignment.loaded_tests.items():
             if value == self:
                 return name
 
@@ -300,7 +305,9 @@ class Suite(core.Serializable):
                                                case_number))
         print()
 
+        start = time.perf_counter()
         success = case.run()
+        seconds = time.perf_counter() - start
         if success:
             print('-- OK! --')
 
@@ -308,6 +315,12 @@ class Suite(core.Serializable):
         output_log = output.get_log(log_id)
         output.remove_log(log_id)
 
+        if events.is_enabled():
+            events.emit('case_finished', test=test_name, suite=suite_number,
+                        case=case_number, passed=bool(success),
+                        seconds=seconds,
+                        output=None if success else ''.join(output_log))
+
         if not success or self.verbose:
             output.disable_all_logs()
             print(''.join(output_log))
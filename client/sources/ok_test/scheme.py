@@ -11,15 +11,21 @@ importable module called "scheme" with the following interface:
 
 from client import exceptions
 from client.sources.common import interpreter
+from client.sources.common import snapshot
 from client.sources.ok_test import doctest
+from client.utils import cache
 from client.utils import output
 from client.utils import timer
 from client.utils import debug
 import importlib
+import logging
+import os
 import sys
 import textwrap
 import traceback
 
+log = logging.getLogger(__name__)
+
 class SchemeConsole(interpreter.Console):
     PS1 = 'scm> '
     PS2 = '.... '
@@ -27,6 +33,18 @@ class SchemeConsole(interpreter.Console):
     MODULE = 'scheme'
     _output_fn = str
 
+    # If True, the global frame left by the setup code is kept and copied
+    # for each case, rather than running the setup for every case. Copying
+    # relies on every value in the frame surviving copy.deepcopy, so this is
+    # only enabled with --reuse-setup.
+    snapshot_setup = False
+
+    def __init__(self, verbose, interactive, timeout=None, parsons=False):
+        # (setup key, stamps of loaded files, frame after setup, setup
+        # success, setup output, values shared between copies of the frame)
+        self._prepared = None
+        super().__init__(verbose, interactive, timeout, parsons)
+
     def load(self, code, setup='', teardown=''):
         """Prepares a set of setup, test, and teardown code to be
         run in the console.
@@ -39,12 +57,58 @@ class SchemeConsole(interpreter.Console):
         except:
             pass
         super().load(code, setup, teardown)
-        self._frame = self.scheme.create_global_frame()
+        self._frame = None
+
+    def interpret(self):
+        """Interprets the console on the loaded code. With snapshot_setup, the
+        setup code is only run again when it or a file it loads changes; each
+        case gets its own copy of the global frame it produced.
+        """
+        if not self.snapshot_setup:
+            self._frame = self.scheme.create_global_frame()
+            return super().interpret()
+
+        key = (tuple(self._setup), os.getcwd())
+        if self._prepared is None or self._prepared[0] != key \
+                or not cache.stamps_unchanged(self._prepared[1]):
+            self._prepared = None
+            self._frame = self.scheme.create_global_frame()
+            shared = snapshot.shared_values(self._frame)
+            visible = output.is_on()
+            log_id = output.new_log()
+            try:
+                success = self._interpret_lines(self._setup,
+                                                should_print=not self.parsons)
+                chunks = [(msg, visible) for msg in output.get_log(log_id)]
+            finally:
+                output.remove_log(log_id)
+            stamps = cache.file_stamps(snapshot.loaded_files(self._setup))
+            self._prepared = (key, stamps, self._frame, success, chunks,
+                              shared)
+        else:
+            output.replay(self._prepared[4])
+        _, _, template, success, _, shared = self._prepared
+        if not success:
+            return False
+
+        try:
+            self._frame = snapshot.copy_frame(template, shared)
+        except Exception as e:
+            # The frame holds something that cannot be copied, so fall back
+            # to running the setup for every case.
+            log.info('Unable to copy Scheme frame: %s', e)
+            self.snapshot_setup = False
+            return self.interpret()
+        success = self._interpret_lines(self._code, compare_all=True)
+        success &= self._interpret_lines(self._teardown)
+        return success
 
     def interact(self):
         """Opens up an interactive session with the current state of
         the console.
         """
+        if self._frame is None:
+            self._frame = self.scheme.create_global_frame()
         self.scheme.read_eval_print_loop(self.scheme.buffer_input, self._frame,
                                          True)
 
@@ -86,7 +150,8 @@ class SchemeConsole(interpreter.Console):
 
     def _import_scheme(self):
         try:
-            sys.path.insert(0, 'scheme')
+            if 'scheme' not in sys.path:
+                sys.path.insert(0, 'scheme')
             self.scheme = importlib.import_module(self.MODULE)
         except ImportError as e:
             raise exceptions.ProtocolException('Could not import scheme')
@@ -96,3 +161,9 @@ class SchemeConsole(interpreter.Console):
 
 class SchemeSuite(doctest.DoctestSuite):
     console_type = SchemeConsole
+
+    def __init__(self, test, verbose, interactive, timeout=None, **fields):
+        super().__init__(test, verbose, interactive, timeout, **fields)
+        # Cases cannot share a setup if failures open an interactive console.
+        self.console.snapshot_setup = \
+            bool(getattr(test, 'reuse_setup', False)) and not interactive
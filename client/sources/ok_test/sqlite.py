@@ -3,14 +3,20 @@
 from client import exceptions
 from client.sources.common import core, interpreter
 from client.sources.ok_test import doctest
+from client.utils import cache
 from client.utils import format
 from client.utils import timer
 import importlib
 import io
+import logging
 import os
 import re
+import sqlite3
 import subprocess
 import sys
+import time
+
+log = logging.getLogger(__name__)
 
 def get_sqlite_shell():
     sqlite_shell = None
@@ -18,6 +24,9 @@ def get_sqlite_shell():
     except ImportError: pass
     return sqlite_shell
 
+# PATH -> version of the "sqlite3" executable found on it, or None.
+_cli_versions = {}
+
 class SqliteConsole(interpreter.Console):
     PS1 = 'sqlite> '
     PS2 = '   ...> '
@@ -26,6 +35,13 @@ class SqliteConsole(interpreter.Console):
 
     ordered = False # will be set by SqliteSuite.__init__
 
+    # Whether to run cases with Python's sqlite3 module when possible,
+    # instead of the sqlite3 executable.
+    in_process = True
+
+    # (setup, result of _Session.from_setup or the _Unsupported it raised)
+    _snapshot = None
+
     def load(self, code, setup='', teardown=''):
         """Prepares a set of setup, test, and teardown code to be
         run in the console.
@@ -35,9 +51,18 @@ class SqliteConsole(interpreter.Console):
     def interpret(self):
         """Interprets the code in this Console.
 
-        If there is an executable called "sqlite3" (in the current directory is
+        Cases are run in-process with Python's sqlite3 module if they only use
+        features that behave the same as in the sqlite3 shell. Otherwise, if
+        there is an executable called "sqlite3" (in the current directory is
         okay), pipe the test case into sqlite3. Otherwise, report an error.
         """
+        if self.in_process and sqlite3.sqlite_version_info >= self.VERSION:
+            try:
+                return self._check(*self._use_sqlite_module())
+            except _Unsupported as e:
+                log.info('Running case with the sqlite3 executable: %s', e)
+            except interpreter.ConsoleException:
+                return False
         env = dict(os.environ,
                    PATH=os.getcwd() + os.pathsep + os.environ['PATH'])
         if self._has_sqlite_cli(env):
@@ -45,13 +70,7 @@ class SqliteConsole(interpreter.Console):
                 test, expected, actual = self._use_sqlite_cli(env)
             except interpreter.ConsoleException:
                 return False
-            print(format.indent(test, self.PS1))  # TODO: show test with prompt
-            print(actual)
-            try:
-                self._diff_output(expected, actual)
-                return True
-            except interpreter.ConsoleException:
-                return False
+            return self._check(test, expected, actual)
         else:
             print('ERROR: could not run sqlite3.')
             print('Tests will not pass, but you can still submit your assignment.')
@@ -65,6 +84,15 @@ class SqliteConsole(interpreter.Console):
         """
         # TODO(albert)
 
+    def _check(self, test, expected, actual):
+        print(format.indent(test, self.PS1))  # TODO: show test with prompt
+        print(actual)
+        try:
+            self._diff_output(expected, actual)
+            return True
+        except interpreter.ConsoleException:
+            return False
+
     def _diff_output(self, expected, actual):
         """Raises an interpreter.ConsoleException if expected and actual output
         don't match.
@@ -108,6 +136,13 @@ class SqliteConsole(interpreter.Console):
         """
         args = ['sqlite3', '--version']
         sqlite_shell = get_sqlite_shell()
+        key = None if sqlite_shell else env.get('PATH')
+        if key not in _cli_versions:
+            _cli_versions[key] = self._sqlite_cli_version(args, sqlite_shell, env)
+        version_info = _cli_versions[key]
+        return version_info is not None and version_info >= self.VERSION
+
+    def _sqlite_cli_version(self, args, sqlite_shell, env):
         if sqlite_shell:
             stdout = io.StringIO()
             sqlite_shell.main(*args, stdin=io.StringIO(), stdout=stdout, stderr=io.StringIO())
@@ -119,10 +154,9 @@ class SqliteConsole(interpreter.Console):
                 version = subprocess.check_output(args,
                                                   env=env).decode()
             except (subprocess.CalledProcessError, FileNotFoundError):
-                return False
+                return None
         version = version.split(' ')[0].split('.')
-        version_info = tuple(int(num) for num in version)
-        return version_info >= self.VERSION
+        return tuple(int(num) for num in version)
 
     def _use_sqlite_cli(self, env):
         """Pipes the test case into the "sqlite3" executable.
@@ -139,15 +173,7 @@ class SqliteConsole(interpreter.Console):
         expected -- str; the expected output, for display purposes
         result   -- str; the actual output from piping input into sqlite3
         """
-        test = []
-        expected = []
-        for line in self._setup + self._code + self._teardown:
-            if isinstance(line, interpreter.CodeAnswer):
-                expected.extend(line.output)
-            elif line.startswith(self.PS1):
-                test.append(line[len(self.PS1):])
-            elif line.startswith(self.PS2):
-                test.append(line[len(self.PS2):])
+        test, expected = self._split_lines(self._setup + self._code + self._teardown)
         test = '\n'.join(test)
         result, error = (None, None)
         process = None
@@ -176,11 +202,247 @@ class SqliteConsole(interpreter.Console):
                 raise interpreter.ConsoleException(exceptions.Timeout(self.timeout))
         return test, '\n'.join(expected), (error + '\n' + result).strip()
 
+    def _split_lines(self, lines):
+        """Returns (test, expected), the input lines (without prompts) and
+        the expected output lines in LINES.
+        """
+        test = []
+        expected = []
+        for line in lines:
+            if isinstance(line, interpreter.CodeAnswer):
+                expected.extend(line.output)
+            elif line.startswith(self.PS1):
+                test.append(line[len(self.PS1):])
+            elif line.startswith(self.PS2):
+                test.append(line[len(self.PS2):])
+        return test, expected
+
+    def _use_sqlite_module(self):
+        """Runs the test case with Python's sqlite3 module.
+
+        The setup is run once into an in-memory database, which is kept and
+        copied for each case with the backup API, so that a setup like
+        ".read data.sql" is not repeated for every case.
+
+        RETURNS:
+        (test, expected, result), as for _use_sqlite_cli.
+
+        RAISES:
+        _Unsupported -- if the case must be run by the sqlite3 executable.
+        """
+        setup, expected = self._split_lines(self._setup)
+        code, code_expected = self._split_lines(self._code + self._teardown)
+        expected.extend(code_expected)
+
+        try:
+            database, headers, setup_output = self._load_snapshot(setup)
+            session = _Session(_connect(), headers, self.timeout)
+        except exceptions.Timeout as e:
+            print('# Error: evaluation exceeded {} seconds.'.format(self.timeout))
+            raise interpreter.ConsoleException(e)
+        try:
+            database.backup(session.connection)
+            result = setup_output + session.run(code)
+        except exceptions.Timeout as e:
+            print('# Error: evaluation exceeded {} seconds.'.format(self.timeout))
+            raise interpreter.ConsoleException(e)
+        finally:
+            session.connection.close()
+        result = result.replace('\r\n', '\n').replace('\r', '\n')
+        return '\n'.join(setup + code), '\n'.join(expected), result.strip()
+
+    def _load_snapshot(self, setup):
+        """Returns the database that SETUP creates, running it again only if
+        it or a file it reads with .read has changed.
+        """
+        key = (tuple(setup), os.getcwd())
+        if self._snapshot is None or self._snapshot[0] != key \
+                or not cache.stamps_unchanged(self._snapshot[1]):
+            files = []
+            try:
+                result = _Session.from_setup(setup, self.timeout, files)
+            except _Unsupported as e:
+                result = e
+            self._snapshot = (key, cache.file_stamps(files), result)
+        result = self._snapshot[2]
+        if isinstance(result, _Unsupported):
+            raise result
+        return result
+
     @staticmethod
     def normalize(response):
         # no normalization for sql
         return response
 
+class _Unsupported(Exception):
+    """Raised for input that only the sqlite3 executable can run faithfully."""
+
+class _Session(object):
+    """Runs sqlite3 shell input on a connection made with Python's sqlite3
+    module, printing results the way the shell does in its default list mode.
+
+    Only the dot-commands .read, .headers and ".mode list" are understood.
+    Anything whose output could differ from the shell's, including errors,
+    raises _Unsupported.
+    """
+    def __init__(self, connection, headers=False, timeout=None, files=None):
+        self.connection = connection
+        self.headers = headers
+        self.timeout = timeout
+        # Paths read with .read are appended to FILES.
+        self.files = files if files is not None else []
+        self._output = []
+        self._deadline = None
+        if timeout is not None:
+            self._deadline = time.monotonic() + timeout
+            connection.set_progress_handler(self._past_deadline, 1000)
+
+    @classmethod
+    def from_setup(cls, lines, timeout=None, files=None):
+        """Runs setup LINES into a new in-memory database. The paths of the
+        files they read are appended to FILES, even if the setup fails.
+
+        RETURNS:
+        (connection, headers, output)
+        """
+        session = cls(_connect(), timeout=timeout, files=files)
+        try:
+            output = session.run(lines)
+            session.check_snapshot()
+        except Exception:
+            session.connection.close()
+            raise
+        session.connection.set_progress_handler(None, 0)
+        return session.connection, session.headers, output
+
+    def check_snapshot(self):
+        """Raises _Unsupported if the backup API would not copy all of the
+        state that the setup created.
+        """
+        if self.connection.in_transaction:
+            raise _Unsupported('setup leaves a transaction open')
+        try:
+            temp = self.connection.execute(
+                'SELECT count(*) FROM sqlite_temp_master').fetchone()[0]
+            attached = [row for row in self.connection.execute(
+                'PRAGMA database_list') if row[1] not in ('main', 'temp')]
+        except sqlite3.Error as e:
+            raise _Unsupported(e)
+        if temp or attached:
+            raise _Unsupported('setup creates temporary or attached databases')
+
+    def run(self, lines):
+        """Runs LINES of shell input and returns the output."""
+        self._output = []
+        self._run_lines(lines)
+        return ''.join(self._output)
+
+    def _run_lines(self, lines):
+        sql = ''
+        for line in lines:
+            if not sql:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                if line.startswith('.'):
+                    self._dot_command(line)
+                    continue
+            sql += line + '\n'
+            if sqlite3.complete_statement(sql):
+                for statement in _split_statements(sql):
+                    self._execute(statement)
+                sql = ''
+        if not _is_comment(sql):
+            raise _Unsupported('incomplete SQL')
+
+    def _dot_command(self, line):
+        args = line.split()
+        if args[0] == '.read' and len(args) == 2:
+            self.files.append(args[1])
+            try:
+                with open(args[1], encoding='utf-8') as f:
+                    contents = f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                raise _Unsupported(e)
+            self._run_lines(contents.splitlines())
+        elif args[0] in ('.headers', '.header') and len(args) == 2 \
+                and args[1] in ('on', 'off'):
+            self.headers = args[1] == 'on'
+        elif args[:2] == ['.mode', 'list'] and len(args) == 2:
+            pass
+        else:
+            raise _Unsupported('unknown command ' + args[0])
+
+    def _execute(self, statement):
+        if statement.strip().upper().startswith('PRAGMA'):
+            # Pragmas are not copied by the backup API.
+            raise _Unsupported('PRAGMA statement')
+        try:
+            cursor = self.connection.execute(statement)
+            rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            if self._deadline is not None and self._past_deadline():
+                raise exceptions.Timeout(self.timeout)
+            raise _Unsupported(e)
+        if not rows:
+            return
+        if self.headers:
+            self._output.append('|'.join(column[0] for column in cursor.description) + '\n')
+        for row in rows:
+            self._output.append('|'.join(_format_value(value) for value in row) + '\n')
+
+    def _past_deadline(self):
+        return time.monotonic() > self._deadline
+
+def _connect():
+    # Autocommit, like the shell. Cases may run in a timer thread.
+    return sqlite3.connect(':memory:', isolation_level=None,
+                           check_same_thread=False)
+
+def _split_statements(sql):
+    """Splits SQL, a complete input to the shell, into single statements."""
+    statements = []
+    statement = ''
+    for part in sql.split(';'):
+        statement += part + ';'
+        if sqlite3.complete_statement(statement):
+            statements.append(statement)
+            statement = ''
+    # The loop adds a semicolon after the last part, which is whitespace or
+    # comments.
+    if not _is_comment(statement[:-1]):
+        raise _Unsupported('trailing SQL')
+    return statements
+
+def _is_comment(sql):
+    return all(not line.strip() or line.strip().startswith('--')
+               for line in sql.splitlines())
+
+_CONTROL_CHARACTERS = re.compile('[\x00-\x08\x0b-\x1f\x7f]')
+
+def _format_value(value):
+    """Formats VALUE as the sqlite3 shell does in list mode."""
+    if value is None:
+        return ''
+    elif isinstance(value, float):
+        if value != value or value in (float('inf'), float('-inf')):
+            raise _Unsupported('infinite or NaN value')
+        if value == 0:
+            return '0.0'
+        mantissa, e, exponent = ('%.15g' % value).partition('e')
+        if '.' not in mantissa:
+            mantissa += '.0'
+        return mantissa + e + exponent
+    elif isinstance(value, bytes):
+        try:
+            value = value.decode('utf-8')
+        except UnicodeDecodeError:
+            raise _Unsupported('binary value')
+    value = str(value)
+    # Shells differ in how they print control characters.
+    if _CONTROL_CHARACTERS.search(value):
+        raise _Unsupported('control characters in value')
+    return value
+
 class SqliteSuite(doctest.DoctestSuite):
     console_type = SqliteConsole
     # TODO: Ordered should be a property of cases, not entire suites.
@@ -2,6 +2,10 @@ from client import exceptions as ex
 from client.sources.scheme_test import models
 import os
 
+def index(file, _):
+    """Returns the names of the tests that load() provides for FILE."""
+    return [file]
+
 def load(file, _, assign):
     """Loads Scheme tests from a specified filepath.
 
@@ -21,6 +21,7 @@ from client.sources.common import models
 from client.utils import format
 from client.utils import output
 from client.utils import timer
+import collections
 import importlib
 import re
 import sys
@@ -149,7 +150,12 @@ class SchemeTest(models.Test):
 ###############
 
 class TestReader:
-    """A TestReader is an iterable that collects test case expected results."""
+    """A TestReader is an iterable that collects test case expected results.
+
+    Output is consumed as it is printed: at each expectation, only the output
+    since the previous expectation is read, and only the last few complete
+    lines are kept.
+    """
 
     EXPECT_PATTERN = re.compile(r'\s*;\s*expect\s*(.*)', re.I)
 
@@ -159,10 +165,17 @@ class TestReader:
         self.output = []
         self.expected_output = []
         self.line_number = 0
+        # Output lines so far, counting the unfinished last line.
+        self._num_output_lines = 1
+        self._partial_line = ''
+        # No expectation looks back further than its number of values.
+        most_expected = max((len(match.group(1).split(';'))
+                             for match in map(self.EXPECT_PATTERN.match, lines)
+                             if match), default=0)
+        self._complete_lines = collections.deque(maxlen=most_expected)
 
     def __iter__(self):
         log_id = output.new_log()
-        output_log = output.get_log(log_id)
 
         for line in self.lines:
             self.line_number += 1
@@ -171,14 +184,27 @@ class TestReader:
                 expected = match.group(1).split(';')
                 for exp in expected:
                     self.expected_output.append((exp.strip(), self.line_number))
-                # Split output based on newlines.
-                output_lines = ''.join(output_log).split('\n')
-                if len(output_lines) > self.last_out_len:
-                    self.output.extend(output_lines[-1-len(expected):-1])
+                new_output = ''.join(output.get_log(log_id))
+                output.remove_log(log_id)
+                log_id = output.new_log()
+                self._read_output(new_output)
+                if self._num_output_lines > self.last_out_len:
+                    # The last len(expected) complete lines, as if all of the
+                    # output were split on newlines.
+                    recent = list(self._complete_lines)
+                    self.output.extend(recent[max(0, len(recent) - len(expected)):])
                 else:
                     self.output.extend([''] * len(expected))
-                self.last_out_len = len(output_lines)
+                self.last_out_len = self._num_output_lines
             yield line
 
         output.remove_log(log_id)
         raise EOFError
+
+    def _read_output(self, text):
+        if not text:
+            return
+        lines = (self._partial_line + text).split('\n')
+        self._partial_line = lines.pop()
+        self._complete_lines.extend(lines)
+        self._num_output_lines += len(lines)
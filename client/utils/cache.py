@@ -0,0 +1,161 @@
+"""Versioned on-disk caches for data derived from assignment files.
+
+Each entry is keyed by a file path and stamped with that file's size,
+modification time and content hash. An entry is only returned if the file is
+unchanged, and the whole cache is discarded if it was written by a different
+version of OK.
+"""
+
+import client
+import hashlib
+import logging
+import os
+import pickle
+
+log = logging.getLogger(__name__)
+
+CACHE_DIRECTORY = '.ok_cache'
+
+def file_digest(path, contents=None):
+    """Returns the SHA-256 hex digest of the file at PATH. If CONTENTS (the
+    bytes of the file) is given, it is hashed instead of reading the file.
+    """
+    if contents is None:
+        with open(path, 'rb') as f:
+            contents = f.read()
+    return hashlib.sha256(contents).hexdigest()
+
+def file_stamp(path):
+    """Returns (size, mtime) for the file at PATH, or None if it cannot be
+    accessed.
+    """
+    try:
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+def file_stamps(paths):
+    """Returns a tuple of (path, stamp) for each of PATHS, which changes
+    whenever one of the files is modified, created or deleted.
+    """
+    return tuple((path, file_stamp(path)) for path in paths)
+
+def stamps_unchanged(stamps):
+    """Returns whether none of the files in STAMPS, as returned by
+    file_stamps(), have changed since.
+    """
+    return file_stamps(path for path, _ in stamps) == stamps
+
+class FileCache(object):
+    """A persistent mapping of file path -> data derived from that file.
+
+    The cache is read lazily on first use and only written back by save() if
+    it was modified.
+    """
+
+    def __init__(self, name, directory=CACHE_DIRECTORY):
+        self.name = name
+        self.directory = directory
+        self._entries = None
+        self._dirty = False
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, self.name)
+
+    def get(self, path, default=None):
+        """Returns the value cached for PATH if the file has not changed since
+        it was stored, and DEFAULT otherwise.
+        """
+        stamp = file_stamp(path)
+        if stamp is None:
+            return default
+        entry = self._load().get(path)
+        if entry is None:
+            return default
+        old_stamp, digest, value = entry
+        if stamp == old_stamp:
+            return value
+        # The file was touched (e.g. rewritten by dump_tests); only the
+        # contents matter.
+        if stamp[0] == old_stamp[0] and file_digest(path) == digest:
+            self._entries[path] = (stamp, digest, value)
+            self._dirty = True
+            return value
+        return default
+
+    def put(self, path, value, contents=None):
+        """Caches VALUE for PATH. CONTENTS should be the bytes of the file
+        VALUE was derived from, if they have already been read. Text is
+        ignored, since it may differ from the bytes hashed by get().
+        """
+        stamp = file_stamp(path)
+        if stamp is None:
+            return
+        if not isinstance(contents, bytes):
+            contents = None
+        try:
+            digest = file_digest(path, contents)
+        except OSError:
+            return
+        self._load()[path] = (stamp, digest, value)
+        self._dirty = True
+
+    def remove(self, path):
+        if self._load().pop(path, None) is not None:
+            self._dirty = True
+
+    def clear(self):
+        self._entries = {}
+        self._dirty = True
+
+    def save(self):
+        """Writes the cache to disk if it has changed. Failures are logged and
+        otherwise ignored, since the cache is only an optimization.
+        """
+        if not self._dirty:
+            return
+        tmp_path = self.path + '.tmp'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((client.__version__, self._entries), f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except (OSError, pickle.PicklingError, TypeError,
+                AttributeError) as e:
+            log.warning('Unable to save cache %s: %s', self.path, e)
+        else:
+            log.info('Saved cache %s', self.path)
+            self._dirty = False
+
+    def _load(self):
+        if self._entries is not None:
+            return self._entries
+        self._entries = {}
+        try:
+            with open(self.path, 'rb') as f:
+                version, entries = pickle.load(f)
+        except FileNotFoundError:
+            return self._entries
+        except Exception as e:
+            log.info('Ignoring unreadable cache %s: %s', self.path, e)
+            return self._entries
+        if version == client.__version__ and isinstance(entries, dict):
+            self._entries = entries
+        else:
+            log.info('Discarding cache %s from version %s', self.path, version)
+        return self._entries
+
+_caches = {}
+
+def get_cache(name):
+    """Returns the FileCache with the given NAME, shared across a run."""
+    if name not in _caches:
+        _caches[name] = FileCache(name)
+    return _caches[name]
+
+def save_all():
+    for file_cache in _caches.values():
+        file_cache.save()
@@ -0,0 +1,63 @@
+"""A machine-readable stream of grading progress, enabled with --events.
+
+Each event is written as one line of JSON as soon as it happens, so that
+other programs can follow a run without parsing its human-readable output.
+Every event has an "event" name and a "time" (seconds since the epoch);
+the other fields depend on the event:
+
+    run_started   -- tests: list of test names
+    test_started  -- test
+    case_finished -- test, suite, case, passed, seconds, output (if failed)
+    test_finished -- test, passed, failed, locked, seconds, and cached if
+                     the results are from an earlier run (see --changed)
+    run_finished  -- passed, failed, locked
+
+Events may come from worker processes (see --jobs), so events of
+different tests can interleave.
+"""
+
+import json
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+
+_stream = None
+
+def open_stream(target):
+    """Starts writing events to TARGET, which is either a file descriptor
+    number (e.g. "3") or the name of a file to create.
+    """
+    global _stream
+    close()
+    if target.isdigit():
+        _stream = os.fdopen(int(target), 'w', encoding='utf-8', closefd=False)
+    else:
+        _stream = open(target, 'w', encoding='utf-8')
+
+def close():
+    global _stream
+    if _stream is not None:
+        try:
+            _stream.close()
+        except OSError as e:
+            log.warning('Error closing event stream: %s', e)
+        _stream = None
+
+def is_enabled():
+    return _stream is not None
+
+def emit(event, **fields):
+    """Writes an EVENT with the given FIELDS, if events are enabled."""
+    if _stream is None:
+        return
+    fields['event'] = event
+    fields['time'] = time.time()
+    # Flushed right away, both so that readers see the event and so that
+    # nothing is left buffered when a worker process is forked.
+    try:
+        _stream.write(json.dumps(fields, sort_keys=True) + '\n')
+        _stream.flush()
+    except (OSError, ValueError) as e:
+        log.warning('Unable to write event %s: %s', event, e)
@@ -0,0 +1,273 @@
+"""Test impact analysis for --changed.
+
+Each run records which lines of the assignment's source files every test
+executed, along with the test's results and output and the source it ran
+against. On the
+next run, the source files are diffed against that record, and a test only
+needs to run again if it executed a function that has changed since, or if
+its own test file changed. Changes outside of functions (e.g. to a global
+constant or an import) could affect any test, so they select every test.
+"""
+
+import ast
+import client
+import difflib
+import logging
+import os
+import pickle
+
+from client.utils import cache
+from client.utils import output
+from client.utils import timer
+
+log = logging.getLogger(__name__)
+
+IMPACT_FILE = os.path.join(cache.CACHE_DIRECTORY, 'impact')
+
+class ImpactMap(object):
+    """The record of the last run: source file lines, and for each test its
+    results and output, the lines it executed and the digest of its test
+    file.
+    """
+
+    def __init__(self, path=IMPACT_FILE):
+        self.path = path
+        # path -> list of lines
+        self.sources = {}
+        # test name -> {'results': dict, 'chunks': output as returned by
+        # output.capture(), 'lines': {path: set of line numbers},
+        # 'file': (path, digest) or None}
+        self.tests = {}
+        self._load()
+
+    def unchanged_results(self, tests, src):
+        """Returns a dict of test name -> (results, chunks) from the last run
+        for the TESTS that do not need to run again, given the source files
+        SRC, where CHUNKS is the output of the test to replay.
+
+        The lines recorded for these tests are also renumbered to match the
+        current source files.
+        """
+        changes = {}
+        for path in src:
+            lines = _read_lines(path)
+            old_lines = self.sources.get(path)
+            if lines is None or old_lines is None:
+                log.info('No previous version of %s', path)
+                return {}
+            if lines != old_lines:
+                changes[path] = _Change(old_lines, lines)
+                if changes[path].everything:
+                    log.info('%s changed outside of a function', path)
+                    return {}
+
+        unchanged = {}
+        for test in tests:
+            record = self.tests.get(test.name)
+            if record is None or record.get('chunks') is None \
+                    or self._affected(test, record, changes):
+                continue
+            unchanged[test.name] = record['results'], record['chunks']
+        for name in unchanged:
+            record = self.tests[name]
+            for path, change in changes.items():
+                if path in record['lines']:
+                    record['lines'][path] = change.renumber(record['lines'][path])
+        return unchanged
+
+    def trace(self, test, fn):
+        """Calls FN, which runs TEST, and records the lines of the source
+        files it executes and the output it prints. Returns the result of FN.
+        """
+        import coverage
+        files = set(self.sources)
+        cov = coverage.Coverage(data_file=None, config_file=False,
+                                include=[os.path.abspath(path) for path in files])
+        # Evaluations happen in timer threads. Only threads started while
+        # coverage is on are traced, so idle ones are not reused.
+        timer.discard_idle_workers()
+        chunks = output.capture()
+        cov.start()
+        try:
+            return fn()
+        finally:
+            cov.stop()
+            output.end_capture(chunks)
+            timer.discard_idle_workers()
+            data = cov.get_data()
+            by_path = {os.path.abspath(path): path for path in files}
+            lines = {}
+            for measured in data.measured_files():
+                path = by_path.get(os.path.abspath(measured))
+                if path is not None:
+                    lines[path] = set(data.lines(measured) or ())
+            if chunks.dropped:
+                # Output too long to be captured in full is not replayed, so
+                # the test runs again next time.
+                chunks = None
+            self.tests[test.name] = {'lines': lines, 'results': None,
+                                     'chunks': chunks,
+                                     'file': _test_file(test, files)}
+
+    def set_sources(self, src):
+        """Starts a new record against the current contents of SRC. Tests
+        recorded against other contents are forgotten, unless their lines
+        were renumbered by unchanged_results().
+        """
+        self.sources = {}
+        for path in src:
+            lines = _read_lines(path)
+            if lines is not None:
+                self.sources[path] = lines
+
+    def update(self, grading, reused):
+        """Stores the results in GRADING, a dict of test name -> results.
+        Tests that neither ran nor were REUSED are forgotten.
+        """
+        for name in list(self.tests):
+            if name in grading and (name in reused
+                                    or self.tests[name]['results'] is None):
+                self.tests[name]['results'] = grading[name]
+            else:
+                del self.tests[name]
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((client.__version__, self.sources, self.tests), f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except (OSError, pickle.PicklingError) as e:
+            log.warning('Unable to save %s: %s', self.path, e)
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                version, sources, tests = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            log.info('Ignoring unreadable %s: %s', self.path, e)
+            return
+        if version == client.__version__:
+            self.sources, self.tests = sources, tests
+
+    def _affected(self, test, record, changes):
+        if record['file'] is not None:
+            path, digest = record['file']
+            try:
+                if cache.file_digest(path) != digest:
+                    return True
+            except OSError:
+                return True
+        for path, change in changes.items():
+            if test.name in change.names:
+                return True
+            if any(start <= line <= end
+                   for line in record['lines'].get(path, ())
+                   for start, end in change.functions):
+                return True
+        return False
+
+class _Change(object):
+    """The difference between two versions of a Python source file, in terms
+    of the old version.
+
+    ATTRIBUTES:
+    everything -- bool; True if code outside of any function changed
+    functions  -- list of (start, end) line ranges of changed functions
+    names      -- set of the qualified names of changed functions
+    """
+
+    def __init__(self, old_lines, new_lines):
+        self.everything = False
+        self.functions = []
+        self.names = set()
+        self._matcher = difflib.SequenceMatcher(None, old_lines, new_lines,
+                                                autojunk=False)
+        try:
+            functions = _functions(ast.parse('\n'.join(old_lines)))
+        except (SyntaxError, ValueError):
+            self.everything = True
+            return
+
+        for tag, i1, i2, j1, j2 in self._matcher.get_opcodes():
+            if tag == 'equal':
+                continue
+            if _is_blank(old_lines[i1:i2]) and _is_blank(new_lines[j1:j2]):
+                continue
+            if tag == 'insert':
+                # Lines inserted between old lines i1 and i1 + 1 (numbered
+                # from 1) belong to a function that contains both.
+                changed = [i1, i1 + 1]
+            else:
+                changed = range(i1 + 1, i2 + 1)
+            for line in changed:
+                function = _innermost(functions, line)
+                if function is None:
+                    self.everything = True
+                    return
+                start, end, name = function
+                self.functions.append((start, end))
+                self.names.add(name)
+
+    def renumber(self, lines):
+        """Returns the line numbers in the new version of the old LINES that
+        are unchanged.
+        """
+        renumbered = set()
+        for tag, i1, i2, j1, j2 in self._matcher.get_opcodes():
+            if tag == 'equal':
+                renumbered.update(line - i1 + j1 for line in lines
+                                  if i1 < line <= i2)
+        return renumbered
+
+def _functions(tree):
+    """Returns (start, end, qualified name) for the body of every function in
+    TREE. The def line itself runs when the function is defined, not when it
+    is called, so it belongs to the enclosing code.
+    """
+    functions = []
+    def visit(node, prefix):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                name = prefix + child.name
+                functions.append((child.body[0].lineno, child.end_lineno, name))
+                visit(child, name + '.')
+            elif isinstance(child, ast.ClassDef):
+                visit(child, prefix + child.name + '.')
+            else:
+                visit(child, prefix)
+    visit(tree, '')
+    return functions
+
+def _innermost(functions, line):
+    containing = [f for f in functions if f[0] <= line <= f[1]]
+    if not containing:
+        return None
+    return max(containing, key=lambda f: f[0])
+
+def _is_blank(lines):
+    return all(not line.strip() or line.strip().startswith('#')
+               for line in lines)
+
+def _read_lines(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read().splitlines()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+def _test_file(test, src):
+    """Returns (path, digest) for the file TEST is defined in, unless it is
+    one of the source files.
+    """
+    path = getattr(test, 'file', None)
+    if not isinstance(path, str) or path in src:
+        return None
+    try:
+        return path, cache.file_digest(path)
+    except OSError:
+        return None
@@ -1,8 +1,17 @@
+from client.utils import config
+from client.utils import profiling
+import hashlib
+import json
 import logging
+import os
 import sys
 
 log = logging.getLogger(__name__)
 
+CERT_STAMP_FILE = config.CERT_FILE + '.stamp'
+
+_patched_requests = False
+
 TIMEOUT = 15
 SSL_ERROR_MESSAGE = """
 ERROR: Your Python installation does not support SSL. You may need to
@@ -22,3 +31,61 @@ def check_ssl():
     else:
         log.info('SSL module is available')
         return ssl
+
+@profiling.timed('patch_requests')
+def patch_requests():
+    """Customize the cacert.pem file that requests uses.
+
+    certifi's bundle cannot be read by requests from inside the OK zip file,
+    so it is extracted to config.CERT_FILE. A stamp file records the certifi
+    version that the extracted bundle was written from, along with its size
+    and mtime, so that usually only a stat and the small stamp need to be
+    read. The bundle is rewritten if any of them is out of date.
+
+    Runs that never use the network skip this at startup, so code that might
+    use the network regardless calls it again; only the first call does work.
+    """
+    global _patched_requests
+    if _patched_requests:
+        return
+    import certifi
+    ca_certs_file = config.CERT_FILE
+    if not _cert_stamp_is_current(certifi.__version__, ca_certs_file):
+        ca_certs_contents = certifi.__loader__.get_data(
+            os.path.join(os.path.dirname(certifi.__file__), 'cacert.pem'))
+        _write_certs(certifi.__version__, ca_certs_file, ca_certs_contents)
+    os.environ['REQUESTS_CA_BUNDLE'] = ca_certs_file
+    _patched_requests = True
+
+def _cert_stamp_is_current(certifi_version, ca_certs_file):
+    try:
+        with open(CERT_STAMP_FILE) as f:
+            stamp = json.load(f)
+        stat = os.stat(ca_certs_file)
+    except (OSError, ValueError):
+        return False
+    return isinstance(stamp, dict) \
+        and stamp.get('certifi') == certifi_version \
+        and stamp.get('size') == stat.st_size \
+        and stamp.get('mtime_ns') == stat.st_mtime_ns
+
+def _write_certs(certifi_version, ca_certs_file, ca_certs_contents):
+    config.create_config_directory()
+    digest = hashlib.sha256(ca_certs_contents).hexdigest()
+    if os.path.isfile(ca_certs_file):
+        with open(ca_certs_file, 'rb') as f:
+            existing_digest = hashlib.sha256(f.read()).hexdigest()
+        if existing_digest != digest:
+            print("Updating local SSL certificates")
+    else:
+        existing_digest = None
+    if existing_digest != digest:
+        with open(ca_certs_file, 'wb') as f:
+            f.write(ca_certs_contents)
+    stat = os.stat(ca_certs_file)
+    with open(CERT_STAMP_FILE, 'w') as f:
+        json.dump({
+            'certifi': certifi_version,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+        }, f)
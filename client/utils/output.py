@@ -4,8 +4,100 @@ import io
 import os
 import sys
 
+# Default ceiling on the number of characters (not bytes) kept by each log
+# and each capture. 0 means no limit.
+DEFAULT_MAX_LOG_SIZE = 2 ** 20
+
+TRUNCATION_MARKER = '\n... ({} characters truncated) ...\n'
+
+class _Log(object):
+    """A log's view of the shared chunk list: TAIL followed by everything
+    written since START, except the ranges written while the log was
+    disabled.
+
+    Once the log would keep more of the shared list than the size limit, its
+    contents are moved into TAIL, so that no log keeps old chunks alive for
+    the others. If the log outgrows the size limit, only its first characters
+    (HEAD) and its most recent characters are kept; the DROPPED characters in
+    between are replaced by a marker.
+    """
+    def __init__(self, start):
+        self.start = start
+        # [start, end) ranges of excluded chunks; end is None while disabled.
+        self.disabled = []
+        self.head = None
+        self.tail = ''
+        self.dropped = 0
+
+    def is_disabled(self):
+        return bool(self.disabled) and self.disabled[-1][1] is None
+
+    def is_truncated(self):
+        return self.head is not None
+
+class Capture(list):
+    """The (msg, visible) pairs returned by capture() and record().
+
+    Once the output outgrows the size limit, only its first characters and
+    its most recent characters are kept, with a marker pair in between, and
+    DROPPED counts the characters left out.
+    """
+    def __init__(self):
+        super().__init__()
+        self.dropped = 0
+        # Characters in the pairs after the marker, or in all of them.
+        self._size = 0
+        # Index of the marker pair once the output has been truncated.
+        self._marker = None
+
+    def add(self, msg, visible, limit):
+        """Appends the pair (MSG, VISIBLE), keeping at most LIMIT characters
+        (0 for no limit).
+        """
+        self.append((msg, visible))
+        self._size += len(msg)
+        if not limit or self._size <= limit:
+            return
+        half = limit // 2
+        start = 0 if self._marker is None else self._marker + 1
+        pairs = self[start:]
+        del self[start:]
+        if self._marker is None:
+            head, pairs = _split_pairs(pairs, half)
+            self.extend(head)
+            self._marker = len(self)
+            self.append(None)
+        size = sum(len(m) for m, _ in pairs)
+        dropped, kept = _split_pairs(pairs, size - half)
+        self.dropped += size - sum(len(m) for m, _ in kept)
+        visible = dropped[-1][1] if dropped else True
+        self[self._marker] = (TRUNCATION_MARKER.format(self.dropped), visible)
+        self.extend(kept)
+        self._size = size - sum(len(m) for m, _ in dropped)
+
+def _split_pairs(pairs, size):
+    """Splits the (msg, visible) PAIRS into those holding the first SIZE
+    characters and those holding the rest, splitting a message if needed.
+    """
+    first = []
+    for i, (msg, visible) in enumerate(pairs):
+        if size <= 0:
+            return first, pairs[i:]
+        if len(msg) > size:
+            return (first + [(msg[:size], visible)],
+                    [(msg[size:], visible)] + pairs[i + 1:])
+        first.append((msg, visible))
+        size -= len(msg)
+    return first, []
+
 class _OutputLogger(object):
-    """Custom logger for capturing and suppressing standard output."""
+    """Custom logger for capturing and suppressing standard output.
+
+    Captured output is kept in a single list of written chunks that every
+    open log shares, so a write costs O(1) however many logs are open. Each
+    log remembers where it starts in that list, and chunks that no open log
+    can see are discarded.
+    """
     # TODO(albert): logger should fully implement output stream.
 
     def __init__(self, stdout=sys.stdout):
@@ -13,7 +105,14 @@ class _OutputLogger(object):
         self._devnull = io.open(os.devnull, 'w', encoding=getattr(stdout, 'encoding', 'utf-8'))
         self._logs = {}
         self._num_logs = 0
-        self._disabled_logs = set()
+        self._chunks = []
+        # Number of chunks discarded from the front of self._chunks.
+        self._offset = 0
+        self._max_log_size = DEFAULT_MAX_LOG_SIZE
+        # Characters written since log sizes were last checked.
+        self._unchecked = 0
+        # Lists of (msg, visible) pairs started by capture().
+        self._captures = []
 
     def on(self):
         """Allows print statements to emit to standard output."""
@@ -23,31 +122,120 @@ class _OutputLogger(object):
         """Prevents print statements from emitting to standard out."""
         self._current_stream = self._devnull
 
+    def silence(self):
+        """Discards standard output for good, even while output is on.
+        Logs still capture everything.
+        """
+        was_on = self.is_on()
+        self._stdout = self._devnull
+        self._current_stream = self._stdout if was_on else self._devnull
+
+    def set_max_log_size(self, size):
+        """Sets the number of characters kept by each log and capture. A
+        SIZE of 0 or None keeps everything.
+        """
+        self._max_log_size = size or 0
+        self._limit_logs()
+
     def new_log(self):
         """Registers a new log so that calls to write will append to the log.
+        The middle of the log is dropped once it outgrows the size limit, so
+        a log compared with expected output only matches if it did not; see
+        is_truncated().
 
         RETURN:
         int; a unique ID to reference the log.
         """
         log_id = self._num_logs
-        self._logs[log_id] = []
+        self._logs[log_id] = _Log(self._end())
         self._num_logs += 1
         return log_id
 
     def get_log(self, log_id):
+        """Returns a list of the chunks written to the log so far."""
         assert log_id in self._logs
-        return self._logs[log_id]
+        if self._unchecked:
+            self._limit_logs()
+        log = self._logs[log_id]
+        result = []
+        if log.head is not None:
+            result.extend([log.head, TRUNCATION_MARKER.format(log.dropped)])
+        if log.tail:
+            result.append(log.tail)
+        result.extend(self._visible_chunks(log))
+        return result
+
+    def is_truncated(self, log_id):
+        """Returns whether the middle of the log was dropped, so that its
+        contents are no longer exactly what was written.
+        """
+        if self._unchecked:
+            self._limit_logs()
+        return self._logs[log_id].is_truncated()
 
     def remove_log(self, log_id):
         assert log_id in self._logs, 'Log id {} not found'.format(log_id)
-        del self._logs[log_id]
+        log = self._logs.pop(log_id)
+        if not self._logs:
+            self.remove_all_logs()
+        elif log.start == self._offset:
+            first = min(other.start for other in self._logs.values())
+            del self._chunks[:first - self._offset]
+            self._offset = first
 
     def remove_all_logs(self):
         self._logs = {}
+        self._offset += len(self._chunks)
+        self._chunks = []
 
     def is_on(self):
         return self._current_stream == self._stdout
 
+    def record(self):
+        """Discards all logs and redirects output into a list of
+        (msg, visible) pairs, where VISIBLE is whether msg would have been
+        emitted to standard output. Used by worker processes, whose output
+        is replayed by the parent.
+
+        RETURN:
+        Capture; the pairs written so far, limited like a capture.
+        """
+        chunks = Capture()
+        was_on = self.is_on()
+        self._stdout = _Recorder(chunks, True, self._max_log_size)
+        self._devnull = _Recorder(chunks, False, self._max_log_size)
+        self._current_stream = self._stdout if was_on else self._devnull
+        self.remove_all_logs()
+        return chunks
+
+    def replay(self, chunks):
+        """Writes CHUNKS returned by record() in another process, as if they
+        had been written here.
+        """
+        for msg, visible in chunks:
+            stream = self._stdout if visible else self._devnull
+            stream.write(msg)
+            self._log(msg)
+            self._capture(msg, visible)
+
+    def capture(self):
+        """Starts copying output into a list of (msg, visible) pairs, in
+        the format of record(), while still writing it as usual. The list
+        can later be passed to replay(). Like a log, it keeps at most the
+        size limit, dropping the middle.
+
+        RETURN:
+        Capture; the pairs written so far.
+        """
+        chunks = Capture()
+        self._captures.append(chunks)
+        return chunks
+
+    def end_capture(self, chunks):
+        """Stops copying output into CHUNKS, as returned by capture()."""
+        self._captures = [captured for captured in self._captures
+                          if captured is not chunks]
+
     def write(self, msg):
         """Writes msg to the current output stream (either standard
         out or dev/null). If a log has been registered, append msg
@@ -57,19 +245,22 @@ class _OutputLogger(object):
         msg -- str
         """
         self._current_stream.write(msg)
-        for log_id, log in self._logs.items():
-            if log_id not in self._disabled_logs:
-                log.append(msg)
+        self._log(msg)
+        if self._captures:
+            self._capture(msg, self.is_on())
 
     def flush(self):
         self._current_stream.flush()
 
     def disable_log(self, log_id):
-        self._disabled_logs.add(log_id)
-    
+        log = self._logs[log_id]
+        if not log.is_disabled():
+            log.disabled.append([self._end(), None])
+
     def enable_log(self, log_id):
-        self.disable_log(log_id)
-        self._disabled_logs.remove(log_id)
+        log = self._logs[log_id]
+        if log.is_disabled():
+            log.disabled[-1][1] = self._end()
 
     def disable_all_logs(self):
         for log_id in self._logs:
@@ -79,10 +270,87 @@ class _OutputLogger(object):
         for log_id in self._logs:
             self.enable_log(log_id)
 
+    def _capture(self, msg, visible):
+        for captured in self._captures:
+            captured.add(msg, visible, self._max_log_size)
+
+    def _log(self, msg):
+        if not self._logs:
+            return
+        self._chunks.append(msg)
+        if self._max_log_size:
+            self._unchecked += len(msg)
+            # No log can keep more than the limit until another half of the
+            # limit has been written, so sizes are only checked that often.
+            if self._unchecked > self._max_log_size // 2:
+                self._limit_logs()
+
+    def _limit_logs(self):
+        """Moves the contents of every log that keeps more than the size
+        limit of the shared list into the log itself, truncating its middle
+        if it is over the limit, and discards chunks that no log needs any
+        more. Each log then keeps at most the limit, whatever the others
+        keep.
+        """
+        self._unchecked = 0
+        if not self._max_log_size or not self._logs:
+            return
+        half = self._max_log_size // 2
+        end = self._end()
+        # Number of characters in the shared list from each position on.
+        sizes = [0] * (len(self._chunks) + 1)
+        for i in range(len(self._chunks) - 1, -1, -1):
+            sizes[i] = sizes[i + 1] + len(self._chunks[i])
+        for log in self._logs.values():
+            kept = sizes[log.start - self._offset]
+            if log.head is None and kept <= self._max_log_size:
+                continue
+            elif log.head is not None and kept + len(log.tail) <= half:
+                continue
+            recent = log.tail + ''.join(self._visible_chunks(log))
+            if log.head is None and len(recent) > self._max_log_size:
+                log.head = recent[:half]
+                recent = recent[half:]
+            if log.head is not None and len(recent) > half:
+                tail = recent[-half:] if half else ''
+                log.dropped += len(recent) - len(tail)
+                recent = tail
+            log.tail = recent
+            log.start = end
+            log.disabled = [[end, None]] if log.is_disabled() else []
+        first = min(log.start for log in self._logs.values())
+        del self._chunks[:first - self._offset]
+        self._offset = first
+
+    def _visible_chunks(self, log):
+        position = log.start
+        for start, end in log.disabled:
+            yield from self._chunks[position - self._offset:start - self._offset]
+            position = self._end() if end is None else end
+        yield from self._chunks[position - self._offset:]
+
+    def _end(self):
+        """Returns the position after the last chunk written."""
+        return self._offset + len(self._chunks)
+
     # TODO(albert): rewrite this to be cleaner.
     def __getattr__(self, attr):
         return getattr(self._current_stream, attr)
 
+class _Recorder(io.TextIOBase):
+    def __init__(self, chunks, visible, limit):
+        self._chunks = chunks
+        self._visible = visible
+        self._limit = limit
+
+    @property
+    def encoding(self):
+        return 'utf-8'
+
+    def write(self, msg):
+        self._chunks.add(msg, self._visible, self._limit)
+        return len(msg)
+
 _logger = sys.stdout = _OutputLogger()
 
 def on():
@@ -97,12 +365,36 @@ def get_log(log_id):
 def new_log():
     return _logger.new_log()
 
+def is_truncated(log_id):
+    return _logger.is_truncated(log_id)
+
+def silence():
+    _logger.silence()
+
+def set_max_log_size(size):
+    _logger.set_max_log_size(size)
+
 def remove_log(log_id):
     _logger.remove_log(log_id)
 
 def remove_all_logs():
     _logger.remove_all_logs()
 
+def is_on():
+    return _logger.is_on()
+
+def record():
+    return _logger.record()
+
+def replay(chunks):
+    _logger.replay(chunks)
+
+def capture():
+    return _logger.capture()
+
+def end_capture(chunks):
+    _logger.end_capture(chunks)
+
 def disable_log(log_id):
     _logger.disable_log(log_id)
 
@@ -0,0 +1,153 @@
+"""Runs tests in forked worker processes, for --jobs and --fork-cases."""
+
+from client.utils import output
+from client.utils import timer
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import sys
+import threading
+import traceback
+
+log = logging.getLogger(__name__)
+
+# (function, items) for the current pool. Workers are forked, so they
+# inherit this instead of receiving pickled tests.
+_work = None
+
+# (thread, timeout) for background threads that should finish before the
+# process forks.
+_threads_to_join = []
+
+def can_fork():
+    """Returns whether this platform can run work in forked processes. Only
+    Linux forks: macOS system libraries are not safe to use in a forked
+    child.
+    """
+    return sys.platform.startswith('linux') \
+        and 'fork' in multiprocessing.get_all_start_methods()
+
+def join_before_fork(thread, timeout=None):
+    """Makes prepare_fork() wait up to TIMEOUT seconds for THREAD to finish
+    before forking.
+    """
+    _threads_to_join.append((thread, timeout))
+
+def prepare_fork():
+    """Stops or waits for the other threads of this process, and returns
+    whether it can fork now. A child forked while another thread runs only
+    inherits that thread's locks, not the thread, and may deadlock on them,
+    so the process only forks when no other thread is left: for example, not
+    after a timed-out call left a worker thread running.
+    """
+    if not can_fork():
+        return False
+    for thread, timeout in _threads_to_join:
+        thread.join(timeout)
+    _threads_to_join[:] = [(thread, timeout)
+                           for thread, timeout in _threads_to_join
+                           if thread.is_alive()]
+    timer.stop_idle_workers()
+    others = _other_threads()
+    if others:
+        log.info('Not forking while other threads run: %s',
+                 ', '.join(thread.name for thread in others))
+        return False
+    return True
+
+def _other_threads():
+    current = threading.current_thread()
+    return [thread for thread in threading.enumerate()
+            if thread is not current and thread.is_alive()]
+
+def imap(fn, items, jobs=1):
+    """Yields FN(item) for each item in ITEMS, in order.
+
+    If JOBS is greater than 1, the calls are made in a pool of up to JOBS
+    forked worker processes. The output of each call is replayed in this
+    process just before its result is yielded, so it appears in the same
+    order as when running sequentially. If a call raises an exception, its
+    output is replayed before the exception is raised here. Results must be
+    picklable. Closing the generator early terminates any outstanding calls.
+
+    If the process cannot fork (see prepare_fork()), the calls are made
+    sequentially.
+    """
+    global _work
+    items = list(items)
+    if jobs <= 1 or len(items) <= 1 or not prepare_fork():
+        for item in items:
+            yield fn(item)
+        return
+
+    jobs = min(jobs, len(items))
+    log.info('Running {} items in {} worker processes'.format(len(items), jobs))
+    _work = (fn, items)
+    pool = multiprocessing.get_context('fork').Pool(jobs)
+    try:
+        for result, chunks, error in pool.imap(_call, range(len(items))):
+            output.replay(chunks)
+            if error is not None:
+                exception, worker_traceback = error
+                log.info('Worker raised an exception:\n%s', worker_traceback)
+                raise exception
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+        _work = None
+
+def _call(index):
+    fn, items = _work
+    chunks = output.record()
+    try:
+        return fn(items[index]), chunks, None
+    except Exception as e:
+        worker_traceback = traceback.format_exc()
+        try:
+            pickle.dumps(e)
+        except Exception:
+            e = RuntimeError(worker_traceback)
+        return None, chunks, (e, worker_traceback)
+
+def call_in_child(fn):
+    """Calls FN in a forked child process and returns its result, which must
+    be picklable. The child's output is replayed in this process, and any
+    other changes FN makes to the process are discarded with the child.
+
+    RAISES:
+    ChildProcessError -- if the child exits without returning a result.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.close(read_fd)
+            chunks = output.record()
+            data = pickle.dumps((fn(), chunks))
+            with os.fdopen(write_fd, 'wb') as f:
+                f.write(data)
+            status = 0
+        except BaseException:
+            traceback.print_exc(file=sys.__stderr__)
+        finally:
+            os._exit(status)
+
+    os.close(write_fd)
+    try:
+        with os.fdopen(read_fd, 'rb') as f:
+            data = f.read()
+    except BaseException:
+        os.kill(pid, signal.SIGKILL)
+        raise
+    finally:
+        _, status = os.waitpid(pid, 0)
+    if not data:
+        raise ChildProcessError('child process exited with status {}'.format(
+            os.waitstatus_to_exitcode(status)))
+    result, chunks = pickle.loads(data)
+    output.replay(chunks)
+    return result
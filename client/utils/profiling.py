@@ -0,0 +1,169 @@
+"""Startup profiling for OK, enabled with --profile-startup.
+
+Records how long each module takes to import and how long the main startup
+phases take, then prints a sorted report to stderr and writes it as JSON when
+the process exits. This module only depends on the standard library so that it
+can be enabled before anything else is imported.
+"""
+
+import atexit
+import collections
+import functools
+import json
+import sys
+import time
+
+FLAG = '--profile-startup'
+DEFAULT_REPORT_FILE = 'ok_startup_profile.json'
+REPORT_LENGTH = 25
+
+_profile = None
+
+class _Profile(object):
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.report_file = DEFAULT_REPORT_FILE
+        # module name -> (cumulative seconds, self seconds)
+        self.imports = collections.OrderedDict()
+        # phase name -> [calls, seconds]
+        self.phases = collections.OrderedDict()
+        # Time spent in nested imports, one entry per import in progress.
+        self.import_stack = []
+        self.finder = _TimingFinder()
+
+class _TimingFinder(object):
+    """A meta path finder that defers to the other finders, but wraps their
+    loaders so that module execution is timed.
+    """
+
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader)
+                return spec
+        return None
+
+class _TimedLoader(object):
+    def __init__(self, loader):
+        self.loader = loader
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        # Hide this wrapper from the module; things like certifi read data
+        # through module.__loader__.
+        module.__loader__ = self.loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self.loader
+        profile = _profile
+        if profile is None:
+            return self.loader.exec_module(module)
+        profile.import_stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = profile.import_stack.pop()
+            if profile.import_stack:
+                profile.import_stack[-1] += elapsed
+            profile.imports[module.__name__] = (elapsed, elapsed - nested)
+
+    def __getattr__(self, attr):
+        return getattr(self.loader, attr)
+
+def requested(argv=None):
+    """Returns whether --profile-startup appears in ARGV (sys.argv by
+    default).
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    return any(arg == FLAG or arg.startswith(FLAG + '=') for arg in argv)
+
+def enable(report_file=None):
+    """Starts profiling, if it has not started already. The report is
+    written to REPORT_FILE when the process exits.
+    """
+    global _profile
+    if _profile is None:
+        _profile = _Profile()
+        sys.meta_path.insert(0, _profile.finder)
+        atexit.register(report)
+    if report_file:
+        _profile.report_file = report_file
+
+def disable():
+    """Stops profiling without writing a report."""
+    global _profile
+    if _profile is None:
+        return
+    if _profile.finder in sys.meta_path:
+        sys.meta_path.remove(_profile.finder)
+    atexit.unregister(report)
+    _profile = None
+
+def is_enabled():
+    return _profile is not None
+
+def timed(name):
+    """Decorator that records the time spent in calls to the decorated
+    function as the startup phase NAME, if profiling is enabled.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profile = _profile
+            if profile is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                phase = profile.phases.setdefault(name, [0, 0.0])
+                phase[0] += 1
+                phase[1] += time.perf_counter() - start
+        return wrapper
+    return decorator
+
+def get_report():
+    """Returns the current profile as a JSON-serializable dict."""
+    profile = _profile
+    if profile is None:
+        return None
+    imports = sorted(profile.imports.items(), key=lambda item: -item[1][1])
+    phases = sorted(profile.phases.items(), key=lambda item: -item[1][1])
+    return {
+        'total': time.perf_counter() - profile.start,
+        'phases': [{'name': name, 'calls': calls, 'seconds': seconds}
+                   for name, (calls, seconds) in phases],
+        'imports': [{'module': name, 'seconds': cumulative, 'self': own}
+                    for name, (cumulative, own) in imports],
+    }
+
+def report():
+    """Prints the profile to stderr and writes it to the report file."""
+    data = get_report()
+    if data is None:
+        return
+    out = sys.__stderr__
+    print('Startup profile ({:.3f}s total)'.format(data['total']), file=out)
+    print('  Phases:', file=out)
+    for phase in data['phases']:
+        print('    {:>9.2f} ms  {} ({} calls)'.format(
+            phase['seconds'] * 1000, phase['name'], phase['calls']), file=out)
+    print('  Slowest imports (self / cumulative):', file=out)
+    for entry in data['imports'][:REPORT_LENGTH]:
+        print('    {:>9.2f} ms  {:>9.2f} ms  {}'.format(
+            entry['self'] * 1000, entry['seconds'] * 1000, entry['module']),
+            file=out)
+    try:
+        with open(_profile.report_file, 'w') as f:
+            json.dump(data, f, indent=2)
+    except OSError as e:
+        print('Could not write {}: {}'.format(_profile.report_file, e), file=out)
+    else:
+        print('Wrote startup profile to {}'.format(_profile.report_file), file=out)
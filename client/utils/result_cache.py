@@ -0,0 +1,180 @@
+"""A local cache of test results, so that tests are not run again when nothing
+they depend on has changed.
+
+Each entry is keyed by a hash of the test's definition, the contents of the
+assignment's files, the options that affect grading, and the versions of OK
+and Python. The assignment's files are its source files and every other file
+with the same extension in their directories, so that helper modules are
+covered; other files a test reads, such as data files or modules in other
+directories, are not. Only results with no failed or locked cases are cached,
+so that a timeout or another failure that may not happen again is not
+replayed. An entry holds the results of the test along with its output, which
+is replayed on a hit. Entries are evicted least recently used first once the
+cache outgrows its size limit.
+"""
+
+import client
+import collections
+import hashlib
+import logging
+import os
+import pickle
+import sys
+
+from client.utils import cache
+
+log = logging.getLogger(__name__)
+
+RESULT_CACHE_FILE = os.path.join(cache.CACHE_DIRECTORY, 'results')
+
+# Ceiling on the total size, in bytes, of the pickled entries.
+DEFAULT_MAX_SIZE = 2 ** 24
+
+class ResultCache(object):
+    """A persistent mapping of test -> (results, output) for the current
+    contents of the source files.
+
+    The cache is read lazily on first use and only written back by save() if
+    it was modified.
+    """
+
+    def __init__(self, src, options=(), path=RESULT_CACHE_FILE,
+                 max_size=DEFAULT_MAX_SIZE):
+        """
+        PARAMETERS:
+        src      -- list of str; the assignment's source files. Other files
+                    with the same extensions in their directories are
+                    also part of the key.
+        options  -- tuple; anything else that affects the results, such as
+                    command-line options
+        path     -- str; where the cache is stored
+        max_size -- int; the total size of the entries kept, in bytes
+        """
+        self.path = path
+        self.max_size = max_size
+        self._base = _hash((client.__version__, sys.version, options,
+                            [(path, _digest(path))
+                             for path in _assignment_files(src)]))
+        # key -> (results, chunks, size), least recently used first.
+        self._entries = None
+        self._size = 0
+        self._dirty = False
+
+    def key(self, test):
+        """Returns the key for TEST, or None if its results cannot be
+        cached because its definition cannot be read.
+        """
+        path = getattr(test, 'file', None)
+        if not isinstance(path, str):
+            return None
+        digest = _digest(path)
+        if digest is None:
+            return None
+        cls = type(test)
+        return _hash((self._base, cls.__module__, cls.__name__, test.name,
+                      path, digest))
+
+    def get(self, key):
+        """Returns (results, chunks) stored for KEY, where CHUNKS is the
+        output of the test as returned by output.capture(), or None.
+        """
+        entries = self._load()
+        if key is None or key not in entries:
+            return None
+        # Only the order changes, which is not worth writing the cache for.
+        entries.move_to_end(key)
+        results, chunks, _ = entries[key]
+        return results, chunks
+
+    def put(self, key, results, chunks):
+        """Stores RESULTS and CHUNKS for KEY, unless any case failed or is
+        locked, or the output was too long to be captured in full.
+        """
+        if key is None or results['failed'] or results['locked'] \
+                or getattr(chunks, 'dropped', 0):
+            return
+        try:
+            size = len(pickle.dumps((results, chunks),
+                                    protocol=pickle.HIGHEST_PROTOCOL))
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            log.info('Not caching unpicklable results: %s', e)
+            return
+        entries = self._load()
+        if key in entries:
+            self._size -= entries.pop(key)[2]
+        entries[key] = (results, chunks, size)
+        self._size += size
+        self._dirty = True
+        while self._size > self.max_size and entries:
+            _, (_, _, evicted) = entries.popitem(last=False)
+            self._size -= evicted
+
+    def save(self):
+        """Writes the cache to disk if it has changed. Failures are logged and
+        otherwise ignored, since the cache is only an optimization.
+        """
+        if not self._dirty:
+            return
+        tmp_path = self.path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((client.__version__, self._entries), f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except (OSError, pickle.PicklingError) as e:
+            log.warning('Unable to save %s: %s', self.path, e)
+        else:
+            self._dirty = False
+
+    def _load(self):
+        if self._entries is not None:
+            return self._entries
+        self._entries = collections.OrderedDict()
+        try:
+            with open(self.path, 'rb') as f:
+                version, entries = pickle.load(f)
+        except FileNotFoundError:
+            return self._entries
+        except Exception as e:
+            log.info('Ignoring unreadable %s: %s', self.path, e)
+            return self._entries
+        if version == client.__version__ and isinstance(
+                entries, collections.OrderedDict):
+            self._entries = entries
+            self._size = sum(size for _, _, size in entries.values())
+        return self._entries
+
+def clear(path=RESULT_CACHE_FILE):
+    """Deletes the cache stored at PATH."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        log.warning('Unable to remove %s: %s', path, e)
+
+def _assignment_files(src):
+    """Returns the sorted paths of the SRC files and of the other files with
+    the same extensions in their directories.
+    """
+    files = set(src)
+    extensions = {os.path.splitext(path)[1] for path in src}
+    for directory in {os.path.dirname(path) for path in src}:
+        try:
+            names = os.listdir(directory or os.curdir)
+        except OSError:
+            continue
+        files.update(os.path.join(directory, name) for name in names
+                     if os.path.splitext(name)[1] in extensions
+                     and os.path.isfile(os.path.join(directory, name)))
+    return sorted(files)
+
+def _digest(path):
+    try:
+        return cache.file_digest(path)
+    except OSError:
+        return None
+
+def _hash(value):
+    return hashlib.sha256(repr(value).encode('utf-8')).hexdigest()
@@ -1,14 +1,21 @@
+import json
 import logging
 import os
+import threading
+import time
 import requests
 
+from client.utils import config
+from client.utils import parallel
 from client.utils.printer import print_error, print_success
 
 log = logging.getLogger(__name__)
 
 VERSION_ENDPOINT = 'https://{server}/api/v3/version/ok-client'
+VERSION_CACHE_FILE = os.path.join(config.CONFIG_DIRECTORY, 'version_check.json')
 
 SHORT_TIMEOUT = 15  # seconds
+DEFAULT_TTL = 60 * 60  # seconds between checks with the server
 
 def check_version(server, version, filename, timeout=SHORT_TIMEOUT):
     """Check for the latest version of OK and update accordingly."""
@@ -34,13 +41,136 @@ def check_version(server, version, filename, timeout=SHORT_TIMEOUT):
         log.info('Malformed response from %s: %s', address, response.text)
         return False
 
-    current_version = response_json['data']['results'][0]['current_version']
+    latest = response_json['data']['results'][0]
+    return _update(version, filename, latest['current_version'],
+                   latest['download_link'], timeout)
+
+class UpdateCheck(threading.Thread):
+    """Checks for the latest version of OK in a background thread, so that
+    the check overlaps with running tests.
+
+    The server's answer is cached in VERSION_CACHE_FILE and reused for TTL
+    seconds. After that it is revalidated with a conditional request, so the
+    server usually only has to answer "304 Not Modified". Nothing is printed
+    until finish() is called from the main thread.
+    """
+
+    def __init__(self, server, version, filename, ttl=DEFAULT_TTL,
+                 timeout=SHORT_TIMEOUT):
+        super().__init__()
+        self.daemon = True
+        self.server = server
+        self.version = version
+        self.filename = filename
+        self.ttl = ttl
+        self.timeout = timeout
+        self.latest = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.latest = _get_latest_version(self.server, self.ttl,
+                                              self.timeout)
+        except Exception as e:
+            self.error = e
+
+    def finish(self):
+        """Waits for the check to complete and updates OK if the server
+        reported a different version. Returns True if OK is up to date.
+        """
+        self.join(self.timeout)
+        if self.is_alive():
+            print_error('Network error when checking for updates.')
+            log.warning('Timed out checking version from %s', self.server)
+            return False
+        if self.error is not None:
+            if isinstance(self.error, ValueError):
+                print_error('Error while checking updates: malformed server response')
+            else:
+                print_error('Network error when checking for updates.')
+            log.warning('Error when checking version from %s: %s',
+                        self.server, str(self.error))
+            return False
+        return _update(self.version, self.filename,
+                       self.latest['current_version'],
+                       self.latest['download_link'], self.timeout)
+
+def check_version_async(server, version, filename, ttl=DEFAULT_TTL):
+    """Starts and returns an UpdateCheck."""
+    update_check = UpdateCheck(server, version, filename, ttl)
+    update_check.start()
+    # finish() waits for the check anyway, so forking test workers may as
+    # well wait for it than fork while it is inside requests.
+    parallel.join_before_fork(update_check, update_check.timeout)
+    return update_check
+
+def _get_latest_version(server, ttl, timeout):
+    """Returns the server's latest version info, a dict with the keys
+    "current_version" and "download_link", using the cache when possible.
+    """
+    address = VERSION_ENDPOINT.format(server=server)
+    cached = _read_cache()
+    if cached.get('address') != address:
+        cached = {}
+    elif time.time() - cached.get('checked', 0) < ttl:
+        log.info('Using cached version check from %s', address)
+        return cached['latest']
+
+    headers = {}
+    if cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    log.info('Checking latest version from %s', address)
+    response = requests.get(address, timeout=timeout, headers=headers)
+    etag = response.headers.get('ETag')
+    if response.status_code == 304 and cached:
+        log.info('Latest version unchanged since last check')
+        latest = cached['latest']
+        # Servers may leave the ETag out of a 304 response.
+        etag = etag or cached.get('etag')
+    else:
+        response.raise_for_status()
+        response_json = response.json()
+        if not _validate_api_response(response_json):
+            raise ValueError('malformed response from {}'.format(address))
+        result = response_json['data']['results'][0]
+        latest = {
+            'current_version': result['current_version'],
+            'download_link': result['download_link'],
+        }
+    _write_cache({
+        'address': address,
+        'checked': time.time(),
+        'etag': etag,
+        'latest': latest,
+    })
+    return latest
+
+def _read_cache():
+    try:
+        with open(VERSION_CACHE_FILE) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cached, dict) or not isinstance(cached.get('latest'), dict):
+        return {}
+    return cached
+
+def _write_cache(data):
+    tmp_file = VERSION_CACHE_FILE + '.tmp'
+    try:
+        config.create_config_directory()
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_file, VERSION_CACHE_FILE)
+    except OSError as e:
+        log.warning('Unable to write %s: %s', VERSION_CACHE_FILE, str(e))
+
+def _update(version, filename, current_version, download_link, timeout):
+    """Downloads and installs CURRENT_VERSION unless VERSION is already it."""
     if current_version == version:
         print_success('OK is up to date')
         return True
 
-    download_link = response_json['data']['results'][0]['download_link']
-
     log.info('Downloading version %s from %s', current_version, download_link)
 
     try:
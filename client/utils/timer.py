@@ -1,6 +1,8 @@
 """Timeout mechanism."""
 
 from client import exceptions
+import os
+import queue
 import threading
 import traceback
 
@@ -8,6 +10,10 @@ def timed(timeout, fn, args=(), kargs={}):
     """For a nonzero timeout, evaluates a call expression in a separate thread.
     If the timeout is 0, the expression is evaluated in the main thread.
 
+    Evaluations are served by long-lived worker threads rather than a new
+    thread per call. A worker is only abandoned when a call times out, since
+    it may never finish.
+
     PARAMETERS:
     fn      -- function; Python function to be evaluated
     args    -- tuple; positional arguments for fn
@@ -24,25 +30,25 @@ def timed(timeout, fn, args=(), kargs={}):
     if timeout == 0:
         return fn(*args, **kargs)
 
-    submission = __ReturningThread(fn, args, kargs)
-    submission.start()
-    submission.join(timeout)
-    if submission.is_alive():
+    job = _Job(fn, args, kargs)
+    worker = _get_worker()
+    worker.submit(job)
+    if not job.done.wait(timeout):
+        worker.abandon()
         raise exceptions.Timeout(timeout)
-    if submission.error is not None:
-        raise submission.error
-    return submission.result
+    _release_worker(worker)
+    if job.error is not None:
+        raise job.error
+    return job.result
 
-class __ReturningThread(threading.Thread):
-    """Creates a daemon Thread with a result variable."""
+class _Job(object):
     def __init__(self, fn, args, kargs):
-        super().__init__()
-        self.daemon = True
-        self.result = None
-        self.error = None
         self.fn = fn
         self.args = args
         self.kargs = kargs
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
 
     def run(self):
         try:
@@ -50,4 +56,78 @@ class __ReturningThread(threading.Thread):
         except Exception as e:
             e._message = traceback.format_exc(limit=2)
             self.error = e
+        except BaseException:
+            # A thread that raises SystemExit just stops; the call returns
+            # None, as when each call had its own thread.
+            pass
+        finally:
+            self.done.set()
+
+class _Worker(threading.Thread):
+    """A daemon Thread that runs submitted jobs one at a time."""
+    def __init__(self):
+        super().__init__()
+        self.daemon = True
+        self._jobs = queue.SimpleQueue()
+
+    def submit(self, job):
+        self._jobs.put(job)
+
+    def abandon(self):
+        """Tells this stuck worker to exit if its job ever finishes."""
+        self._jobs.put(None)
+
+    def run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            job.run()
+
+# Workers waiting for a job. Calls made while every worker is busy (e.g.
+# nested calls) get a new worker.
+_idle_workers = []
+_lock = threading.Lock()
+
+def _get_worker():
+    with _lock:
+        if _idle_workers:
+            return _idle_workers.pop()
+    worker = _Worker()
+    worker.start()
+    return worker
+
+def _release_worker(worker):
+    with _lock:
+        _idle_workers.append(worker)
+
+def discard_idle_workers():
+    """Makes later calls start new worker threads, e.g. so that they run
+    under a tracer that was installed after the idle workers started.
+    """
+    with _lock:
+        workers = _idle_workers[:]
+        del _idle_workers[:]
+    for worker in workers:
+        worker.abandon()
+
+def stop_idle_workers():
+    """Stops the idle workers and waits for them to exit, so that no worker
+    thread is left running unless it is stuck in a call that timed out.
+    """
+    with _lock:
+        workers = _idle_workers[:]
+        del _idle_workers[:]
+    for worker in workers:
+        worker.abandon()
+    for worker in workers:
+        worker.join()
+
+def _reset_after_fork():
+    # Threads do not survive a fork, so workers from the parent are gone.
+    global _lock
+    _lock = threading.Lock()
+    del _idle_workers[:]
 
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,8 +1,12 @@
 from client import exceptions as ex
 from client.api import assignment
 from client.sources.common import core
+from client.utils import encryption
 import collections
 import mock
+import os
+import shutil
+import tempfile
 import unittest
 
 class LoadAssignmentTest(unittest.TestCase):
@@ -143,6 +147,8 @@ class AssignmentTest(unittest.TestCase):
         self.mockModule.load.return_value = {
             self.FILE1: self.mockTest
         }
+        # By default, sources cannot name their tests without loading them.
+        self.mockModule.index.return_value = None
         self.mockImportModule.return_value = self.mockModule
 
     def makeAssignment(self, tests=None, protocols=None, default_tests=None):
@@ -386,6 +392,83 @@ class AssignmentTest(unittest.TestCase):
         except ex.LoadingException:
             self.fail('It is ok for no protocols to be specified')
 
+    def testConstructor_specifiedTest_onlyLoadsIndexedMatch(self):
+        self.cmd_args.question = [self.QUESTION2]
+        self.mockFindFiles.return_value = self.FILES
+        self.mockModule.index.side_effect = lambda file, parameter: [file]
+        self.mockModule.load.side_effect = lambda file, parameter, assign: {
+            file: self.mockTest
+        }
+        assign = self.makeAssignment()
+
+        self.mockModule.load.assert_called_once_with(self.FILE2, '', assign)
+        self.assertEqual([self.mockTest], assign.specified_tests)
+
+        # Accessing test_map loads the remaining tests in config order.
+        self.assertEqual([self.FILE1, self.FILE2], list(assign.test_map))
+
+    def testConstructor_defaultTests_onlyLoadsIndexedMatch(self):
+        self.cmd_args.question = []
+        self.mockFindFiles.return_value = self.FILES
+        self.mockModule.index.side_effect = lambda file, parameter: [file]
+        self.mockModule.load.side_effect = lambda file, parameter, assign: {
+            file: self.mockTest
+        }
+        assign = self.makeAssignment(default_tests=[self.QUESTION1])
+
+        self.mockModule.load.assert_called_once_with(self.FILE1, '', assign)
+        self.assertEqual([self.mockTest], assign.specified_tests)
+
+    def testConstructor_allTests_loadsEverything(self):
+        self.cmd_args.question = []
+        self.cmd_args.all = True
+        self.mockFindFiles.return_value = self.FILES
+        self.mockModule.index.side_effect = lambda file, parameter: [file]
+        self.mockModule.load.side_effect = lambda file, parameter, assign: {
+            file: self.mockTest
+        }
+        assign = self.makeAssignment(default_tests=[self.QUESTION1])
+
+        self.assertEqual(2, self.mockModule.load.call_count)
+        self.assertEqual([self.mockTest, self.mockTest], assign.specified_tests)
+
+    def testProtocols_onlyActiveProtocolsLoaded(self):
+        for flag in ('testing', 'style', 'collab', 'lock', 'score', 'trace'):
+            setattr(self.cmd_args, flag, False)
+        self.cmd_args.unlock = True
+        assign = self.makeAssignment()
+
+        imported = [call[0][0] for call in self.mockImportModule.call_args_list]
+        self.assertIn('client.protocols.unlock', imported)
+        self.assertIn('client.protocols.backup', imported)
+        self.assertNotIn('client.protocols.scoring', imported)
+        self.assertIn('scoring', assign.protocol_map)
+        self.assertNotIn('client.protocols.scoring', imported)
+        self.assertEqual(['file_contents', 'grading', 'analytics', 'hinting',
+                          'unlock', 'backup'],
+                         [name for name, _ in assign.protocol_map.active_items()])
+
+    def testProtocols_lookupLoadsInactiveProtocol(self):
+        self.cmd_args.score = False
+        assign = self.makeAssignment()
+
+        assign.protocol_map['scoring']
+        self.mockImportModule.assert_called_with('client.protocols.scoring')
+        self.assertRaises(KeyError, lambda: assign.protocol_map['no_such_protocol'])
+
+    def testProtocols_configuredProtocolsImported(self):
+        self.cmd_args.lock = False
+        assign = self.makeAssignment(protocols=['lock', 'help'])
+
+        self.mockImportModule.assert_any_call('client.protocols.lock')
+        self.assertFalse(assign.protocol_map.is_active('lock'))
+        self.assertNotIn('lock', assign.protocol_map._protocols)
+
+    def testProtocols_configEntryActivatesProtocol(self):
+        assign = self.makeAssignment(protocols=['help'])
+        self.assertTrue(assign.protocol_map.is_active('help'))
+        self.assertFalse(assign.protocol_map.is_active('followup'))
+
     def testDumpTests(self):
         self.mockFindFiles.return_value = self.FILES
         self.mockModule.load.return_value = collections.OrderedDict((
@@ -410,6 +493,68 @@ class AssignmentTest(unittest.TestCase):
         except ex.SerializeException:
             self.fail('If one test fails to dump, continue dumping the rest.')
 
+class AssignmentDecryptionTest(unittest.TestCase):
+    KEYPAGE = 'https://keys.example.com/keys'
+
+    def setUp(self):
+        self.cmd_args = mock.Mock()
+        self.cmd_args.question = []
+        self.cmd_args.all = False
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+        self.patcherGet = mock.patch('requests.get')
+        self.addCleanup(self.patcherGet.stop)
+        self.mockGet = self.patcherGet.start()
+
+        self.patcherPatchRequests = mock.patch(
+            'client.utils.network.patch_requests')
+        self.addCleanup(self.patcherPatchRequests.stop)
+        self.patcherPatchRequests.start()
+
+    def makeEncryptedFiles(self, *names):
+        keys = {}
+        for name in names:
+            path = os.path.join(self.tmpdir, name)
+            key = encryption.generate_key()
+            with open(path, 'w') as f:
+                f.write(encryption.encrypt('x = {!r}\n'.format(name), key))
+            keys[path] = key
+        return keys
+
+    def makeAssignment(self, files, keypage=''):
+        return assignment.Assignment(self.cmd_args, name='Assignment',
+                                     endpoint='endpoint', src=sorted(files),
+                                     tests={}, protocols=[],
+                                     decryption_keypage=keypage)
+
+    def testAttemptDecryption_matchesKeysByHash(self):
+        keys = self.makeEncryptedFiles('a.py', 'b.py', 'c.py')
+        path_a, path_b, path_c = sorted(keys)
+        assign = self.makeAssignment(keys)
+
+        with mock.patch('client.utils.encryption.decrypt',
+                        wraps=encryption.decrypt) as mock_decrypt:
+            decrypted, undecrypted = assign.attempt_decryption(
+                [keys[path_c], keys[path_a]])
+        self.assertEqual([path_a, path_c], decrypted)
+        self.assertEqual([path_b], undecrypted)
+        self.assertEqual(2, mock_decrypt.call_count)
+        with open(path_a) as f:
+            self.assertEqual("x = 'a.py'\n", f.read())
+
+    def testAutoDecrypt_fetchesKeypageOnce(self):
+        keys = self.makeEncryptedFiles('a.py', 'b.py')
+        path_a, path_b = sorted(keys)
+        self.mockGet.return_value.content = keys[path_a].encode('utf-8')
+        assign = self.makeAssignment(keys, keypage=self.KEYPAGE)
+
+        self.assertEqual([path_a], assign.auto_decrypt())
+        self.assertEqual([path_a], assign.auto_decrypt())
+        self.assertEqual([], assign.attempt_decryption([])[0])
+        self.mockGet.assert_called_once_with(self.KEYPAGE)
+
 class AssignmentGradeTest(unittest.TestCase):
     CONFIG = """
     {
@@ -1,7 +1,9 @@
 """Tests the UnlockProtocol."""
 
+from client.cli import ok
 from client.protocols import grading
 from client.sources.common import models
+from client.utils import output
 import mock
 import unittest
 
@@ -12,6 +14,10 @@ class GradingProtocolTest(unittest.TestCase):
         self.cmd_args.unlock = False
         self.cmd_args.restore = False
         self.cmd_args.testing = False
+        self.cmd_args.failed_first = False
+        self.cmd_args.changed = False
+        self.cmd_args.no_cache = True
+        self.cmd_args.clear_cache = False
         self.assignment = mock.Mock()
         self.proto = grading.protocol(self.cmd_args, self.assignment)
 
@@ -68,3 +74,192 @@ class GradingProtocolTest(unittest.TestCase):
         results = messages['grading']
         self.assertIn('test1', results)
         self.assertIn('test2', results)
+
+    def testRun_jobsKeepsOrderAndStopsAtFirstFailure(self):
+        self.cmd_args.interactive = False
+        self.cmd_args.verbose = False
+        self.cmd_args.jobs = 2
+        tests = []
+        for i, failed in enumerate([0, 1, 0]):
+            test = mock.Mock(spec=models.Test)
+            test.name = 'test{}'.format(i)
+            test.run.return_value = {
+                'passed': 1 - failed,
+                'failed': failed,
+                'locked': 0,
+            }
+            tests.append(test)
+        self.assignment.specified_tests = tests
+
+        with mock.patch('client.utils.storage.store') as mock_store:
+            results = self.callRun()
+        self.assertEqual(['test0', 'test1'], list(results))
+        mock_store.assert_called_once_with('test0', 'correct', True)
+
+    def testRun_emitsEvents(self):
+        self.cmd_args.interactive = False
+        self.cmd_args.jobs = 1
+        test = mock.Mock(spec=models.Test)
+        test.name = 'test1'
+        test.run.return_value = {
+            'passed': 1,
+            'failed': 0,
+            'locked': 0,
+        }
+        self.assignment.specified_tests = [test]
+
+        with mock.patch('client.utils.events.emit') as mock_emit:
+            self.callRun()
+        names = [call[0][0] for call in mock_emit.call_args_list]
+        self.assertEqual(['run_started', 'test_started', 'test_finished',
+                          'run_finished'], names)
+        self.assertEqual(1, mock_emit.call_args_list[2][1]['passed'])
+
+    def makeTests(self, failures):
+        tests = []
+        for i, failed in enumerate(failures):
+            test = mock.Mock(spec=models.Test)
+            test.name = 'test{}'.format(i)
+            test.run.return_value = {
+                'passed': 1 - failed,
+                'failed': failed,
+                'locked': 0,
+            }
+            tests.append(test)
+        return tests
+
+    def testFailedFirst_order(self):
+        tests = self.makeTests([0, 0, 0, 0, 0])
+        history = {
+            'question': ['test3'],
+            'questions': {
+                'test0': {'attempts': 1, 'solved': True},
+                'test2': {'attempts': 2, 'solved': False},
+                'test3': {'attempts': 1, 'solved': False},
+            },
+        }
+        self.assertEqual(['test3', 'test2', 'test1', 'test4', 'test0'],
+                         [t.name for t in grading.failed_first(tests, history)])
+
+    def testFailedFirst_noHistory(self):
+        tests = self.makeTests([0, 0])
+        self.assertEqual(tests, grading.failed_first(tests, {}))
+
+    def testRun_failedFirstReportsInConfigOrder(self):
+        self.cmd_args.interactive = False
+        self.cmd_args.verbose = True
+        self.cmd_args.jobs = 1
+        self.cmd_args.failed_first = True
+        tests = self.makeTests([0, 1, 0])
+        self.assignment.specified_tests = tests
+        history = {'question': ['test1'], 'questions': {}}
+        run_order = []
+        for test in tests:
+            test.run.side_effect = lambda env, test=test: (
+                run_order.append(test.name) or test.run.return_value)
+
+        with mock.patch('client.protocols.analytics.AnalyticsProtocol.read_history',
+                        return_value=history), \
+                mock.patch('client.utils.storage.store'):
+            results = self.callRun()
+        self.assertEqual(['test1', 'test0', 'test2'], run_order)
+        self.assertEqual(['test0', 'test1', 'test2'], list(results))
+
+    def testRun_failedFirstStopsAtCurrentQuestion(self):
+        self.cmd_args.interactive = False
+        self.cmd_args.verbose = False
+        self.cmd_args.jobs = 1
+        self.cmd_args.failed_first = True
+        tests = self.makeTests([0, 0, 1])
+        for test in tests:
+            test.run.side_effect = lambda env, test=test: (
+                print('ran', test.name) or test.run.return_value)
+        self.assignment.specified_tests = tests
+        history = {
+            'question': ['test2'],
+            'questions': {'test2': {'attempts': 3, 'solved': False}},
+        }
+        messages = {}
+
+        with mock.patch('client.protocols.analytics.AnalyticsProtocol.read_history',
+                        return_value=history), \
+                mock.patch('client.utils.storage.store'), \
+                mock.patch('sys.stdout', output._logger):
+            self.proto.run(messages)
+        self.assertEqual(['test2'], list(messages['grading']))
+        self.assertFalse(tests[0].run.called)
+        self.assertFalse(tests[1].run.called)
+        self.assertIn('ran test2', messages['autograder_output'])
+
+    def testGrade_resultsClosedWhenGradingRaises(self):
+        tests = self.makeTests([0, 0])
+        closed = []
+        def imap(fn, items, jobs=1):
+            try:
+                for item in items:
+                    yield fn(item)
+            finally:
+                closed.append(True)
+
+        with mock.patch('client.utils.parallel.imap', side_effect=imap), \
+                mock.patch('client.utils.storage.store',
+                           side_effect=RuntimeError):
+            try:
+                grading.grade(tests, {})
+            except RuntimeError:
+                # grade()'s frame is still referenced by the traceback, so
+                # only an explicit close() can have closed the generator.
+                self.assertEqual([True], closed)
+            else:
+                self.fail('grade() did not raise')
+        self.assertFalse(tests[1].run.called)
+
+    def testGrade_reuse(self):
+        tests = self.makeTests([0, 1])
+        reused = {'passed': 0, 'failed': 1, 'locked': 0}
+        messages = {}
+        with mock.patch('client.utils.storage.store'):
+            grading.grade(tests, messages, reuse={
+                'test1': (reused, [('test1 output\n', True)])})
+        self.assertTrue(tests[0].run.called)
+        self.assertFalse(tests[1].run.called)
+        self.assertEqual(['test0', 'test1'], list(messages['grading']))
+        self.assertIs(reused, messages['grading']['test1'])
+        self.assertIn('test1 output\n', messages['autograder_output'])
+
+    def testGrade_resultCache(self):
+        tests = self.makeTests([0, 1])
+        cached_results = mock.Mock()
+        cached_results.key.side_effect = lambda test: test.name
+        cached = {'passed': 0, 'failed': 1, 'locked': 0}
+        cached_results.get.side_effect = lambda key: (
+            (cached, [('output\n', True)]) if key == 'test1' else None)
+        messages = {}
+        with mock.patch('client.utils.storage.store'):
+            grading.grade(tests, messages, result_cache=cached_results)
+        self.assertTrue(tests[0].run.called)
+        self.assertFalse(tests[1].run.called)
+        self.assertIs(cached, messages['grading']['test1'])
+        self.assertIn('output\n', messages['autograder_output'])
+        cached_results.put.assert_called_once_with(
+            'test0', tests[0].run.return_value, mock.ANY)
+
+    def resultCacheOptions(self, args):
+        proto = grading.protocol(ok.parse_input(args), self.assignment)
+        with mock.patch('client.utils.result_cache.ResultCache') as cache:
+            self.assertIs(cache.return_value, proto._result_cache(None))
+        return cache.call_args[0][1]
+
+    def testResultCache_keyedOnResultOptions(self):
+        options = self.resultCacheOptions([])
+        self.assertEqual(options, self.resultCacheOptions([]))
+        for args in (['--ignore-empty'], ['--parsons'], ['--fork-cases'],
+                     ['--reuse-setup'], ['--max-output', '10'], ['-v'],
+                     ['--timeout', '5']):
+            self.assertNotEqual(options, self.resultCacheOptions(args))
+
+    def testResultCache_notUsedForPartialRuns(self):
+        for args in (['-i'], ['--suite', '1'], ['--case', '1'],
+                     ['--no-cache']):
+            proto = grading.protocol(ok.parse_input(args), self.assignment)
+            self.assertIsNone(proto._result_cache(None))
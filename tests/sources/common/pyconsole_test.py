@@ -1,8 +1,12 @@
 from client.sources.common import interpreter
 from client.sources.common import pyconsole
-from client.utils import locking, output
+from client.utils import locking, output, parallel
 import client
+import mock
+import os
+import shutil
 import sys
+import tempfile
 import unittest
 
 class PythonConsoleTest(unittest.TestCase):
@@ -336,6 +340,78 @@ class PythonConsoleTest(unittest.TestCase):
         """ % hashedAnswer)
 
 
+    def testError_syntaxError(self):
+        self.calls_interpret(False,
+            """
+            >>> def f(:
+            1
+            """)
+
+    def testPass_raisedSyntaxErrorNotRerun(self):
+        self.calls_interpret(True,
+            """
+            >>> calls = []
+            >>> def f():
+            ...     calls.append(1)
+            ...     raise SyntaxError('from f')
+            >>> f()
+            Traceback (most recent call last):
+              ...
+            SyntaxError: from f
+            >>> len(calls)
+            1
+            """)
+
+    def testPromptsCompiledOnce(self):
+        code = """
+        >>> x = 4
+        >>> x + 1
+        5
+        """
+        self.calls_interpret(True, code)
+        misses = pyconsole._compile.cache_info().misses
+        self.calls_interpret(True, code)
+        self.assertEqual(misses, pyconsole._compile.cache_info().misses)
+
+    def runWithEnv(self, env, code):
+        self.console = self.createConsole()
+        self.console.load_env(env)
+        lines = interpreter.CodeCase.split_code(code, self.console.PS1,
+                                                self.console.PS2)
+        self.console.load(lines)
+        return self.console.interpret()
+
+    def testEnv_functionDeletesGlobal(self):
+        env = {'a': 1}
+        self.assertTrue(self.runWithEnv(env, """
+        >>> def h():
+        ...     global a, b
+        ...     del a
+        ...     b = 2
+        >>> h()
+        >>> 'a' in globals(), b
+        (False, 2)
+        """))
+        self.assertEqual({'a': 1}, env)
+
+    def testEnv_casesDoNotChangeEnv(self):
+        env = {'x': 1, 'items': []}
+        self.assertTrue(self.runWithEnv(env, """
+        >>> x = x + 1
+        >>> del items
+        >>> 'items' in globals()
+        False
+        >>> def f():
+        ...     return x
+        >>> f()
+        2
+        """))
+        self.assertEqual({'x': 1, 'items': []}, env)
+        self.assertTrue(self.runWithEnv(env, """
+        >>> x, items
+        (1, [])
+        """))
+
     def testPassCount_allPassed(self):
         # remove newline from the front because otherwise it counts as a separate test case
         code="""
@@ -370,4 +446,175 @@ class PythonConsoleTest(unittest.TestCase):
         """[1:]
         self.calls_interpret(success=False, code=code, timeout=0.5)
         self.assertEqual(self.console.cases_passed, 1)
-        self.assertEqual(self.console.cases_total, 2)
\ No newline at end of file
+        self.assertEqual(self.console.cases_total, 2)
+
+@unittest.skipUnless(parallel.can_fork(), 'requires fork')
+class ForkingPythonConsoleTest(PythonConsoleTest):
+    def createConsole(self, verbose=True, interactive=False, timeout=None):
+        console = super().createConsole(verbose, interactive, timeout)
+        console.fork_cases = True
+        return console
+
+    def setUp(self):
+        super().setUp()
+        # Threads left running by other tests, such as timed-out calls,
+        # would otherwise stop the cases from forking.
+        patcher = mock.patch.object(parallel, '_other_threads',
+                                    return_value=[])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    # Cases and their teardown run in a child process, so changes they make
+    # to imported modules are discarded with it.
+    def testPass_teardown(self):
+        client.foo = 0
+        self.calls_interpret(True,
+            """
+            >>> 1
+            1
+            """,
+            teardown="""
+            >>> import client
+            >>> client.foo = 1
+            >>> print('torn down')
+            """)
+        self.assertEqual(0, client.foo)
+
+    def testError_teardown(self):
+        client.foo = 0
+        log_id = output.new_log()
+        self.calls_interpret(False,
+            """
+            >>> 1 / 0
+            """,
+            teardown="""
+            >>> print('torn down')
+            """)
+        self.assertIn('torn down', ''.join(output.get_log(log_id)))
+
+    def runCase(self, console, code, setup):
+        lines = interpreter.CodeCase.split_code(code, console.PS1, console.PS2)
+        console.load(lines, setup)
+        return console.interpret()
+
+    def testSetupRunsOnce(self):
+        console = self.createConsole()
+        client.foo = 0
+        setup = """
+        >>> import client
+        >>> client.foo += 1
+        """
+        code = """
+        >>> client.foo
+        1
+        """
+        self.assertTrue(self.runCase(console, code, setup))
+        self.assertTrue(self.runCase(console, code, setup))
+        self.assertEqual(1, client.foo)
+
+    def testOtherThreadsRunning_setupRunEveryCase(self):
+        console = self.createConsole()
+        client.foo = 0
+        setup = """
+        >>> import client
+        >>> client.foo += 1
+        """
+        with mock.patch.object(parallel, 'prepare_fork', return_value=False):
+            self.assertTrue(self.runCase(console, '>>> client.foo\n1', setup))
+            self.assertTrue(self.runCase(console, '>>> client.foo\n2', setup))
+        self.assertEqual(2, client.foo)
+
+    def testCasesAreIsolated(self):
+        console = self.createConsole()
+        setup = """
+        >>> items = []
+        """
+        code = """
+        >>> items.append(1)
+        >>> items
+        [1]
+        """
+        self.assertTrue(self.runCase(console, code, setup))
+        self.assertTrue(self.runCase(console, code, setup))
+
+    def testSetupRunAgainWhenImportedModuleChanges(self):
+        console = self.createConsole()
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(tmpdir)
+        sys.path.insert(0, tmpdir)
+        self.addCleanup(sys.path.remove, tmpdir)
+        self.addCleanup(sys.modules.pop, 'fork_hw', None)
+        def write(value):
+            with open('fork_hw.py', 'w') as f:
+                f.write('value = {}\n'.format(value))
+            os.utime('fork_hw.py', ns=(value, value))
+        setup = """
+        >>> import fork_hw
+        >>> value = fork_hw.value
+        """
+        write(1)
+        self.assertTrue(self.runCase(console, '>>> value\n1', setup))
+        write(2)
+        # As when a module is edited and regraded in the same process.
+        del sys.modules['fork_hw']
+        self.assertTrue(self.runCase(console, '>>> value\n2', setup))
+
+    def testLoadedEnv_setupRunEveryCase(self):
+        console = self.createConsole()
+        env = {'y': 1}
+        console.load_env(env)
+        setup = """
+        >>> x = y + 1
+        """
+        self.assertTrue(self.runCase(console, '>>> x\n2', setup))
+        env['y'] = 5
+        self.assertTrue(self.runCase(console, '>>> x\n6', setup))
+
+    def testSetupOutputRepeated(self):
+        console = self.createConsole()
+        setup = """
+        >>> print('setting up')
+        """
+        log_id = output.new_log()
+        self.runCase(console, '>>> 1\n1', setup)
+        self.runCase(console, '>>> 1\n1', setup)
+        self.assertEqual(2, ''.join(output.get_log(log_id)).count('setting up\n'))
+
+class OverlayFrameTest(unittest.TestCase):
+    def setUp(self):
+        self.base = {'a': 1, 'b': 2}
+        self.frame = pyconsole.OverlayFrame(self.base)
+
+    def testReadsFallThrough(self):
+        self.assertEqual(1, self.frame['a'])
+        self.assertIn('b', self.frame)
+        self.assertEqual({'a': 1, 'b': 2}, self.frame)
+
+    def testWritesStayInOverlay(self):
+        self.frame['a'] = 10
+        self.frame['c'] = 3
+        del self.frame['b']
+        self.assertEqual({'a': 10, 'c': 3}, self.frame)
+        self.assertEqual(2, len(self.frame))
+        self.assertIsNone(self.frame.get('b'))
+        self.assertEqual({'a': 1, 'b': 2}, self.base)
+
+    def testDeletedNameCanBeAssignedAgain(self):
+        del self.frame['a']
+        self.assertRaises(KeyError, lambda: self.frame['a'])
+        self.frame['a'] = 5
+        self.assertEqual(5, self.frame['a'])
+
+    def testDeclaresGlobals(self):
+        self.assertTrue(pyconsole._declares_globals(
+            ['def f():', '    global a']))
+        self.assertFalse(pyconsole._declares_globals(['globals()', 'a = 1']))
+
+    def testExec(self):
+        exec('c = a + b\ndel a', self.frame)
+        self.assertEqual(3, self.frame['c'])
+        self.assertNotIn('a', self.frame)
+        self.assertRaises(NameError, eval, 'a', self.frame)
+        self.assertEqual(1, self.base['a'])
@@ -0,0 +1,41 @@
+from client.sources.common import snapshot
+import unittest
+
+class Frame(object):
+    def __init__(self):
+        self.bindings = {}
+
+class Procedure(object):
+    def __init__(self, env=None):
+        self.env = env
+
+class LoadedFilesTest(unittest.TestCase):
+    def testLoadForms(self):
+        self.assertEqual(['hw', 'hw.scm', 'lib.scm'], snapshot.loaded_files(
+            ["scm> (load 'hw)", 'scm> (load "lib.scm")', 'scm> (+ 1 2)']))
+
+    def testNoLoads(self):
+        self.assertEqual([], snapshot.loaded_files(['scm> (define x 1)']))
+
+class CopyFrameTest(unittest.TestCase):
+    def setUp(self):
+        self.frame = Frame()
+        self.builtin = Procedure()
+        self.closure = Procedure(self.frame)
+        self.frame.bindings.update(builtin=self.builtin, closure=self.closure)
+
+    def testSharedValues_excludeClosures(self):
+        shared = snapshot.shared_values(self.frame)
+        self.assertIn(self.builtin, shared)
+        self.assertNotIn(self.closure, shared)
+
+    def testCopyFrame(self):
+        shared = snapshot.shared_values(self.frame)
+        # Bound by the setup, after the shared values were found.
+        self.frame.bindings['values'] = [1, 2]
+        copied = snapshot.copy_frame(self.frame, shared)
+        self.assertIsNot(self.frame, copied)
+        self.assertIs(self.builtin, copied.bindings['builtin'])
+        self.assertIs(copied, copied.bindings['closure'].env)
+        self.assertIsNot(self.frame.bindings['values'],
+                         copied.bindings['values'])
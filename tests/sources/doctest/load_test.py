@@ -1,7 +1,12 @@
 from client import exceptions as ex
 from client.sources import doctest
 from client.sources.doctest import models
+from client.utils import output
 import mock
+import shutil
+import tempfile
+import textwrap
+import types
 import unittest
 
 import os.path
@@ -145,3 +150,142 @@ class LoadTest(unittest.TestCase):
 
     def testOnlyModuleFunctions_noModuleFunctions(self):
         self._testOnlyModuleFunctions(lambda i: False)
+
+class StaticLoadTest(unittest.TestCase):
+    SOURCE = textwrap.dedent("""
+    def square(x):
+        \"\"\"
+        >>> square(2)
+        4
+        \"\"\"
+        return x * x
+
+    class Shape:
+        def area(self):
+            \"\"\"
+            >>> Shape().area()
+            0
+            \"\"\"
+            return 0
+
+        @property
+        def sides(self):
+            return 0
+
+    class Square(Shape):
+        def sides(self):
+            return 4
+
+    if __name__ == '__main__':
+        def main():
+            pass
+
+    while True:
+        pass
+    """)
+
+    def setUp(self):
+        self.patcherLoadModule = mock.patch('client.sources.common.importing.load_module')
+        self.addCleanup(self.patcherLoadModule.stop)
+        self.mockLoadModule = self.patcherLoadModule.start()
+
+        # Test files are given relative to the assignment directory.
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmpdir)
+        self.file = 'hw.py'
+
+        self.assign = mock.Mock()
+
+    def writeSource(self, source):
+        with open(self.file, 'w') as f:
+            f.write(source)
+
+    def testAllFunctions_withoutImporting(self):
+        self.writeSource(self.SOURCE)
+        result = doctest.load(self.file, '', self.assign)
+
+        self.assertEqual(['Shape', 'Shape.area', 'Square', 'Square.area',
+                          'Square.sides', 'square'], list(result))
+        self.assertIsInstance(result['square'], models.Doctest)
+        self.assertIn('>>> Shape().area()', result['Square.area'].docstring)
+        self.assertEqual('', result['Square.sides'].docstring)
+        self.assertFalse(self.mockLoadModule.called)
+
+    def testIndex(self):
+        self.writeSource(self.SOURCE)
+        self.assertEqual(['Shape', 'Shape.area', 'Square', 'Square.area',
+                          'Square.sides', 'square'],
+                         doctest.index(self.file, ''))
+        self.assertEqual(['square'], doctest.index(self.file, 'square'))
+
+    def testSpecificFunction_withoutImporting(self):
+        self.writeSource(self.SOURCE)
+        result = doctest.load(self.file, 'square', self.assign)
+
+        self.assertEqual(['square'], list(result))
+        self.assertIn('>>> square(2)', result['square'].docstring)
+        self.assertFalse(self.mockLoadModule.called)
+
+    def testConstantAssignments_withoutImporting(self):
+        self.writeSource('LIMIT = 2 ** 10\nNAMES = ["a", "b"]\n' + self.SOURCE)
+        result = doctest.load(self.file, '', self.assign)
+
+        self.assertIn('square', result)
+        self.assertFalse(self.mockLoadModule.called)
+
+    def testAssignedCallables_importsModule(self):
+        self.mockLoadModule.return_value = types.ModuleType('hw')
+        for source in ['f = lambda x: x\n',
+                       'g = make_adder(1)\n',
+                       'class Adder:\n    add = staticmethod(abs)\n',
+                       'for name in ["a"]:\n    pass\n']:
+            self.mockLoadModule.reset_mock()
+            self.writeSource(self.SOURCE + source)
+            self.assertIsNone(doctest.index(self.file, ''))
+            doctest.load(self.file, '', self.assign)
+            self.assertTrue(self.mockLoadModule.called, source)
+
+    def testImportError_reportedWhenRun(self):
+        self.file = 'broken_hw.py'
+        self.writeSource(textwrap.dedent("""
+        def square(x):
+            \"\"\"
+            >>> square(2)
+            4
+            \"\"\"
+            return x * x
+
+        undefined_name
+        """))
+        self.assign.cmd_args = mock.Mock(verbose=False, interactive=False,
+                                         timeout=None, ignore_empty=False,
+                                         parsons=False)
+        test = doctest.load(self.file, 'square', self.assign)['square']
+        self.assertFalse(self.mockLoadModule.called)
+
+        with mock.patch('sys.stdout', output._logger):
+            log_id = output.new_log()
+            try:
+                results = test.run(None)
+                printed = ''.join(output.get_log(log_id))
+            finally:
+                output.remove_log(log_id)
+        self.assertEqual(1, results['failed'])
+        self.assertIn('NameError', printed)
+
+    def testSyntaxError_importsModule(self):
+        self.writeSource('def broken(:\n')
+        self.mockLoadModule.side_effect = SyntaxError
+        self.assertRaises(ex.LoadingException, doctest.load, self.file, '',
+                          self.assign)
+        self.assertIsNone(doctest.index(self.file, ''))
+
+    def testUnchangedFile_notParsedAgain(self):
+        self.writeSource(self.SOURCE)
+        doctest.load(self.file, '', self.assign)
+        with mock.patch('ast.parse') as mock_parse:
+            result = doctest.load(self.file, '', self.assign)
+        self.assertFalse(mock_parse.called)
+        self.assertIn('square', result)
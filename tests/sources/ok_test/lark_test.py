@@ -0,0 +1,59 @@
+from client.sources.common import interpreter
+from client.sources.ok_test import lark
+import mock
+import textwrap
+import unittest
+
+class LarkConsoleTest(unittest.TestCase):
+    GRAMMAR = """
+    start: NUMBER ("+" NUMBER)*
+    %import common.NUMBER
+    %ignore " "
+    """
+
+    def setUp(self):
+        self.console = lark.LarkConsole(False, False)
+        patcher = mock.patch.dict(lark._parsers, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def calls_interpret(self, success, code, setup=GRAMMAR):
+        lines = interpreter.CodeCase.split_code(textwrap.dedent(code),
+                                                self.console.PS1,
+                                                self.console.PS2)
+        self.console.load(lines, setup=textwrap.dedent(setup))
+        self.assertEqual(success, self.console.interpret())
+
+    def testPass(self):
+        self.calls_interpret(True, """
+        lark> 1 + 2
+        start
+          1
+          2
+        """)
+
+    def testFail(self):
+        self.calls_interpret(False, """
+        lark> 1 + 2
+        start
+          1
+        """)
+
+    def testInvalidGrammar(self):
+        self.calls_interpret(False, """
+        lark> 1
+        start
+        """, setup='start: (')
+
+    def testParserBuiltOncePerGrammar(self):
+        with mock.patch.object(lark, 'Lark', wraps=lark.Lark) as mock_lark:
+            for _ in range(3):
+                self.calls_interpret(True, """
+                lark> 1
+                start  1
+                """)
+            self.calls_interpret(True, """
+            lark> 1
+            start  1
+            """, setup=self.GRAMMAR + '\n%ignore "\\t"')
+        self.assertEqual(2, mock_lark.call_count)
@@ -53,3 +53,14 @@ class LoadTest(unittest.TestCase):
         self.assertIn(self.NAME, result)
         self.assertIsInstance(result[self.NAME], models.OkTest)
 
+
+    def testCachedTestSkipsImport(self):
+        cached = {
+                'name': 'test',
+                'points': 4.0,
+                'suites': []
+        }
+        with mock.patch.object(ok_test._test_cache, 'get', return_value=cached):
+            result = self.call_load()
+        self.assertFalse(self.mockLoadModule.called)
+        self.assertIsInstance(result[self.NAME], models.OkTest)
@@ -0,0 +1,183 @@
+from client.sources.common import interpreter
+from client.sources.ok_test import logic
+from client.utils import output
+import mock
+import os
+import sys
+import tempfile
+import textwrap
+import types
+import unittest
+
+class Frame(object):
+    def __init__(self):
+        self.bindings = {}
+
+class Fact(object):
+    def __init__(self, text):
+        self.text = text
+
+def make_module():
+    module = types.ModuleType('logic')
+    module.facts = []
+
+    def scheme_eval(exp, env):
+        form, _, arg = exp.strip('()').partition(' ')
+        if form == 'fact':
+            module.facts.append(Fact(arg))
+        elif form == 'retract':
+            for fact in module.facts:
+                if fact.text.startswith(arg):
+                    fact.text = 'retracted'
+        elif form == 'load':
+            with open(arg) as f:
+                module.facts.append(Fact(f.read()))
+        elif form == 'define':
+            name, value = arg.split()
+            env.bindings[name] = value
+        elif form == 'lookup':
+            return env.bindings[arg]
+        elif form == 'query':
+            for fact in module.facts:
+                if fact.text.startswith(arg):
+                    print('Success!', fact.text)
+        elif form == 'say':
+            print(arg)
+
+    module.read_line = lambda code: code
+    module.scheme_eval = scheme_eval
+    module.create_global_frame = mock.Mock(side_effect=Frame)
+    return module
+
+class LogicConsoleTest(unittest.TestCase):
+    def setUp(self):
+        self.module = make_module()
+        for patcher in (mock.patch.dict(sys.modules, logic=self.module),
+                        mock.patch('sys.stdout', output._logger)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.console = logic.LogicConsole(False, False)
+        self.console.snapshot_setup = True
+        self.eval_calls = []
+        scheme_eval = self.module.scheme_eval
+        def counting_eval(exp, env):
+            self.eval_calls.append(exp)
+            return scheme_eval(exp, env)
+        self.module.scheme_eval = counting_eval
+
+    def calls_interpret(self, success, code, setup=''):
+        lines = interpreter.CodeCase.split_code(textwrap.dedent(code),
+                                                self.console.PS1,
+                                                self.console.PS2)
+        self.console.load(lines, setup=textwrap.dedent(setup))
+        self.assertEqual(success, self.console.interpret())
+
+    def testSetup_evaluatedOnce(self):
+        setup = """
+        logic> (fact parent a b)
+        logic> (define x 1)
+        """
+        code = """
+        logic> (query parent)
+        Success! parent a b
+        logic> (lookup x)
+        1
+        """
+        self.calls_interpret(True, code, setup)
+        self.module.facts[:] = []
+        self.calls_interpret(True, code, setup)
+        self.assertEqual(['(fact parent a b)', '(define x 1)',
+                          '(query parent)', '(lookup x)',
+                          '(query parent)', '(lookup x)'], self.eval_calls)
+
+    def testSetup_factsAddedForEveryCase(self):
+        setup = 'logic> (fact parent a b)'
+        self.calls_interpret(True, """
+        logic> (query parent)
+        Success! parent a b
+        """, setup)
+        # As when the setup is evaluated again, its facts are added again.
+        self.calls_interpret(True, """
+        logic> (query parent)
+        Success! parent a b
+        Success! parent a b
+        """, setup)
+
+    def testSetup_frameCopied(self):
+        setup = 'logic> (define x 1)'
+        self.calls_interpret(True, """
+        logic> (define x 2)
+        logic> (lookup x)
+        2
+        """, setup)
+        self.calls_interpret(True, """
+        logic> (lookup x)
+        1
+        """, setup)
+
+    def testSetup_withOutput_evaluatedEveryCase(self):
+        setup = 'logic> (say hi)'
+        self.calls_interpret(True, 'logic> (say bye)\nbye', setup)
+        self.calls_interpret(True, 'logic> (say bye)\nbye', setup)
+        self.assertEqual(['(say hi)', '(say bye)'] * 2,
+                         self.eval_calls)
+
+    def testSetup_failure(self):
+        setup = 'logic> (lookup missing)'
+        self.calls_interpret(False, 'logic> (say hi)\nhi', setup)
+        self.calls_interpret(False, 'logic> (say hi)\nhi', setup)
+        self.assertEqual(['(lookup missing)'] * 2, self.eval_calls)
+
+    def testSetup_factsCopiedForEveryCase(self):
+        setup = 'logic> (fact parent a b)'
+        self.calls_interpret(True, """
+        logic> (retract parent)
+        logic> (query parent)
+        """, setup)
+        self.module.facts[:] = []
+        self.calls_interpret(True, """
+        logic> (query parent)
+        Success! parent a b
+        """, setup)
+        self.module.facts[:] = []
+        self.calls_interpret(True, """
+        logic> (query parent)
+        Success! parent a b
+        """, setup)
+
+    def testSetup_evaluatedAgainWhenLoadedFileChanges(self):
+        cwd = os.getcwd()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        os.chdir(tmpdir.name)
+        self.addCleanup(os.chdir, cwd)
+
+        with open('hw', 'w') as f:
+            f.write('parent a b')
+        setup = 'logic> (load hw)'
+        self.calls_interpret(True, """
+        logic> (query parent)
+        Success! parent a b
+        """, setup)
+        with open('hw', 'w') as f:
+            f.write('parent abe homer')
+        self.module.facts[:] = []
+        self.calls_interpret(True, """
+        logic> (query parent)
+        Success! parent abe homer
+        """, setup)
+        self.assertEqual(['(load hw)', '(query parent)'] * 2, self.eval_calls)
+
+    def testSnapshotDisabled(self):
+        self.console.snapshot_setup = False
+        setup = 'logic> (fact parent a b)'
+        self.calls_interpret(True, 'logic> (query parent)\nSuccess! parent a b',
+                             setup)
+        self.module.facts[:] = []
+        self.calls_interpret(True, 'logic> (query parent)\nSuccess! parent a b',
+                             setup)
+        self.assertEqual(['(fact parent a b)', '(query parent)'] * 2,
+                         self.eval_calls)
+
+    def testSnapshotDisabledByDefault(self):
+        self.assertFalse(logic.LogicConsole(False, False).snapshot_setup)
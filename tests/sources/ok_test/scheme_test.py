@@ -0,0 +1,196 @@
+from client.sources.common import interpreter
+from client.sources.ok_test import scheme
+import mock
+import os
+import sys
+import tempfile
+import textwrap
+import types
+import unittest
+
+class Frame(object):
+    def __init__(self, parent):
+        self.parent = parent
+        self.bindings = {}
+
+    def define(self, name, value):
+        self.bindings[name] = value
+
+    def lookup(self, name):
+        if name in self.bindings:
+            return self.bindings[name]
+        if self.parent is None:
+            raise SchemeError('unknown identifier: {}'.format(name))
+        return self.parent.lookup(name)
+
+class SchemeError(Exception):
+    pass
+
+class BuiltinProcedure(object):
+    def __init__(self, fn):
+        self.fn = fn
+
+class LambdaProcedure(object):
+    def __init__(self, formals, body, env):
+        self.formals = formals
+        self.body = body
+        self.env = env
+
+def read_line(code):
+    tokens = code.replace('(', ' ( ').replace(')', ' ) ').split()
+    def read(tokens):
+        token = tokens.pop(0)
+        if token != '(':
+            return int(token) if token.lstrip('-').isdigit() else token
+        exp = []
+        while tokens[0] != ')':
+            exp.append(read(tokens))
+        tokens.pop(0)
+        return exp
+    return read(tokens)
+
+def scheme_eval(exp, env):
+    if isinstance(exp, int):
+        return exp
+    elif isinstance(exp, str):
+        return env.lookup(exp)
+    elif exp[0] == 'define':
+        if isinstance(exp[1], list):
+            env.define(exp[1][0], LambdaProcedure(exp[1][1:], exp[2], env))
+            return exp[1][0]
+        env.define(exp[1], scheme_eval(exp[2], env))
+        return exp[1]
+    procedure = scheme_eval(exp[0], env)
+    args = [scheme_eval(arg, env) for arg in exp[1:]]
+    if isinstance(procedure, BuiltinProcedure):
+        return procedure.fn(*args)
+    frame = Frame(procedure.env)
+    for name, value in zip(procedure.formals, args):
+        frame.define(name, value)
+    return scheme_eval(procedure.body, frame)
+
+class SchemeConsoleTest(unittest.TestCase):
+    def setUp(self):
+        self.module = types.ModuleType('scheme')
+        self.module.SchemeError = SchemeError
+        self.module.read_line = read_line
+        self.module.scheme_eval = scheme_eval
+        self.module.create_global_frame = mock.Mock(
+            side_effect=self.create_global_frame)
+        self.module.repl_str = str
+        patcher = mock.patch.dict(sys.modules, scheme=self.module)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.console = scheme.SchemeConsole(False, False)
+        self.console.snapshot_setup = True
+
+    def create_global_frame(self):
+        frame = Frame(None)
+        frame.define('+', BuiltinProcedure(lambda *args: sum(args)))
+        frame.define('hw', 'hw')
+        frame.define('load', BuiltinProcedure(self.load_file))
+        return frame
+
+    def load_file(self, name):
+        with open(name + '.scm') as f:
+            return int(f.read())
+
+    def calls_interpret(self, success, code, setup=''):
+        lines = interpreter.CodeCase.split_code(textwrap.dedent(code),
+                                                self.console.PS1,
+                                                self.console.PS2)
+        self.console.load(lines, setup=textwrap.dedent(setup))
+        self.assertEqual(success, self.console.interpret())
+
+    def testPass(self):
+        self.calls_interpret(True, """
+        scm> (+ 1 2)
+        3
+        """)
+
+    def testFail(self):
+        self.calls_interpret(False, """
+        scm> (+ 1 2)
+        4
+        """)
+
+    def testSetup_runOnce(self):
+        setup = """
+        scm> (define x 1)
+        scm> (define (f) x)
+        """
+        self.calls_interpret(True, """
+        scm> (define x 2)
+        x
+        scm> (f)
+        2
+        """, setup)
+        self.calls_interpret(True, """
+        scm> (f)
+        1
+        """, setup)
+        self.assertEqual(1, self.module.create_global_frame.call_count)
+
+    def testSetup_builtinsShared(self):
+        setup = """
+        scm> (define x 1)
+        """
+        self.calls_interpret(True, 'scm> x\n1', setup)
+        template = self.console._prepared[2]
+        self.calls_interpret(True, 'scm> x\n1', setup)
+        self.assertIsNot(template, self.console._frame)
+        self.assertIs(template.bindings['+'], self.console._frame.bindings['+'])
+
+    def testSetup_changed(self):
+        self.calls_interpret(True, 'scm> x\n1', 'scm> (define x 1)')
+        self.calls_interpret(True, 'scm> x\n2', 'scm> (define x 2)')
+
+    def testSetup_failure(self):
+        self.calls_interpret(False, 'scm> 1\n1', 'scm> (undefined)')
+        self.calls_interpret(False, 'scm> 1\n1', 'scm> (undefined)')
+
+    def testSnapshotDisabled(self):
+        self.console.snapshot_setup = False
+        self.calls_interpret(True, 'scm> x\n1', 'scm> (define x 1)')
+        self.calls_interpret(True, 'scm> x\n1', 'scm> (define x 1)')
+        self.assertEqual(2, self.module.create_global_frame.call_count)
+
+    def testSnapshotDisabledByDefault(self):
+        self.assertFalse(scheme.SchemeConsole(False, False).snapshot_setup)
+
+    def testSetupRunAgainWhenLoadedFileChanges(self):
+        cwd = os.getcwd()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        os.chdir(tmpdir.name)
+        self.addCleanup(os.chdir, cwd)
+
+        with open('hw.scm', 'w') as f:
+            f.write('1')
+        setup = 'scm> (define x (load hw))'
+        self.calls_interpret(True, 'scm> x\n1', setup)
+        with open('hw.scm', 'w') as f:
+            f.write('22')
+        self.calls_interpret(True, 'scm> x\n22', setup)
+        self.assertEqual(2, self.module.create_global_frame.call_count)
+
+class SchemeSuiteTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(sys.modules,
+                                  scheme=types.ModuleType('scheme'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def makeSuite(self, reuse_setup, interactive=False):
+        test = mock.Mock(reuse_setup=reuse_setup, fork_cases=True)
+        return scheme.SchemeSuite(test, False, interactive, type='scheme',
+                                  cases=[])
+
+    def testSnapshot_enabledByReuseSetup(self):
+        self.assertTrue(self.makeSuite(True).console.snapshot_setup)
+
+    def testSnapshot_disabledByDefault(self):
+        self.assertFalse(self.makeSuite(False).console.snapshot_setup)
+
+    def testSnapshot_disabledWhenInteractive(self):
+        self.assertFalse(self.makeSuite(True, True).console.snapshot_setup)
@@ -0,0 +1,157 @@
+from client.sources.common import interpreter
+from client.sources.ok_test import sqlite
+import mock
+import os
+import shutil
+import tempfile
+import textwrap
+import unittest
+
+class SqliteConsoleTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+        with open('data.sql', 'w') as f:
+            f.write(textwrap.dedent("""
+            create table colors as
+              select 'red' as color, 1 as n union
+              select 'blue'        , 2;
+            """))
+        self.console = sqlite.SqliteConsole(False, False, None)
+        self.console.ordered = True
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def split(self, code):
+        return interpreter.CodeCase.split_code(textwrap.dedent(code),
+                                               self.console.PS1,
+                                               self.console.PS2)
+
+    def load(self, code, setup=''):
+        self.console.load(self.split(code), setup=textwrap.dedent(setup))
+
+    def calls_interpret(self, success, code, setup=''):
+        self.load(code, setup)
+        self.assertEqual(success, self.console.interpret())
+
+    def testPass(self):
+        self.calls_interpret(True, """
+        sqlite> select color, n from colors order by n;
+        red|1
+        blue|2
+        """, setup="""
+        sqlite> .read data.sql
+        """)
+
+    def testFail(self):
+        self.calls_interpret(False, """
+        sqlite> select color from colors order by n;
+        blue
+        red
+        """, setup="""
+        sqlite> .read data.sql
+        """)
+
+    def testFormatting(self):
+        self.calls_interpret(True, """
+        sqlite> .headers on
+        sqlite> select 1 / 2.0 as a, 1 / 3.0 as b, 1e20 as c, null as d,
+           ...>        3 as e, 2.0 as f;
+        a|b|c|d|e|f
+        0.5|0.333333333333333|1.0e+20||3|2.0
+        sqlite> select 1 where 0;
+        """)
+
+    def testMultipleStatementsPerLine(self):
+        self.calls_interpret(True, """
+        sqlite> select 1; select 'a;b';
+        1
+        a;b
+        """)
+
+    def testSetupRunOnce(self):
+        setup = """
+        sqlite> .read data.sql
+        """
+        self.calls_interpret(True, """
+        sqlite> insert into colors values ('green', 3);
+        sqlite> select count(*) from colors;
+        3
+        """, setup=setup)
+        with mock.patch.object(sqlite._Session, 'from_setup') as from_setup:
+            # Changes made by the previous case are not visible.
+            self.calls_interpret(True, """
+            sqlite> select count(*) from colors;
+            2
+            """, setup=setup)
+        self.assertFalse(from_setup.called)
+
+    def testSetupRunAgainWhenReadFileChanges(self):
+        setup = """
+        sqlite> .read data.sql
+        """
+        code = """
+        sqlite> select color from colors where n = 1;
+        red
+        """
+        self.calls_interpret(True, code, setup=setup)
+        with open('data.sql') as f:
+            data = f.read()
+        with open('data.sql', 'w') as f:
+            f.write(data.replace("'red'", "'purple'"))
+        self.calls_interpret(False, code, setup=setup)
+
+    def testSetupOutput(self):
+        # As with the sqlite3 executable, output of the setup comes first.
+        self.calls_interpret(True, """
+        sqlite> select 2;
+        1
+        2
+        """, setup="""
+        sqlite> select 1;
+        """)
+
+    def testUnsupported_usesExecutable(self):
+        self.load("""
+        sqlite> .tables
+        """)
+        with mock.patch.object(sqlite.SqliteConsole, '_has_sqlite_cli',
+                               return_value=False) as has_cli:
+            self.assertFalse(self.console.interpret())
+        self.assertTrue(has_cli.called)
+
+    def testError_usesExecutable(self):
+        self.load("""
+        sqlite> select * from missing;
+        """)
+        self.assertRaises(sqlite._Unsupported, self.console._use_sqlite_module)
+
+    def testTimeout(self):
+        self.console.timeout = 0.1
+        self.calls_interpret(False, """
+        sqlite> with ints(n) as (select 1 union select n + 1 from ints)
+           ...> select n from ints order by n;
+        1
+        """)
+
+    @unittest.skipUnless(shutil.which('sqlite3'), 'sqlite3 is not installed')
+    def testMatchesExecutable(self):
+        self.load("""
+        sqlite> select color, n * 1.5, n / 3.0, -n from colors order by color;
+        sqlite> .headers on
+        sqlite> select n as number from colors where n > 1;
+        sqlite> create trigger t after insert on colors begin
+           ...>   select 1; select 2;
+           ...> end;
+        sqlite> insert into colors values ('green', 3); -- comment
+        sqlite> select group_concat(color, ',') from colors;
+        """, setup="""
+        sqlite> .read data.sql
+        """)
+        env = dict(os.environ)
+        _, _, expected = self.console._use_sqlite_cli(env)
+        _, _, actual = self.console._use_sqlite_module()
+        self.assertEqual(expected, actual)
@@ -0,0 +1,75 @@
+from client.sources.scheme_test import models
+from client.utils import output
+import random
+import sys
+import unittest
+
+class TestReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.stdout = sys.stdout
+        sys.stdout = output._logger = output._OutputLogger(stdout=self.stdout)
+        output.off()
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+
+    def read(self, lines, printed):
+        """Iterates over a TestReader for LINES, printing PRINTED[i] after
+        reading line i.
+        """
+        reader = models.TestReader(lines)
+        try:
+            for i, _ in enumerate(reader):
+                sys.stdout.write(printed[i])
+        except EOFError:
+            pass
+        return reader
+
+    def expected_output(self, lines, printed):
+        """The output collected by splitting all output so far at each
+        expectation.
+        """
+        result = []
+        last_out_len = 0
+        so_far = ''
+        for i, line in enumerate(lines):
+            match = models.TestReader.EXPECT_PATTERN.match(line)
+            if match:
+                expected = match.group(1).split(';')
+                output_lines = so_far.split('\n')
+                if len(output_lines) > last_out_len:
+                    result.extend(output_lines[-1-len(expected):-1])
+                else:
+                    result.extend([''] * len(expected))
+                last_out_len = len(output_lines)
+            so_far += printed[i]
+        return result
+
+    def testOutputMatchesExpectations(self):
+        lines = ['(display 1)', '; expect 1', '(f)', '; expect 2 ; 3']
+        printed = ['1\n', '', '2\n3\n', '']
+        reader = self.read(lines, printed)
+        self.assertEqual(['1', '2', '3'], reader.output)
+        self.assertEqual([('1', 2), ('2', 4), ('3', 4)],
+                         reader.expected_output)
+
+    def testNoNewOutput(self):
+        lines = ['(display 1)', '; expect 1', '; expect 2']
+        printed = ['1\n', '', '']
+        self.assertEqual(['1', ''], self.read(lines, printed).output)
+
+    def testSameAsSplittingAllOutput(self):
+        rand = random.Random(61)
+        for _ in range(50):
+            lines = []
+            printed = []
+            for _ in range(40):
+                if rand.random() < 0.4:
+                    lines.append('; expect ' + ';'.join(
+                        'x' * rand.randint(1, 3)))
+                else:
+                    lines.append('(code)')
+                printed.append(rand.choice(['', 'a', 'b\n', '\n', 'c\nd',
+                                            'e\nf\n', '\n\n']))
+            self.assertEqual(self.expected_output(lines, printed),
+                             self.read(lines, printed).output)
@@ -0,0 +1,113 @@
+from client.utils import cache
+import mock
+import os
+import tempfile
+import unittest
+
+class FileCacheTest(unittest.TestCase):
+    CONTENTS = 'test = {}\n'
+    VALUE = {'name': 'q1', 'points': 1}
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.file = os.path.join(self.directory.name, 'q1.py')
+        self.writeFile(self.CONTENTS)
+
+    def writeFile(self, contents, mtime=None):
+        with open(self.file, 'w') as f:
+            f.write(contents)
+        if mtime is not None:
+            os.utime(self.file, ns=(mtime, mtime))
+
+    def makeCache(self):
+        return cache.FileCache('test', directory=self.directory.name)
+
+    def testMissingEntry(self):
+        self.assertIsNone(self.makeCache().get(self.file))
+
+    def testMissingFile(self):
+        file_cache = self.makeCache()
+        file_cache.put('does_not_exist.py', self.VALUE)
+        self.assertIsNone(file_cache.get('does_not_exist.py'))
+
+    def testPersistsAcrossInstances(self):
+        file_cache = self.makeCache()
+        file_cache.put(self.file, self.VALUE)
+        file_cache.save()
+        self.assertEqual(self.VALUE, self.makeCache().get(self.file))
+
+    def testChangedContents(self):
+        file_cache = self.makeCache()
+        file_cache.put(self.file, self.VALUE)
+        self.writeFile('test = {"changed": True}\n')
+        self.assertIsNone(file_cache.get(self.file))
+
+    def testTouchedButUnchanged(self):
+        file_cache = self.makeCache()
+        file_cache.put(self.file, self.VALUE)
+        self.writeFile(self.CONTENTS, mtime=10 ** 9)
+        self.assertEqual(self.VALUE, file_cache.get(self.file))
+
+    def testSameStampChangedContentsIsTrusted(self):
+        file_cache = self.makeCache()
+        self.writeFile(self.CONTENTS, mtime=10 ** 9)
+        file_cache.put(self.file, self.VALUE)
+        self.writeFile(self.CONTENTS.upper(), mtime=10 ** 9)
+        self.assertEqual(self.VALUE, file_cache.get(self.file))
+
+    def testVersionChangeInvalidates(self):
+        file_cache = self.makeCache()
+        file_cache.put(self.file, self.VALUE)
+        file_cache.save()
+        with mock.patch('client.__version__', 'v0.0.0'):
+            self.assertIsNone(self.makeCache().get(self.file))
+
+    def testCorruptedCacheIgnored(self):
+        with open(os.path.join(self.directory.name, 'test'), 'wb') as f:
+            f.write(b'not a pickle')
+        self.assertIsNone(self.makeCache().get(self.file))
+
+    def testSaveWithoutChanges(self):
+        self.makeCache().save()
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, 'test')))
+
+    def testCrlfContents(self):
+        with open(self.file, 'wb') as f:
+            f.write(b'test = {}\r\n\xff\n')
+        file_cache = self.makeCache()
+        with open(self.file, 'rb') as f:
+            file_cache.put(self.file, self.VALUE, contents=f.read())
+        os.utime(self.file, ns=(10 ** 9, 10 ** 9))
+        self.assertEqual(self.VALUE, file_cache.get(self.file))
+
+    def testTextContentsIgnored(self):
+        with open(self.file, 'wb') as f:
+            f.write(b'test = {}\r\n')
+        file_cache = self.makeCache()
+        file_cache.put(self.file, self.VALUE, contents='test = {}\n')
+        os.utime(self.file, ns=(10 ** 9, 10 ** 9))
+        self.assertEqual(self.VALUE, file_cache.get(self.file))
+
+    def testUnpicklableValueNotSaved(self):
+        file_cache = self.makeCache()
+        file_cache.put(self.file, lambda: None)
+        file_cache.save()
+        self.assertIsNone(self.makeCache().get(self.file))
+
+class FileStampsTest(unittest.TestCase):
+    def testStampsUnchanged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'hw.py')
+            missing = os.path.join(directory, 'missing.py')
+            with open(path, 'w') as f:
+                f.write('x = 1\n')
+            stamps = cache.file_stamps([path, missing])
+            self.assertTrue(cache.stamps_unchanged(stamps))
+            with open(path, 'w') as f:
+                f.write('x = 12\n')
+            self.assertFalse(cache.stamps_unchanged(stamps))
+            stamps = cache.file_stamps([path, missing])
+            with open(missing, 'w') as f:
+                f.write('')
+            self.assertFalse(cache.stamps_unchanged(stamps))
@@ -0,0 +1,55 @@
+from client.utils import events
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+class EventsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'events.jsonl')
+
+    def tearDown(self):
+        events.close()
+        shutil.rmtree(self.tmpdir)
+
+    def read_events(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def testEmit_disabled(self):
+        self.assertFalse(events.is_enabled())
+        events.emit('test_started', test='q1')
+        self.assertFalse(os.path.exists(self.path))
+
+    def testEmit_toFile(self):
+        events.open_stream(self.path)
+        self.assertTrue(events.is_enabled())
+        events.emit('test_started', test='q1')
+        # Events are visible before the stream is closed.
+        [event] = self.read_events()
+        self.assertEqual('test_started', event['event'])
+        self.assertEqual('q1', event['test'])
+        self.assertIn('time', event)
+
+    def testEmit_toFileDescriptor(self):
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT)
+        try:
+            events.open_stream(str(fd))
+            events.emit('run_finished', passed=1, failed=0, locked=0)
+            events.close()
+            # The descriptor belongs to the caller.
+            os.fstat(fd)
+        finally:
+            os.close(fd)
+        [event] = self.read_events()
+        self.assertEqual('run_finished', event['event'])
+        self.assertEqual(1, event['passed'])
+
+    def testClose_stopsEvents(self):
+        events.open_stream(self.path)
+        events.close()
+        self.assertFalse(events.is_enabled())
+        events.emit('test_started', test='q1')
+        self.assertEqual([], self.read_events())
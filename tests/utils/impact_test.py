@@ -0,0 +1,134 @@
+from client.utils import impact
+from client.utils import output
+import mock
+import os
+import shutil
+import tempfile
+import textwrap
+import unittest
+
+SOURCE = textwrap.dedent("""\
+    LIMIT = 10
+
+    def square(x):
+        \"\"\"
+        >>> square(3)
+        9
+        \"\"\"
+        return x * x
+
+    def double(x):
+        # Doubles x.
+        return x + x
+    """).splitlines()
+
+class ChangeTest(unittest.TestCase):
+    def replace(self, old, new):
+        return [new if line == old else line for line in SOURCE]
+
+    def testFunctionBody(self):
+        change = impact._Change(SOURCE, self.replace('    return x + x',
+                                                     '    return 2 * x'))
+        self.assertFalse(change.everything)
+        self.assertEqual({'double'}, change.names)
+        self.assertEqual([(12, 12)], change.functions)
+
+    def testDocstring(self):
+        change = impact._Change(SOURCE, self.replace('    9', '    10'))
+        self.assertEqual({'square'}, change.names)
+
+    def testTopLevel(self):
+        change = impact._Change(SOURCE, self.replace('LIMIT = 10', 'LIMIT = 5'))
+        self.assertTrue(change.everything)
+
+    def testDefLine(self):
+        change = impact._Change(SOURCE, self.replace('def double(x):',
+                                                     'def double(x=1):'))
+        self.assertTrue(change.everything)
+
+    def testCommentsAndBlankLines(self):
+        new = self.replace('    # Doubles x.', '    # Returns 2x.')
+        new.insert(1, '')
+        change = impact._Change(SOURCE, new)
+        self.assertFalse(change.everything)
+        self.assertEqual(set(), change.names)
+
+    def testRenumber(self):
+        new = ['import os'] + SOURCE
+        change = impact._Change(SOURCE, new)
+        self.assertEqual({9, 13}, change.renumber({8, 12}))
+
+class ImpactMapTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+        self.write(SOURCE)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, lines):
+        with open('hw.py', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def makeTest(self, name):
+        test = mock.Mock()
+        test.name = name
+        test.file = 'hw.py'
+        return test
+
+    def run_tests(self, impact_map, tests):
+        """Runs each test by calling the function of the same name."""
+        with open('hw.py') as f:
+            code = compile(f.read(), os.path.abspath('hw.py'), 'exec')
+        module = {}
+        exec(code, module)
+        reuse = impact_map.unchanged_results(tests, ['hw.py'])
+        impact_map.set_sources(['hw.py'])
+        grading = {name: results for name, (results, _) in reuse.items()}
+        for test in tests:
+            if test.name not in reuse:
+                impact_map.trace(test, lambda: module[test.name](2))
+                grading[test.name] = {'passed': 1, 'failed': 0, 'locked': 0}
+        impact_map.update(grading, reuse)
+        impact_map.save()
+        return reuse
+
+    def testUnchangedTestsReused(self):
+        tests = [self.makeTest('square'), self.makeTest('double')]
+        self.assertEqual({}, self.run_tests(impact.ImpactMap(), tests))
+        self.assertEqual(['double', 'square'],
+                         sorted(self.run_tests(impact.ImpactMap(), tests)))
+
+        self.write(SOURCE[:-1] + ['    return 2 * x'])
+        reuse = self.run_tests(impact.ImpactMap(), tests)
+        self.assertEqual(['square'], list(reuse))
+
+        # The reused test's lines were renumbered.
+        self.write(['', ''] + SOURCE[:7] + ['    return x ** 2'] +
+                   SOURCE[8:-1] + ['    return 2 * x'])
+        reuse = self.run_tests(impact.ImpactMap(), tests)
+        self.assertEqual(['double'], list(reuse))
+
+    def testReusedTestOutputKept(self):
+        tests = [self.makeTest('square')]
+        impact_map = impact.ImpactMap()
+        impact_map.set_sources(['hw.py'])
+        with mock.patch('sys.stdout', output._logger):
+            impact_map.trace(tests[0], lambda: print('square output'))
+        impact_map.update({'square': {'passed': 1, 'failed': 0, 'locked': 0}},
+                          {})
+        impact_map.save()
+
+        reuse = impact.ImpactMap().unchanged_results(tests, ['hw.py'])
+        results, chunks = reuse['square']
+        self.assertEqual(1, results['passed'])
+        self.assertEqual('square output\n', ''.join(msg for msg, _ in chunks))
+
+    def testTopLevelChange_runsEverything(self):
+        tests = [self.makeTest('square'), self.makeTest('double')]
+        self.run_tests(impact.ImpactMap(), tests)
+        self.write(['LIMIT = 5'] + SOURCE[1:])
+        self.assertEqual({}, self.run_tests(impact.ImpactMap(), tests))
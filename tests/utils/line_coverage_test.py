@@ -0,0 +1,62 @@
+from client.utils import line_coverage
+import mock
+import os
+import sys
+import tempfile
+import textwrap
+import unittest
+
+SOURCE = textwrap.dedent("""\
+    def square(x):
+        return x * x
+
+    def double(x):
+        return x + x
+    """)
+
+class LineCoverageTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        self.addCleanup(os.chdir, self.cwd)
+        with open('hw.py', 'w') as f:
+            f.write(SOURCE)
+
+    def measure(self):
+        cov = line_coverage.LineCoverage(['hw.py'],
+                                         source=[self.directory.name])
+        module = {}
+        code = compile(SOURCE, os.path.abspath('hw.py'), 'exec')
+        cov.start()
+        try:
+            exec(code, module)
+            module['square'](2)
+        finally:
+            cov.stop()
+        return cov
+
+    def testCoverageTracer(self):
+        with mock.patch.object(line_coverage, 'can_monitor',
+                               return_value=False):
+            cov = self.measure()
+        self.assertEqual([1, 2, 4, 5], cov.analysis2('hw.py')[1])
+        self.assertEqual([5], cov.analysis2('hw.py')[3])
+
+    @unittest.skipUnless(line_coverage.can_monitor(),
+                         'sys.monitoring requires Python 3.12+')
+    def testMonitoring_matchesCoverageTracer(self):
+        with mock.patch.object(line_coverage, 'can_monitor',
+                               return_value=False):
+            expected = self.measure().analysis2('hw.py')
+        self.assertEqual(expected, self.measure().analysis2('hw.py'))
+        # Lines disabled by the previous measurement are measured again.
+        self.assertEqual(expected, self.measure().analysis2('hw.py'))
+
+    def testAnalysisComputedOnce(self):
+        cov = line_coverage.LineCoverage(['hw.py'])
+        cov._cov = mock.Mock()
+        cov.analysis2('hw.py')
+        cov.analysis2('hw.py')
+        cov._cov.analysis2.assert_called_once_with('hw.py')
@@ -0,0 +1,63 @@
+from client.utils import network
+import mock
+import os
+import tempfile
+import unittest
+
+class PatchRequestsTest(unittest.TestCase):
+    CERTS = b'-----BEGIN CERTIFICATE-----\n'
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cert_file = os.path.join(self.directory.name, 'cacert.pem')
+        for patcher in [
+                mock.patch('client.utils.config.CERT_FILE', self.cert_file),
+                mock.patch('client.utils.config.CONFIG_DIRECTORY', self.directory.name),
+                mock.patch('client.utils.network.CERT_STAMP_FILE', self.cert_file + '.stamp'),
+                mock.patch('client.utils.network._patched_requests', False),
+                mock.patch.dict(os.environ)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.get_data = mock.Mock(return_value=self.CERTS)
+        loader_patcher = mock.patch('certifi.__loader__', mock.Mock(get_data=self.get_data))
+        loader_patcher.start()
+        self.addCleanup(loader_patcher.stop)
+
+    def patch(self):
+        network._patched_requests = False
+        network.patch_requests()
+
+    def testWritesBundle(self):
+        self.patch()
+        with open(self.cert_file, 'rb') as f:
+            self.assertEqual(self.CERTS, f.read())
+        self.assertEqual(self.cert_file, os.environ['REQUESTS_CA_BUNDLE'])
+
+    def testCurrentStampSkipsBundle(self):
+        self.patch()
+        self.get_data.reset_mock()
+        self.patch()
+        self.assertFalse(self.get_data.called)
+
+    def testModifiedBundleIsRewritten(self):
+        self.patch()
+        with open(self.cert_file, 'wb') as f:
+            f.write(b'tampered')
+        self.patch()
+        with open(self.cert_file, 'rb') as f:
+            self.assertEqual(self.CERTS, f.read())
+
+    def testNewCertifiVersionChecksBundle(self):
+        self.patch()
+        self.get_data.reset_mock()
+        with mock.patch('certifi.__version__', '0.0.0'):
+            self.patch()
+        self.assertTrue(self.get_data.called)
+
+    def testOnlyFirstCallDoesWork(self):
+        self.patch()
+        self.get_data.reset_mock()
+        os.remove(self.cert_file + '.stamp')
+        network.patch_requests()
+        self.assertFalse(self.get_data.called)
@@ -79,3 +79,174 @@ class OutputLoggerTest(unittest.TestCase):
         output.remove_log(log_id2)
         self.assertEqual([self.MESSAGE1, "\n"], log1)
         self.assertEqual([self.MESSAGE1, "\n", self.MESSAGE2, "\n"], log2)
+
+    def testDisableLog(self):
+        output.off()
+        log_id1 = output.new_log()
+        log_id2 = output.new_log()
+
+        print(self.MESSAGE1)
+        output.disable_log(log_id1)
+        print(self.MESSAGE2)
+        output.enable_log(log_id1)
+        print(self.MESSAGE1)
+
+        self.assertEqual([self.MESSAGE1, "\n", self.MESSAGE1, "\n"],
+                         output.get_log(log_id1))
+        self.assertEqual([self.MESSAGE1, "\n", self.MESSAGE2, "\n",
+                          self.MESSAGE1, "\n"], output.get_log(log_id2))
+
+    def testRemoveLog_outOfOrder(self):
+        output.off()
+        log_id1 = output.new_log()
+        print(self.MESSAGE1)
+        log_id2 = output.new_log()
+        print(self.MESSAGE2)
+        output.remove_log(log_id1)
+        log_id3 = output.new_log()
+        print(self.MESSAGE1)
+
+        self.assertEqual([self.MESSAGE2, "\n", self.MESSAGE1, "\n"],
+                         output.get_log(log_id2))
+        self.assertEqual([self.MESSAGE1, "\n"], output.get_log(log_id3))
+        # Chunks before the oldest open log are discarded.
+        self.assertEqual(4, len(output._logger._chunks))
+
+    def testNoLogs_nothingKept(self):
+        output.off()
+        log_id = output.new_log()
+        print(self.MESSAGE1)
+        output.remove_log(log_id)
+        print(self.MESSAGE2)
+        self.assertEqual([], output._logger._chunks)
+
+    def testMaxLogSize_keepsHeadAndTail(self):
+        output.off()
+        output.set_max_log_size(20)
+        log_id = output.new_log()
+        for i in range(1000):
+            sys.stdout.write(str(i % 10))
+
+        log = ''.join(output.get_log(log_id))
+        self.assertEqual('0123456789' + output.TRUNCATION_MARKER.format(980) +
+                         '0123456789', log)
+        # Memory stays bounded by the limit.
+        self.assertLessEqual(len(output._logger._chunks), 20)
+
+    def testMaxLogSize_smallLogsUnchanged(self):
+        output.off()
+        output.set_max_log_size(20)
+        log_id1 = output.new_log()
+        print('x' * 30)
+        log_id2 = output.new_log()
+        print(self.MESSAGE1)
+
+        self.assertEqual([self.MESSAGE1, "\n"], output.get_log(log_id2))
+        self.assertIn('truncated', ''.join(output.get_log(log_id1)))
+
+    def testMaxLogSize_disabledOutputExcluded(self):
+        output.off()
+        output.set_max_log_size(20)
+        log_id = output.new_log()
+        print(self.MESSAGE1)
+        output.disable_log(log_id)
+        print('x' * 100)
+        output.enable_log(log_id)
+        print(self.MESSAGE2)
+
+        self.assertEqual(self.MESSAGE1 + '\n' + self.MESSAGE2 + '\n',
+                         ''.join(output.get_log(log_id)))
+
+    def testMaxLogSize_eachLogBounded(self):
+        output.off()
+        output.set_max_log_size(20)
+        outer_id = output.new_log()
+        inner_id = output.new_log()
+        for i in range(100000):
+            sys.stdout.write(str(i % 10))
+
+        # Neither log keeps the shared chunks alive for the other.
+        self.assertLessEqual(len(output._logger._chunks), 20)
+        for log_id in (outer_id, inner_id):
+            self.assertTrue(output.is_truncated(log_id))
+            self.assertEqual(
+                '0123456789' + output.TRUNCATION_MARKER.format(99980) +
+                '0123456789', ''.join(output.get_log(log_id)))
+
+    def testMaxLogSize_disabledLogDoesNotKeepChunks(self):
+        output.off()
+        output.set_max_log_size(20)
+        log_id = output.new_log()
+        print(self.MESSAGE1)
+        output.disable_log(log_id)
+        other_id = output.new_log()
+        for i in range(1000):
+            sys.stdout.write('x')
+        output.remove_log(other_id)
+        output.enable_log(log_id)
+        print(self.MESSAGE2)
+
+        self.assertLessEqual(len(output._logger._chunks), 20)
+        self.assertFalse(output.is_truncated(log_id))
+        self.assertEqual(self.MESSAGE1 + '\n' + self.MESSAGE2 + '\n',
+                         ''.join(output.get_log(log_id)))
+
+    def testMaxLogSize_noLimit(self):
+        output.off()
+        output.set_max_log_size(0)
+        log_id = output.new_log()
+        print('x' * 1000)
+        self.assertEqual(['x' * 1000, "\n"], output.get_log(log_id))
+
+    def testSilence(self):
+        output.silence()
+        output.on()
+        log_id = output.new_log()
+        print(self.MESSAGE1)
+        self.assertEqual([self.MESSAGE1, "\n"], output.get_log(log_id))
+        self.assertIsNot(self.stdout, output._logger._current_stream)
+
+    def testCapture(self):
+        output.off()
+        chunks = output.capture()
+        print(self.MESSAGE1)
+        output.on()
+        output.replay([(self.MESSAGE2, False)])
+        output.end_capture(chunks)
+        print(self.MESSAGE1)
+        self.assertEqual([(self.MESSAGE1, False), ("\n", False),
+                          (self.MESSAGE2, False)], chunks)
+
+    def testCapture_keepsHeadAndTail(self):
+        output.off()
+        output.set_max_log_size(20)
+        chunks = output.capture()
+        for i in range(1000):
+            sys.stdout.write(str(i % 10))
+        output.end_capture(chunks)
+
+        # The first characters are kept, and between half of the limit
+        # and the limit of the most recent ones.
+        head, tail = ''.join(msg for msg, _ in chunks).split(
+            output.TRUNCATION_MARKER.format(chunks.dropped))
+        self.assertEqual('0123456789', head)
+        self.assertEqual(990, chunks.dropped + len(tail))
+        self.assertTrue(10 <= len(tail) <= 20)
+        self.assertTrue(''.join(str(i % 10) for i in range(1000)).endswith(tail))
+
+    def testCapture_smallOutputUnchanged(self):
+        output.set_max_log_size(20)
+        chunks = output.capture()
+        output.replay([('x' * 15, True), ('y' * 5, False)])
+        output.end_capture(chunks)
+        self.assertEqual(0, chunks.dropped)
+        self.assertEqual([('x' * 15, True), ('y' * 5, False)], chunks)
+
+    def testRecord_keepsHeadAndTail(self):
+        output.set_max_log_size(20)
+        chunks = output.record()
+        sys.stdout.write('a' * 15)
+        sys.stdout.write('b' * 1000)
+        sys.stdout.write('c' * 5)
+        self.assertEqual('a' * 10 + output.TRUNCATION_MARKER.format(995) +
+                         'b' * 10 + 'c' * 5, ''.join(msg for msg, _ in chunks))
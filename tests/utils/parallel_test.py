@@ -0,0 +1,131 @@
+from client.utils import output
+from client.utils import parallel
+from client.utils import timer
+import io
+import mock
+import os
+import sys
+import threading
+import unittest
+
+@unittest.skipUnless(parallel.can_fork(), 'requires fork')
+class ParallelTest(unittest.TestCase):
+    def setUp(self):
+        self.stdout = sys.stdout
+        self.terminal = io.StringIO()
+        sys.stdout = output._logger = output._OutputLogger(stdout=self.terminal)
+        # Threads left running by other tests, such as timed-out calls,
+        # would otherwise stop the workers from forking.
+        patcher = mock.patch.object(parallel, '_other_threads',
+                                    return_value=[])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+
+    def testSequential(self):
+        results = list(parallel.imap(lambda x: (x * x, os.getpid()), range(4)))
+        self.assertEqual([0, 1, 4, 9], [square for square, _ in results])
+        self.assertEqual({os.getpid()}, {pid for _, pid in results})
+
+    def testWorkers_resultsInOrder(self):
+        results = list(parallel.imap(lambda x: (x * x, os.getpid()), range(8),
+                                     jobs=3))
+        self.assertEqual([x * x for x in range(8)],
+                         [square for square, _ in results])
+        self.assertNotIn(os.getpid(), {pid for _, pid in results})
+
+    def testWorkers_outputReplayedInOrder(self):
+        def run(x):
+            print('visible', x)
+            output.off()
+            print('hidden', x)
+            output.on()
+            return x
+        log_id = output.new_log()
+
+        self.assertEqual([0, 1, 2], list(parallel.imap(run, range(3), jobs=3)))
+        self.assertEqual('visible 0\nvisible 1\nvisible 2\n',
+                         self.terminal.getvalue())
+        self.assertEqual('visible 0\nhidden 0\nvisible 1\nhidden 1\n'
+                         'visible 2\nhidden 2\n',
+                         ''.join(output.get_log(log_id)))
+
+    def testWorkers_exceptionRaisedAfterOutput(self):
+        def run(x):
+            print('output', x)
+            if x == 1:
+                raise ValueError(x)
+            return x
+        results = parallel.imap(run, range(3), jobs=2)
+        self.assertEqual(0, next(results))
+        self.assertRaises(ValueError, next, results)
+        self.assertEqual('output 0\noutput 1\n', self.terminal.getvalue())
+
+    def testWorkers_unpicklableException(self):
+        class LocalError(Exception):
+            pass
+        def run(x):
+            raise LocalError(x)
+        results = parallel.imap(run, range(2), jobs=2)
+        self.assertRaises(RuntimeError, next, results)
+
+    def testWorkers_closeStopsEarly(self):
+        results = parallel.imap(lambda x: x, range(100), jobs=2)
+        self.assertEqual(0, next(results))
+        results.close()
+        self.assertIsNone(parallel._work)
+
+    def testCallInChild(self):
+        def run():
+            print('in child')
+            return os.getpid()
+        log_id = output.new_log()
+
+        self.assertNotEqual(os.getpid(), parallel.call_in_child(run))
+        self.assertEqual('in child\n', self.terminal.getvalue())
+        self.assertEqual(['in child', '\n'], output.get_log(log_id))
+
+    def testCallInChild_changesDiscarded(self):
+        state = []
+        parallel.call_in_child(lambda: state.append(1))
+        self.assertEqual([], state)
+
+    def testCallInChild_childDies(self):
+        self.assertRaises(ChildProcessError, parallel.call_in_child,
+                          lambda: os._exit(3))
+
+class CanForkTest(unittest.TestCase):
+    def testOnlyLinux(self):
+        with mock.patch('sys.platform', 'darwin'):
+            self.assertFalse(parallel.can_fork())
+
+@unittest.skipUnless(parallel.can_fork(), 'requires fork')
+class PrepareForkTest(unittest.TestCase):
+    def testOtherThreadRunning_noFork(self):
+        stop = threading.Event()
+        thread = threading.Thread(target=stop.wait)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(stop.set)
+
+        self.assertFalse(parallel.prepare_fork())
+        results = list(parallel.imap(lambda x: os.getpid(), range(3), jobs=3))
+        self.assertEqual([os.getpid()] * 3, results)
+
+    def testJoinedThreadFinishesFirst(self):
+        finished = []
+        thread = threading.Thread(target=lambda: finished.append(True))
+        parallel.join_before_fork(thread)
+        thread.start()
+        with mock.patch.object(parallel, '_other_threads', return_value=[]):
+            self.assertTrue(parallel.prepare_fork())
+        self.assertEqual([True], finished)
+        self.assertEqual([], parallel._threads_to_join)
+
+    def testIdleTimerWorkersStopped(self):
+        timer.timed(1, lambda: None)
+        self.assertTrue(timer._idle_workers)
+        parallel.prepare_fork()
+        self.assertEqual([], timer._idle_workers)
@@ -0,0 +1,63 @@
+from client.utils import profiling
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+class ProfilingTest(unittest.TestCase):
+    MODULE = 'profiling_test_module'
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.addCleanup(profiling.disable)
+        with open(os.path.join(self.directory.name, self.MODULE + '.py'), 'w') as f:
+            f.write('import json\nVALUE = 42\n')
+        sys.path.insert(0, self.directory.name)
+        self.addCleanup(sys.path.remove, self.directory.name)
+        self.addCleanup(sys.modules.pop, self.MODULE, None)
+
+    def testRequested(self):
+        self.assertTrue(profiling.requested(['-q', 'q1', '--profile-startup']))
+        self.assertTrue(profiling.requested(['--profile-startup=out.json']))
+        self.assertFalse(profiling.requested(['--local']))
+
+    def testDisabledRecordsNothing(self):
+        @profiling.timed('phase')
+        def phase():
+            return 1
+        self.assertEqual(1, phase())
+        self.assertIsNone(profiling.get_report())
+
+    def testRecordsImportsAndPhases(self):
+        profiling.enable()
+
+        @profiling.timed('phase')
+        def phase():
+            return __import__(self.MODULE).VALUE
+        self.assertEqual(42, phase())
+        phase()
+
+        report = profiling.get_report()
+        self.assertEqual([{'name': 'phase', 'calls': 2,
+                           'seconds': report['phases'][0]['seconds']}],
+                         report['phases'])
+        modules = [entry['module'] for entry in report['imports']]
+        self.assertIn(self.MODULE, modules)
+        # The timing wrapper is not left behind on the imported module.
+        module = sys.modules[self.MODULE]
+        self.assertNotIsInstance(module.__loader__, profiling._TimedLoader)
+
+    def testWritesReport(self):
+        report_file = os.path.join(self.directory.name, 'profile.json')
+        profiling.enable(report_file)
+        with open(os.devnull, 'w') as devnull:
+            stderr, sys.__stderr__ = sys.__stderr__, devnull
+            try:
+                profiling.report()
+            finally:
+                sys.__stderr__ = stderr
+        with open(report_file) as f:
+            data = json.load(f)
+        self.assertEqual({'total', 'phases', 'imports'}, set(data))
@@ -0,0 +1,123 @@
+from client.utils import result_cache
+from client.utils import output
+import mock
+import os
+import tempfile
+import unittest
+
+class ResultCacheTest(unittest.TestCase):
+    RESULTS = {'passed': 1, 'failed': 0, 'locked': 0}
+    CHUNKS = [('q1 passed', True), ('\n', True)]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.src = self.makeFile('hw.py', 'def f(): pass\n')
+        self.path = os.path.join(self.directory.name, 'results')
+
+    def makeFile(self, name, contents):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as f:
+            f.write(contents)
+        return path
+
+    def makeTest(self, name='q1'):
+        test = mock.Mock()
+        test.name = name
+        test.file = self.makeFile(name + '.py', 'test = {}\n')
+        return test
+
+    def makeCache(self, options=(), **kwargs):
+        return result_cache.ResultCache([self.src], options, path=self.path,
+                                        **kwargs)
+
+    def testPersistsAcrossInstances(self):
+        test = self.makeTest()
+        results = self.makeCache()
+        results.put(results.key(test), self.RESULTS, self.CHUNKS)
+        results.save()
+        results = self.makeCache()
+        self.assertEqual((self.RESULTS, self.CHUNKS),
+                         results.get(results.key(test)))
+
+    def testKeyChanges(self):
+        test = self.makeTest()
+        key = self.makeCache().key(test)
+        self.assertEqual(key, self.makeCache().key(test))
+        self.assertNotEqual(key, self.makeCache(options=(True,)).key(test))
+        self.assertNotEqual(key, self.makeCache().key(self.makeTest('q2')))
+
+        self.makeFile('q1.py', 'test = {"changed": True}\n')
+        self.assertNotEqual(key, self.makeCache().key(test))
+        new_key = self.makeCache().key(test)
+        self.makeFile('hw.py', 'def f(): return 1\n')
+        self.assertNotEqual(new_key, self.makeCache().key(test))
+
+    def testKeyChanges_helperModule(self):
+        test = self.makeTest()
+        self.makeFile('utils.py', 'x = 1\n')
+        key = self.makeCache().key(test)
+        self.makeFile('notes.txt', 'unrelated\n')
+        self.assertEqual(key, self.makeCache().key(test))
+        self.makeFile('utils.py', 'x = 2\n')
+        self.assertNotEqual(key, self.makeCache().key(test))
+
+    def testFailedResults_notCached(self):
+        test = self.makeTest()
+        results = self.makeCache()
+        key = results.key(test)
+        results.put(key, {'passed': 0, 'failed': 1, 'locked': 0}, self.CHUNKS)
+        self.assertIsNone(results.get(key))
+        results.put(key, {'passed': 0, 'failed': 0, 'locked': 1}, self.CHUNKS)
+        self.assertIsNone(results.get(key))
+        self.assertFalse(results._dirty)
+
+    def testTruncatedOutput_notCached(self):
+        test = self.makeTest()
+        results = self.makeCache()
+        key = results.key(test)
+        chunks = output.Capture()
+        chunks.extend(self.CHUNKS)
+        chunks.dropped = 10
+        results.put(key, self.RESULTS, chunks)
+        self.assertIsNone(results.get(key))
+
+    def testHit_notSaved(self):
+        test = self.makeTest()
+        results = self.makeCache()
+        results.put(results.key(test), self.RESULTS, self.CHUNKS)
+        results.save()
+        results = self.makeCache()
+        self.assertIsNotNone(results.get(results.key(test)))
+        with mock.patch('pickle.dump') as mock_dump:
+            results.save()
+        self.assertFalse(mock_dump.called)
+
+    def testNoTestFile_notCached(self):
+        test = self.makeTest()
+        test.file = None
+        self.assertIsNone(self.makeCache().key(test))
+
+    def testLeastRecentlyUsedEvicted(self):
+        results = self.makeCache()
+        keys = [results.key(self.makeTest('q{}'.format(i)))
+                for i in range(3)]
+        results.put(keys[0], self.RESULTS, self.CHUNKS)
+        size = results._size
+        results = self.makeCache(max_size=2 * size)
+        results.put(keys[0], self.RESULTS, self.CHUNKS)
+        results.put(keys[1], self.RESULTS, self.CHUNKS)
+        results.get(keys[0])
+        results.put(keys[2], self.RESULTS, self.CHUNKS)
+        self.assertIsNotNone(results.get(keys[0]))
+        self.assertIsNone(results.get(keys[1]))
+        self.assertIsNotNone(results.get(keys[2]))
+
+    def testClear(self):
+        test = self.makeTest()
+        results = self.makeCache()
+        results.put(results.key(test), self.RESULTS, self.CHUNKS)
+        results.save()
+        result_cache.clear(self.path)
+        results = self.makeCache()
+        self.assertIsNone(results.get(results.key(test)))
@@ -2,9 +2,15 @@ from client.utils import software_update
 import client
 import json
 import mock
+import os
+import shutil
+import tempfile
 import unittest
 
-class CheckVersionTest(unittest.TestCase):
+class VersionApiMixin(object):
+    """Patches out requests and writing the zip file for the tests of
+    check_version().
+    """
     SERVER = 'test.server'
     PREVIOUS_VERSION = 'v1.1.1'
     CURRENT_VERSION = 'v1.2.3'
@@ -36,6 +42,7 @@ class CheckVersionTest(unittest.TestCase):
             }
         }
 
+class CheckVersionTest(VersionApiMixin, unittest.TestCase):
     def testMalformedApiResponse(self):
         self.mockJson.return_value = {'data': []}
         self.assertFalse(software_update.check_version(self.SERVER,
@@ -70,3 +77,60 @@ class CheckVersionTest(unittest.TestCase):
                                                        self.PREVIOUS_VERSION,
                                                        self.FILE_NAME))
         self.assertTrue(self.mockWriteZip.called)
+
+class UpdateCheckTest(VersionApiMixin, unittest.TestCase):
+    ETAG = '"abc123"'
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.patcherCacheFile = mock.patch(
+            'client.utils.software_update.VERSION_CACHE_FILE',
+            os.path.join(self.tmpdir, 'version_check.json'))
+        self.addCleanup(self.patcherCacheFile.stop)
+        self.patcherCacheFile.start()
+
+        self.mockGet.return_value.status_code = 200
+        self.mockGet.return_value.headers = {'ETag': self.ETAG}
+        self.createVersionApiJson(self.CURRENT_VERSION,
+                                  self.CURRENT_DOWNLOAD_LINK)
+
+    def checkVersion(self, version, ttl=software_update.DEFAULT_TTL):
+        update_check = software_update.check_version_async(
+            self.SERVER, version, self.FILE_NAME, ttl=ttl)
+        return update_check.finish()
+
+    def testUsesCacheWithinTtl(self):
+        self.assertTrue(self.checkVersion(self.CURRENT_VERSION))
+        self.assertTrue(self.checkVersion(self.CURRENT_VERSION))
+        self.assertEqual(1, self.mockGet.call_count)
+
+    def testRevalidatesWithEtag(self):
+        self.assertTrue(self.checkVersion(self.CURRENT_VERSION, ttl=0))
+        self.mockGet.return_value.status_code = 304
+        self.mockJson.return_value = None
+        self.assertTrue(self.checkVersion(self.CURRENT_VERSION, ttl=0))
+        self.assertEqual({'If-None-Match': self.ETAG},
+                         self.mockGet.call_args[1]['headers'])
+        self.assertFalse(self.mockWriteZip.called)
+
+    def testKeepsEtagWhenNotModifiedOmitsIt(self):
+        self.assertTrue(self.checkVersion(self.CURRENT_VERSION, ttl=0))
+        self.mockGet.return_value.status_code = 304
+        self.mockGet.return_value.headers = {}
+        self.assertTrue(self.checkVersion(self.CURRENT_VERSION, ttl=0))
+        self.assertTrue(self.checkVersion(self.CURRENT_VERSION, ttl=0))
+        self.assertEqual({'If-None-Match': self.ETAG},
+                         self.mockGet.call_args[1]['headers'])
+
+    def testNeedsUpdateFromCache(self):
+        self.assertTrue(self.checkVersion(self.CURRENT_VERSION))
+        self.assertTrue(self.checkVersion(self.PREVIOUS_VERSION))
+        expected_zip_call = ((self.FILE_NAME, self.mockContent),)
+        self.assertEqual(expected_zip_call, self.mockWriteZip.call_args)
+
+    def testAsyncMalformedApiResponse(self):
+        self.mockJson.return_value = {'data': []}
+        self.assertFalse(self.checkVersion(self.CURRENT_VERSION))
+        self.assertFalse(os.path.exists(software_update.VERSION_CACHE_FILE))
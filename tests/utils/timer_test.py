@@ -1,5 +1,6 @@
 from client import exceptions
 from client.utils import timer
+import threading
 import time
 import unittest
 
@@ -26,3 +27,24 @@ class TimedTest(unittest.TestCase):
         def waits():
             time.sleep(1)
         self.assertRaises(exceptions.Timeout, timer.timed, 0.1, waits)
+
+    def testReusesWorker(self):
+        first = timer.timed(1, threading.get_ident)
+        second = timer.timed(1, threading.get_ident)
+        self.assertEqual(first, second)
+        self.assertNotEqual(threading.get_ident(), first)
+
+    def testTimeout_replacesWorker(self):
+        stuck = timer.timed(1, threading.get_ident)
+        self.assertRaises(exceptions.Timeout, timer.timed, 0.1, time.sleep, (1,))
+        self.assertNotEqual(stuck, timer.timed(1, threading.get_ident))
+
+    def testNested(self):
+        nested = lambda: timer.timed(1, lambda: 42)
+        self.assertEqual(42, timer.timed(1, nested))
+
+    def testSystemExit(self):
+        def exits():
+            raise SystemExit
+        self.assertIsNone(timer.timed(1, exits))
+        self.assertEqual(42, timer.timed(1, lambda: 42))